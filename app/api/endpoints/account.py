@@ -4,25 +4,30 @@ Endpoints quản lý tài khoản.
 Cung cấp CRUD operations cho user accounts, authentication và profile access.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
-from typing import Optional
+from typing import List, Optional
 from app.api import deps
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
+from app.api.validation import Reference, ensure_references
+from app.api.responses import wants_ndjson, stream_ndjson, rows_response, row_response
+from app.api.fields import sparse_fields, apply_fields
 from app.models import Account, User
 from app.schemas import AccountBase, AccountCreate, LoginRequest, TokenResponse, UserResponse
 
 router = APIRouter()
 
 @router.get("/", response_model=list[AccountBase])
-async def read_accounts(skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+async def read_accounts(request: Request, skip: int = 0, limit: Optional[int] = None, fields: Optional[List[str]] = Depends(sparse_fields(AccountBase)), db: AsyncSession = Depends(get_read_db)):
     """
     Lấy danh sách tất cả accounts với pagination.
 
     Args:
+        request: Request (Accept: application/x-ndjson để stream từng dòng)
         skip: Số records bỏ qua
         limit: Số records tối đa trả về
+        fields: Danh sách trường cần lấy (?fields=a,b), chiếu cột trong SQL
         db: Database session
 
     Returns:
@@ -31,16 +36,22 @@ async def read_accounts(skip: int = 0, limit: Optional[int] = None, db: AsyncSes
     query = select(Account).order_by(Account.user_id.asc()).offset(skip)
     if limit is not None:
         query = query.limit(limit)
+    query = apply_fields(query, Account, fields)
+    if wants_ndjson(request):
+        return stream_ndjson(db, query, None if fields else AccountBase)
     result = await db.execute(query)
+    if fields:
+        return rows_response(result)
     return result.scalars().all()
 
 @router.get("/{user_id}", response_model=AccountBase)
-async def read_account(user_id: str, db: AsyncSession = Depends(get_db)):
+async def read_account(user_id: str, fields: Optional[List[str]] = Depends(sparse_fields(AccountBase)), db: AsyncSession = Depends(get_read_db)):
     """
     Lấy thông tin account cụ thể theo user ID.
 
     Args:
         user_id: ID duy nhất của user
+        fields: Danh sách trường cần lấy (?fields=a,b), chiếu cột trong SQL
         db: Database session
 
     Returns:
@@ -49,14 +60,15 @@ async def read_account(user_id: str, db: AsyncSession = Depends(get_db)):
     Raises:
         HTTPException: Nếu account không tồn tại
     """
-    result = await db.execute(select(Account).where(Account.user_id == user_id))
-    account = result.scalars().first()
+    query = apply_fields(select(Account).where(Account.user_id == user_id), Account, fields)
+    result = await db.execute(query)
+    account = result.first() if fields else result.scalars().first()
     if not account:
         raise HTTPException(status_code=404, detail="Account không tồn tại")
-    return account
+    return row_response(account) if fields else account
 
 @router.get("/role/{role}", response_model=list[AccountBase])
-async def read_accounts_by_role(role: str, skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+async def read_accounts_by_role(role: str, skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_read_db)):
     """
     API endpoint lấy danh sách tài khoản theo vai trò với phân trang offset/limit.
 
@@ -93,23 +105,12 @@ async def create_account(acc_in: AccountCreate, db: AsyncSession = Depends(get_d
     Raises:
         HTTPException: Nếu user không tồn tại hoặc account đã có
     """
-    # Check user tồn tại
-    user_result = await db.execute(select(User).where(User.user_id == acc_in.user_id))
-    user = user_result.scalars().first()
-    if not user:
-        raise HTTPException(
-            status_code=400,
-            detail=f"User với ID '{acc_in.user_id}' không tồn tại. Tạo user trước."
-        )
-
-    # Check account đã tồn tại
-    account_result = await db.execute(select(Account).where(Account.user_id == acc_in.user_id))
-    existing_account = account_result.scalars().first()
-    if existing_account:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Account cho user '{acc_in.user_id}' đã tồn tại."
-        )
+    # Check user tồn tại và account chưa có trong một truy vấn
+    await ensure_references(
+        db,
+        Reference(User.user_id, acc_in.user_id, f"User với ID '{acc_in.user_id}' không tồn tại. Tạo user trước."),
+        Reference(Account.user_id, acc_in.user_id, f"Account cho user '{acc_in.user_id}' đã tồn tại.", should_exist=False),
+    )
 
     # Hash password
     hashed_password = deps.hash_password(acc_in.password)
@@ -149,15 +150,12 @@ async def update_account(user_id: str, acc_in: AccountCreate, db: AsyncSession =
     # Handle user_id change
     if 'user_id' in update_data and update_data['user_id'] != user_id:
         new_user_id = update_data['user_id']
-        # Verify new user tồn tại
-        user_result = await db.execute(select(User).where(User.user_id == new_user_id))
-        user = user_result.scalars().first()
-        if not user:
-            raise HTTPException(status_code=400, detail=f"User '{new_user_id}' không tồn tại")
-        # Check new account không tồn tại
-        account_result = await db.execute(select(Account).where(Account.user_id == new_user_id))
-        if account_result.scalars().first():
-            raise HTTPException(status_code=400, detail=f"Account cho '{new_user_id}' đã tồn tại")
+        # Verify new user tồn tại và chưa có account
+        await ensure_references(
+            db,
+            Reference(User.user_id, new_user_id, f"User '{new_user_id}' không tồn tại"),
+            Reference(Account.user_id, new_user_id, f"Account cho '{new_user_id}' đã tồn tại", should_exist=False),
+        )
 
         # Cập nhật
         existing_account.user_id = new_user_id
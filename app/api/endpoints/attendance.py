@@ -4,43 +4,87 @@ Endpoints quản lý điểm danh.
 Cung cấp CRUD operations cho attendance records, bao gồm tạo, đọc, cập nhật và xóa bản ghi điểm danh.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import Optional
+from typing import List, Optional
 from app.api import deps
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
+from app.api.validation import Reference, ensure_references
+from app.api.responses import FastJSONResponse, wants_ndjson, stream_ndjson, rows_response, row_response
+from app.db.archive import read_archived_attendance, reads_archive
+from app.api.fields import sparse_fields, project_columns
 from app.models import Attendance, Schedule, User
 from app.schemas import AttendanceBase
 
 router = APIRouter()
 
+# Cột trả về theo lược đồ AttendanceBase (attend_time được đặt nhãn thành time)
+ATTENDANCE_COLUMNS = (
+    Attendance.schedule_id,
+    Attendance.user_id,
+    Attendance.status,
+    Attendance.attend_time.label("time"),
+)
+
+# Tên trường lược đồ khác tên thuộc tính mô hình
+ATTENDANCE_ALIASES = {"time": "attend_time"}
+
+def attendance_columns(fields: Optional[List[str]]) -> tuple:
+    """
+    Cột cần select theo ?fields= (mặc định toàn bộ trường của AttendanceBase).
+    """
+    if not fields:
+        return ATTENDANCE_COLUMNS
+    return tuple(project_columns(Attendance, fields, ATTENDANCE_ALIASES))
+
+def attendance_values(data: dict) -> dict:
+    """
+    Đổi tên trường lược đồ sang thuộc tính mô hình (time -> attend_time).
+    """
+    return {ATTENDANCE_ALIASES.get(key, key): value for key, value in data.items()}
+
+async def get_attendance_or_none(db: AsyncSession, attendance_id: int) -> Optional[Attendance]:
+    """
+    Lấy bản ghi điểm danh theo attend_id.
+
+    Khóa chính gồm cả attend_time (bảng phân vùng) nên không dùng được db.get.
+    """
+    result = await db.execute(select(Attendance).where(Attendance.attend_id == attendance_id))
+    return result.scalars().first()
+
 @router.get("/", response_model=list[AttendanceBase])
-async def read_attendance(skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+async def read_attendance(request: Request, skip: int = 0, limit: Optional[int] = None, fields: Optional[List[str]] = Depends(sparse_fields(AttendanceBase)), db: AsyncSession = Depends(get_read_db)):
     """
     Lấy danh sách bản ghi điểm danh với pagination.
 
     Args:
+        request: Request (Accept: application/x-ndjson để stream từng dòng)
         skip: Số bản ghi bỏ qua.
         limit: Số bản ghi tối đa trả về.
+        fields: Danh sách trường cần lấy (?fields=a,b), chiếu cột trong SQL
         db: Database session.
 
     Returns:
         Danh sách các AttendanceBase objects.
     """
-    query = select(Attendance).order_by(Attendance.time.desc()).offset(skip)
+    query = select(*attendance_columns(fields)).order_by(Attendance.attend_time.desc()).offset(skip)
     if limit is not None:
         query = query.limit(limit)
+    if wants_ndjson(request):
+        return stream_ndjson(db, query, None)
     result = await db.execute(query)
-    return result.scalars().all()
+    return rows_response(result)
 
 @router.get("/{attendance_id}", response_model=AttendanceBase)
-async def read_attendance_record(attendance_id: int, db: AsyncSession = Depends(get_db)):
+async def read_attendance_record(attendance_id: int, fields: Optional[List[str]] = Depends(sparse_fields(AttendanceBase)), db: AsyncSession = Depends(get_read_db)):
     """
     Lấy bản ghi điểm danh cụ thể theo ID.
 
     Args:
         attendance_id: ID duy nhất của bản ghi điểm danh.
+        fields: Danh sách trường cần lấy (?fields=a,b), chiếu cột trong SQL
         db: Database session.
 
     Returns:
@@ -49,11 +93,11 @@ async def read_attendance_record(attendance_id: int, db: AsyncSession = Depends(
     Raises:
         HTTPException: Nếu bản ghi không tồn tại.
     """
-    result = await db.execute(select(Attendance).where(Attendance.id == attendance_id))
-    record = result.scalars().first()
+    result = await db.execute(select(*attendance_columns(fields)).where(Attendance.attend_id == attendance_id))
+    record = result.first()
     if not record:
         raise HTTPException(status_code=404, detail="Bản ghi điểm danh không tồn tại")
-    return record
+    return row_response(record)
 
 @router.put("/{attendance_id}", response_model=AttendanceBase)
 async def update_attendance(attendance_id: int, data: AttendanceBase, db: AsyncSession = Depends(get_db), _: str = Depends(deps.verify_admin_auth)):
@@ -72,18 +116,17 @@ async def update_attendance(attendance_id: int, data: AttendanceBase, db: AsyncS
     Raises:
         HTTPException: Nếu bản ghi không tồn tại hoặc cập nhật thất bại.
     """
-    existing = await db.get(Attendance, attendance_id)
+    existing = await get_attendance_or_none(db, attendance_id)
     if not existing:
         raise HTTPException(status_code=404, detail="Bản ghi điểm danh không tồn tại")
     
-    update_data = data.dict(exclude_unset=True)
+    update_data = attendance_values(data.dict(exclude_unset=True))
     for field, value in update_data.items():
         setattr(existing, field, value)
     
     try:
         await db.commit()
-        await db.refresh(existing)
-        return existing
+        return data
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=400, detail=f"Lỗi cập nhật: {str(e)}")
@@ -104,16 +147,17 @@ async def create_record(data: AttendanceBase, db: AsyncSession = Depends(get_db)
     Raises:
         HTTPException: Nếu schedule hoặc user không tồn tại.
     """
-    # Validate FK
-    if not await db.get(Schedule, data.schedule_id):
-        raise HTTPException(status_code=400, detail="Lịch trình không tồn tại")
-    if not await db.get(User, data.user_id):
-        raise HTTPException(status_code=400, detail="Người dùng không tồn tại")
-    
-    obj = Attendance(**data.dict())
+    # Validate FK trong một truy vấn
+    await ensure_references(
+        db,
+        Reference(Schedule.schedule_id, data.schedule_id, "Lịch trình không tồn tại"),
+        Reference(User.user_id, data.user_id, "Người dùng không tồn tại"),
+    )
+
+    obj = Attendance(**attendance_values(data.dict()))
     db.add(obj)
     await db.commit()
-    return obj
+    return data
 
 @router.delete("/{attendance_id}")
 async def delete_attendance(attendance_id: int, db: AsyncSession = Depends(get_db), _: str = Depends(deps.verify_admin_auth)):
@@ -131,7 +175,7 @@ async def delete_attendance(attendance_id: int, db: AsyncSession = Depends(get_d
     Raises:
         HTTPException: Nếu bản ghi không tồn tại.
     """
-    existing = await db.get(Attendance, attendance_id)
+    existing = await get_attendance_or_none(db, attendance_id)
     if not existing:
         raise HTTPException(status_code=404, detail="Bản ghi điểm danh không tồn tại")
     await db.delete(existing)
@@ -139,7 +183,7 @@ async def delete_attendance(attendance_id: int, db: AsyncSession = Depends(get_d
     return {"message": f"Đã xóa bản ghi điểm danh {attendance_id}"}
 
 @router.get("/schedule/{schedule_id}", response_model=list[AttendanceBase])
-async def get_attendance_by_schedule(schedule_id: int, db: AsyncSession = Depends(get_db)):
+async def get_attendance_by_schedule(schedule_id: int, db: AsyncSession = Depends(get_read_db)):
     """
     Lấy danh sách bản ghi điểm danh theo schedule ID.
 
@@ -150,16 +194,16 @@ async def get_attendance_by_schedule(schedule_id: int, db: AsyncSession = Depend
     Returns:
         Danh sách các AttendanceBase objects.
     """
-    query = select(Attendance).where(Attendance.schedule_id == schedule_id).order_by(Attendance.time.desc())
+    query = select(*ATTENDANCE_COLUMNS).where(Attendance.schedule_id == schedule_id).order_by(Attendance.attend_time.desc())
     result = await db.execute(query)
-    return result.scalars().all()
+    return rows_response(result)
 
 @router.get("/user/{user_id}", response_model=list[AttendanceBase])
 async def get_attendance_by_user(
     user_id: str, 
     skip: int = 0, 
     limit: Optional[int] = None, 
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Lấy lịch sử điểm danh của một user với pagination.
@@ -171,10 +215,25 @@ async def get_attendance_by_user(
         db: Database session.
 
     Returns:
-        Danh sách các AttendanceBase objects.
+        Danh sách các AttendanceBase objects, gồm cả bản ghi đã lưu trữ sang Parquet.
     """
-    query = select(Attendance).where(Attendance.user_id == user_id).order_by(Attendance.time.desc()).offset(skip)
+    query = select(*ATTENDANCE_COLUMNS).where(Attendance.user_id == user_id).order_by(Attendance.attend_time.desc())
+    if not reads_archive(None):
+        query = query.offset(skip)
+        if limit:
+            query = query.limit(limit)
+        result = await db.execute(query)
+        return rows_response(result)
+
+    # skip + limit dòng mới nhất của bảng đủ để ghép với kho lưu trữ rồi cắt trang
     if limit:
-        query = query.limit(limit)
-    result = await db.execute(query)
-    return result.scalars().all()
+        query = query.limit(skip + limit)
+    rows = [dict(row) for row in (await db.execute(query)).mappings()]
+    archived = await run_in_threadpool(read_archived_attendance, user_id)
+    rows += [
+        {"schedule_id": record["schedule_id"], "user_id": record["user_id"], "status": record["status"], "time": record["attend_time"]}
+        for record in archived
+    ]
+    # Dòng ghi muộn chưa được chuyển sang kho có thể cũ hơn bản ghi đã lưu trữ
+    rows.sort(key=lambda row: row["time"], reverse=True)
+    return FastJSONResponse(rows[skip:skip + limit] if limit else rows[skip:])
@@ -4,12 +4,15 @@ Module quản lý API endpoints cho thực thể Class (Lớp học).
 Cung cấp các chức năng CRUD cho quản lý thông tin lớp học trong hệ thống điểm danh sinh trắc học.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from typing import Optional
+from sqlalchemy import delete
+from typing import List, Optional
 from app.api import deps
 from app.db.session import get_db
+from app.api.responses import FastJSONResponse, records_response, project_record
+from app.api.fields import sparse_fields
+from app.core.reference_cache import classes
 from app.models import ClassModel
 from app.schemas import ClassBase
 
@@ -17,34 +20,32 @@ from app.schemas import ClassBase
 router = APIRouter()
 
 @router.get("/", response_model=list[ClassBase])
-async def get_classes(skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+async def get_classes(request: Request, skip: int = 0, limit: Optional[int] = None, fields: Optional[List[str]] = Depends(sparse_fields(ClassBase))):
     """
     API endpoint lấy danh sách lớp học với phân trang offset/limit.
 
     Hỗ trợ phân trang bằng offset/limit để tối ưu hiệu suất.
 
     Args:
+        request: Request (Accept: application/x-ndjson để stream từng dòng)
         skip: Số bản ghi bỏ qua (offset)
         limit: Số lượng bản ghi tối đa trả về
-        db: Session database async
+        fields: Danh sách trường cần lấy (?fields=a,b)
 
     Returns:
         List[ClassBase]: Danh sách các lớp học
     """
-    query = select(ClassModel).order_by(ClassModel.class_id.asc()).offset(skip)
-    if limit is not None:
-        query = query.limit(limit)
-    result = await db.execute(query)
-    return result.scalars().all()
+    snapshot = await classes.snapshot()
+    return records_response(request, snapshot.page(skip, limit), fields)
 
 @router.get("/{class_id}", response_model=ClassBase)
-async def read_class(class_id: str, db: AsyncSession = Depends(get_db)):
+async def read_class(class_id: str, fields: Optional[List[str]] = Depends(sparse_fields(ClassBase))):
     """
     API endpoint lấy thông tin chi tiết của một lớp học cụ thể.
 
     Args:
         class_id: ID duy nhất của lớp học
-        db: Session database async
+        fields: Danh sách trường cần lấy (?fields=a,b)
 
     Returns:
         ClassBase: Thông tin lớp học
@@ -52,11 +53,10 @@ async def read_class(class_id: str, db: AsyncSession = Depends(get_db)):
     Raises:
         HTTPException: Nếu lớp không tồn tại (404)
     """
-    result = await db.execute(select(ClassModel).where(ClassModel.class_id == class_id))
-    class_obj = result.scalars().first()
-    if not class_obj:
+    class_obj = (await classes.snapshot()).get(class_id)
+    if class_obj is None:
         raise HTTPException(status_code=404, detail="Lớp không tồn tại")
-    return class_obj
+    return FastJSONResponse(project_record(class_obj, fields))
 
 @router.put("/{class_id}", response_model=ClassBase)
 async def update_class(class_id: str, data: ClassBase, db: AsyncSession = Depends(get_db), _: str = Depends(deps.verify_admin_auth)):
@@ -84,8 +84,10 @@ async def update_class(class_id: str, data: ClassBase, db: AsyncSession = Depend
         setattr(existing, field, value)
     
     try:
+        await classes.publish(db, class_id)
         await db.commit()
         await db.refresh(existing)
+        classes.put(existing, replaces=class_id)
         return existing
     except Exception as e:
         await db.rollback()
@@ -106,7 +108,9 @@ async def create_class(data: ClassBase, db: AsyncSession = Depends(get_db), _: s
     """
     obj = ClassModel(**data.dict())
     db.add(obj)
+    await classes.publish(db, obj.class_id)
     await db.commit()
+    classes.put(obj)
     return obj
 
 @router.delete("/{id}")
@@ -129,5 +133,7 @@ async def delete_class(id: str, db: AsyncSession = Depends(get_db), _: str = Dep
     if not existing:
         raise HTTPException(status_code=404, detail="Lớp không tồn tại")
     await db.delete(existing)
+    await classes.publish(db, id)
     await db.commit()
+    classes.discard(id)
     return {"message": f"Đã xóa lớp {id}"}
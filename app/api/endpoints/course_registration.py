@@ -4,25 +4,32 @@ Endpoints quản lý đăng ký khóa học.
 Cung cấp CRUD operations cho course registrations, bao gồm tạo, đọc, cập nhật và xóa bản ghi đăng ký.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import Optional
+from typing import List, Optional
 from app.api import deps
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
+from app.api.validation import Reference, ensure_references
+from app.api.responses import wants_ndjson, stream_ndjson, orm_response, rows_response, row_response
+from app.api.fields import sparse_fields, apply_fields
+from app.core.cache import cached
+from app.core.invalidation import publish
 from app.models import CourseRegistration, User, Subject, ClassModel
 from app.schemas import CourseRegCreate, CourseRegResponse
 
 router = APIRouter()
 
 @router.get("/", response_model=list[CourseRegResponse])
-async def read_course_registrations(skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+async def read_course_registrations(request: Request, skip: int = 0, limit: Optional[int] = None, fields: Optional[List[str]] = Depends(sparse_fields(CourseRegResponse)), db: AsyncSession = Depends(get_read_db)):
     """
     Lấy danh sách đăng ký khóa học với pagination.
 
     Args:
+        request: Request (Accept: application/x-ndjson để stream từng dòng)
         skip: Số bản ghi bỏ qua.
         limit: Số bản ghi tối đa trả về.
+        fields: Danh sách trường cần lấy (?fields=a,b), chiếu cột trong SQL
         db: Database session.
 
     Returns:
@@ -31,16 +38,22 @@ async def read_course_registrations(skip: int = 0, limit: Optional[int] = None,
     query = select(CourseRegistration).offset(skip)
     if limit:
         query = query.limit(limit)
+    query = apply_fields(query, CourseRegistration, fields)
+    if wants_ndjson(request):
+        return stream_ndjson(db, query, None if fields else CourseRegResponse)
     result = await db.execute(query)
-    return result.scalars().all()
+    if fields:
+        return rows_response(result)
+    return orm_response(result.scalars().all(), CourseRegResponse)
 
 @router.get("/{reg_id}", response_model=CourseRegResponse)
-async def read_course_registration(reg_id: int, db: AsyncSession = Depends(get_db)):
+async def read_course_registration(reg_id: int, fields: Optional[List[str]] = Depends(sparse_fields(CourseRegResponse)), db: AsyncSession = Depends(get_read_db)):
     """
     Lấy bản ghi đăng ký khóa học theo ID.
 
     Args:
         reg_id: ID duy nhất của bản ghi đăng ký.
+        fields: Danh sách trường cần lấy (?fields=a,b), chiếu cột trong SQL
         db: Database session.
 
     Returns:
@@ -49,14 +62,15 @@ async def read_course_registration(reg_id: int, db: AsyncSession = Depends(get_d
     Raises:
         HTTPException: Nếu bản ghi không tồn tại.
     """
-    result = await db.execute(select(CourseRegistration).where(CourseRegistration.reg_id == reg_id))
-    reg = result.scalars().first()
+    query = apply_fields(select(CourseRegistration).where(CourseRegistration.reg_id == reg_id), CourseRegistration, fields)
+    result = await db.execute(query)
+    reg = result.first() if fields else result.scalars().first()
     if not reg:
         raise HTTPException(status_code=404, detail="Course registration not found")
-    return reg
+    return row_response(reg) if fields else reg
 
 @router.get("/user/{user_id}", response_model=list[CourseRegResponse])
-async def read_course_registrations_by_user(user_id: str, skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+async def read_course_registrations_by_user(user_id: str, skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_read_db)):
     """
     API endpoint lấy danh sách đăng ký khóa học theo người dùng với phân trang offset/limit.
 
@@ -75,10 +89,10 @@ async def read_course_registrations_by_user(user_id: str, skip: int = 0, limit:
     if limit:
         query = query.limit(limit)
     result = await db.execute(query)
-    return result.scalars().all()
+    return orm_response(result.scalars().all(), CourseRegResponse)
 
 @router.get("/subject/{subject_id}", response_model=list[CourseRegResponse])
-async def read_course_registrations_by_subject(subject_id: str, skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+async def read_course_registrations_by_subject(subject_id: str, skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_read_db)):
     """
     API endpoint lấy danh sách đăng ký khóa học theo môn học với phân trang offset/limit.
 
@@ -97,10 +111,11 @@ async def read_course_registrations_by_subject(subject_id: str, skip: int = 0, l
     if limit:
         query = query.limit(limit)
     result = await db.execute(query)
-    return result.scalars().all()
+    return orm_response(result.scalars().all(), CourseRegResponse)
 
 @router.get("/class/{class_id}", response_model=list[CourseRegResponse])
-async def read_course_registrations_by_class(class_id: str, skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+@cached("course_registrations", ttl=60, depends_on=("course_registration",))
+async def read_course_registrations_by_class(class_id: str, skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_read_db)):
     """
     API endpoint lấy danh sách đăng ký khóa học theo lớp học với phân trang offset/limit.
 
@@ -119,7 +134,7 @@ async def read_course_registrations_by_class(class_id: str, skip: int = 0, limit
     if limit:
         query = query.limit(limit)
     result = await db.execute(query)
-    return result.scalars().all()
+    return orm_response(result.scalars().all(), CourseRegResponse)
 
 @router.post("/", response_model=CourseRegResponse)
 async def create_course_registration(reg_in: CourseRegCreate, db: AsyncSession = Depends(get_db), _: str = Depends(deps.verify_admin_auth)):
@@ -137,16 +152,17 @@ async def create_course_registration(reg_in: CourseRegCreate, db: AsyncSession =
     Raises:
         HTTPException: Nếu user, subject hoặc class không tồn tại.
     """
-    # Validate FK
-    if not await db.get(User, reg_in.user_id):
-        raise HTTPException(status_code=400, detail="User not found")
-    if not await db.get(Subject, reg_in.subject_id):
-        raise HTTPException(status_code=400, detail="Subject not found")
-    if not await db.get(ClassModel, reg_in.host_class_id):
-        raise HTTPException(status_code=400, detail="Class not found")
+    # Validate FK trong một truy vấn
+    await ensure_references(
+        db,
+        Reference(User.user_id, reg_in.user_id, "User not found"),
+        Reference(Subject.subject_id, reg_in.subject_id, "Subject not found"),
+        Reference(ClassModel.class_id, reg_in.host_class_id, "Class not found"),
+    )
     
     obj = CourseRegistration(**reg_in.dict())
     db.add(obj)
+    await publish(db, "course_registration")
     await db.commit()
     await db.refresh(obj)
     return obj
@@ -177,6 +193,7 @@ async def update_course_registration(reg_id: int, reg_in: CourseRegCreate, db: A
         setattr(existing, field, value)
     
     try:
+        await publish(db, "course_registration")
         await db.commit()
         await db.refresh(existing)
         return existing
@@ -204,5 +221,6 @@ async def delete_course_registration(reg_id: int, db: AsyncSession = Depends(get
     if not existing:
         raise HTTPException(status_code=404, detail="Course registration not found")
     await db.delete(existing)
+    await publish(db, "course_registration")
     await db.commit()
     return {"message": f"Đã xóa đăng ký khóa học {reg_id}"}
\ No newline at end of file
@@ -1,15 +1,56 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, or_, text
 from typing import Optional, List
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+from itertools import islice
 from app.api import deps
-from app.db.session import get_db
-from app.models import Attendance, Schedule, User, CourseRegistration, StudentProfile, LecturerProfile, ClassModel, Subject, Room, Faculty, Major, EducationLevel
+from app.db.session import get_read_db
+from app.api.responses import FastJSONResponse, rows_response
+from app.db.archive import read_archived_attendance, reads_archive, reads_live
+from app.core import reference_cache
+from app.core.cache import cached
+from app.core.reference_cache import ReferenceSnapshot
+from app.models import Attendance, Schedule, User, CourseRegistration, StudentProfile, LecturerProfile, Faculty, Major, EducationLevel
 from pydantic import BaseModel
 
 router = APIRouter()
 
+# Bảng mà thay đổi làm mới cache dashboard; điểm danh thay đổi liên tục nên chỉ dựa vào TTL
+DASHBOARD_TABLES = ("schedule", "course_registration", "class", "subject", "room", "faculty")
+
+def filter_attend_time(query, start_date: Optional[date], end_date: Optional[date]):
+    """
+    Lọc Attendance.attend_time theo khoảng ngày [start_date, end_date].
+
+    So sánh trực tiếp trên cột (không bọc func.date) để dùng được chỉ mục
+    ix_attendance_user_id_attend_time.
+    """
+    if start_date:
+        query = query.where(Attendance.attend_time >= start_date)
+    if end_date:
+        query = query.where(Attendance.attend_time < end_date + timedelta(days=1))
+    return query
+
+def _name(snapshot: ReferenceSnapshot, key: Optional[str], column: str) -> Optional[str]:
+    """
+    Tra tên trong snapshot danh mục (thay cho join), None nếu không có.
+    """
+    record = snapshot.get(key) if key is not None else None
+    return record[column] if record is not None else None
+
+def _search(snapshot: ReferenceSnapshot, q: str, id_column: str, name_column: str, limit: Optional[int]) -> list:
+    """
+    Tìm không phân biệt hoa/thường trên mã và tên trong snapshot danh mục (tương đương ILIKE %q%).
+    """
+    needle = q.casefold()
+    matches = (
+        record for record in snapshot.rows
+        if needle in record[id_column].casefold() or needle in record[name_column].casefold()
+    )
+    return list(islice(matches, limit))
+
 # Response models
 class AttendanceStats(BaseModel):
     total_students: int
@@ -54,7 +95,8 @@ class SearchResult(BaseModel):
     room_name: Optional[str]
 
 @router.get("/stats", response_model=DashboardStats)
-async def get_dashboard_stats(db: AsyncSession = Depends(get_db)):
+@cached("dashboard", ttl=60, depends_on=DASHBOARD_TABLES)
+async def get_dashboard_stats(db: AsyncSession = Depends(get_read_db)):
     """
     API endpoint lấy thống kê tổng quan cơ bản cho dashboard.
 
@@ -78,25 +120,11 @@ async def get_dashboard_stats(db: AsyncSession = Depends(get_db)):
     total_lecturers_result = await db.execute(select(func.count(LecturerProfile.user_id)))
     total_lecturers = total_lecturers_result.scalar() or 0
 
-    # Tổng số faculties
-    from app.models import Faculty
-    total_faculties_result = await db.execute(select(func.count(Faculty.faculty_id)))
-    total_faculties = total_faculties_result.scalar() or 0
-
-    # Tổng số subjects
-    from app.models import Subject
-    total_subjects_result = await db.execute(select(func.count(Subject.subject_id)))
-    total_subjects = total_subjects_result.scalar() or 0
-
-    # Tổng số classes
-    from app.models import ClassModel
-    total_classes_result = await db.execute(select(func.count(ClassModel.class_id)))
-    total_classes = total_classes_result.scalar() or 0
-
-    # Tổng số rooms
-    from app.models import Room
-    total_rooms_result = await db.execute(select(func.count(Room.room_id)))
-    total_rooms = total_rooms_result.scalar() or 0
+    # Số khoa, môn học, lớp, phòng lấy từ cache danh mục
+    total_faculties = len(await reference_cache.faculties.snapshot())
+    total_subjects = len(await reference_cache.subjects.snapshot())
+    total_classes = len(await reference_cache.classes.snapshot())
+    total_rooms = len(await reference_cache.rooms.snapshot())
 
     return DashboardStats(
         total_users=total_users,
@@ -109,17 +137,20 @@ async def get_dashboard_stats(db: AsyncSession = Depends(get_db)):
     )
 
 @router.get("/attendance/user/{user_id}", response_model=List[UserAttendanceRecord])
+@cached("dashboard", ttl=30, depends_on=DASHBOARD_TABLES)
 async def get_user_attendance_history(
     user_id: str,
     start_date: Optional[date] = Query(None, description="Ngày bắt đầu lọc"),
     end_date: Optional[date] = Query(None, description="Ngày kết thúc lọc"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     API endpoint lấy lịch sử điểm danh đầy đủ của người dùng.
 
-    Bao gồm thông tin lớp học, môn học và phòng học từ lịch trình.
-    Hỗ trợ lọc theo khoảng thời gian.
+    Bao gồm thông tin lớp học, môn học và phòng học từ lịch trình (tên tra trong cache
+    danh mục thay vì join bảng).
+    Hỗ trợ lọc theo khoảng thời gian; phần khoảng thời gian trước watermark lưu trữ
+    được đọc từ kho Parquet (tên lớp/môn/phòng tại thời điểm lưu trữ).
 
     Args:
         user_id: ID người dùng
@@ -130,53 +161,64 @@ async def get_user_attendance_history(
     Returns:
         List[UserAttendanceRecord]: Danh sách bản ghi điểm danh với thông tin chi tiết
     """
-    # Sửa join: Attendance -> Schedule -> Subject, Room, ClassModel
-    # Loại bỏ join với CourseRegistration vì không cần thiết cho lịch sử điểm danh
+    # Chỉ join Attendance -> Schedule; tên lớp/môn/phòng tra trong cache danh mục
     query = select(
         Attendance.attend_id,
         Attendance.attend_time,
         Attendance.status,
-        ClassModel.class_name,
-        Subject.subject_name,
-        Room.room_name
+        Schedule.class_id,
+        Schedule.subject_id,
+        Schedule.room_id
     ).select_from(Attendance).join(
         Schedule, Attendance.schedule_id == Schedule.schedule_id
-    ).join(
-        ClassModel, Schedule.class_id == ClassModel.class_id
-    ).join(
-        Subject, Schedule.subject_id == Subject.subject_id
-    ).outerjoin(
-        Room, Schedule.room_id == Room.room_id
     ).where(Attendance.user_id == user_id)
 
     # Thêm filter thời gian nếu có
-    if start_date:
-        query = query.where(func.date(Attendance.attend_time) >= start_date)
-    if end_date:
-        query = query.where(func.date(Attendance.attend_time) <= end_date)
+    query = filter_attend_time(query, start_date, end_date)
 
     query = query.order_by(Attendance.attend_time.desc())
 
-    result = await db.execute(query)
-    records = result.all()
-
-    return [
-        UserAttendanceRecord(
-            attendance_id=str(record.attend_id),
-            time=record.attend_time,
-            class_name=record.class_name,
-            subject_name=record.subject_name,
-            room_name=record.room_name,
-            status="Có mặt" if record.status else "Vắng mặt"
-        ) for record in records
-    ]
+    records = []
+    if reads_live(end_date):
+        result = await db.execute(query)
+        class_names = await reference_cache.classes.snapshot()
+        subject_names = await reference_cache.subjects.snapshot()
+        room_names = await reference_cache.rooms.snapshot()
+        records = [
+            {
+                "attend_id": record.attend_id,
+                "attend_time": record.attend_time,
+                "status": record.status,
+                "class_name": _name(class_names, record.class_id, "class_name"),
+                "subject_name": _name(subject_names, record.subject_id, "subject_name"),
+                "room_name": _name(room_names, record.room_id, "room_name"),
+            } for record in result.all()
+        ]
+
+    if reads_archive(start_date):
+        records += await run_in_threadpool(read_archived_attendance, user_id, start_date, end_date)
+        # Dòng ghi muộn chưa được chuyển sang kho có thể cũ hơn bản ghi đã lưu trữ
+        records.sort(key=lambda record: record["attend_time"], reverse=True)
+
+    # Serialize thẳng từ row tuple, không dựng lại UserAttendanceRecord
+    return FastJSONResponse([
+        {
+            "attendance_id": str(record["attend_id"]),
+            "time": record["attend_time"],
+            "class_name": record["class_name"],
+            "subject_name": record["subject_name"],
+            "room_name": record["room_name"],
+            "status": "Có mặt" if record["status"] else "Vắng mặt"
+        } for record in records
+    ])
 
 @router.get("/search")
+@cached("dashboard", ttl=60, depends_on=DASHBOARD_TABLES)
 async def search_entities(
     q: str = Query(..., description="Từ khóa tìm kiếm"),
     entity_type: str = Query(..., description="Loại thực thể: users, students, lecturers, classes, subjects"),
     limit: Optional[int] = Query(50, description="Số lượng kết quả tối đa"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     API endpoint tìm kiếm tổng hợp theo từ khóa trong các thực thể.
@@ -249,38 +291,23 @@ async def search_entities(
         ]
 
     elif entity_type == "classes":
-        # Tìm kiếm trong classes
-        query = select(ClassModel).where(
-            or_(
-                ClassModel.class_id.ilike(f"%{q}%"),
-                ClassModel.class_name.ilike(f"%{q}%")
-            )
-        ).limit(limit)
-        result = await db.execute(query)
-        classes = result.scalars().all()
+        # Tìm kiếm trong cache danh mục lớp
+        classes = _search(await reference_cache.classes.snapshot(), q, "class_id", "class_name", limit)
         return [
             {
-                "id": cls.class_id,
-                "name": cls.class_name,
+                "id": cls["class_id"],
+                "name": cls["class_name"],
                 "type": "class"
             } for cls in classes
         ]
 
     elif entity_type == "subjects":
-        # Tìm kiếm trong subjects
-        # Loại bỏ subject_code vì không tồn tại trong schema
-        query = select(Subject).where(
-            or_(
-                Subject.subject_id.ilike(f"%{q}%"),
-                Subject.subject_name.ilike(f"%{q}%")
-            )
-        ).limit(limit)
-        result = await db.execute(query)
-        subjects = result.scalars().all()
+        # Tìm kiếm trong cache danh mục môn học
+        subjects = _search(await reference_cache.subjects.snapshot(), q, "subject_id", "subject_name", limit)
         return [
             {
-                "id": subject.subject_id,
-                "name": subject.subject_name,
+                "id": subject["subject_id"],
+                "name": subject["subject_name"],
                 "type": "subject"
             } for subject in subjects
         ]
@@ -289,13 +316,14 @@ async def search_entities(
     return []
 
 @router.get("/attendance/summary", response_model=List[AttendanceSummary])
+@cached("dashboard", ttl=30, depends_on=DASHBOARD_TABLES)
 async def get_attendance_summary(
     start_date: date = Query(..., description="Ngày bắt đầu"),
     end_date: date = Query(..., description="Ngày kết thúc"),
     class_id: Optional[str] = Query(None, description="ID lớp học (optional)"),
     lecturer_id: Optional[str] = Query(None, description="ID giảng viên (optional)"),
     subject_id: Optional[str] = Query(None, description="ID môn học (optional)"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Lấy tóm tắt điểm danh theo khoảng thời gian, lọc theo lớp, giảng viên, môn học."""
     # Sửa query: join schedule với course_registration và attendance
@@ -312,6 +340,7 @@ async def get_attendance_summary(
         FROM schedule s
         LEFT JOIN course_registration cr ON s.class_id = cr.host_class_id AND s.subject_id = cr.subject_id
         LEFT JOIN attendance a ON s.schedule_id = a.schedule_id
+            AND a.attend_time >= :start_date AND a.attend_time < :end_before
         WHERE s.learn_date BETWEEN :start_date AND :end_date
         """ + (" AND s.class_id = :class_id" if class_id else "") + """
         """ + (" AND s.lecturer_id = :lecturer_id" if lecturer_id else "") + """
@@ -320,7 +349,8 @@ async def get_attendance_summary(
         ORDER BY s.learn_date
     """)
 
-    params = {"start_date": start_date, "end_date": end_date}
+    # Giới hạn attend_time theo cùng khoảng ngày để PostgreSQL chỉ quét các partition liên quan
+    params = {"start_date": start_date, "end_date": end_date, "end_before": end_date + timedelta(days=1)}
     if class_id:
         params["class_id"] = class_id
     if lecturer_id:
@@ -345,35 +375,54 @@ async def get_attendance_summary(
     return summary
 
 @router.get("/attendance/raw/user/{user_id}")
+@cached("dashboard", ttl=30, depends_on=DASHBOARD_TABLES)
 async def get_user_attendance_raw(
     user_id: str,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Lấy lịch sử điểm danh thô của một user."""
+    """Lấy lịch sử điểm danh thô của một user (kể cả phần đã lưu trữ)."""
     # Sửa Attendance.time thành Attendance.attend_time
-    query = select(Attendance).where(Attendance.user_id == user_id)
+    query = select(*Attendance.__table__.columns).where(Attendance.user_id == user_id)
 
-    if start_date:
-        query = query.where(func.date(Attendance.attend_time) >= start_date)
-    if end_date:
-        query = query.where(func.date(Attendance.attend_time) <= end_date)
+    query = filter_attend_time(query, start_date, end_date)
 
     query = query.order_by(Attendance.attend_time.desc())
-    result = await db.execute(query)
-    return result.scalars().all()
+    if not reads_archive(start_date):
+        result = await db.execute(query)
+        return rows_response(result)
+
+    rows = []
+    if reads_live(end_date):
+        result = await db.execute(query)
+        rows = [dict(row) for row in result.mappings()]
+    keys = Attendance.__table__.columns.keys()
+    archived = await run_in_threadpool(read_archived_attendance, user_id, start_date, end_date)
+    rows += [{key: record[key] for key in keys} for record in archived]
+    rows.sort(key=lambda row: row["attend_time"], reverse=True)
+    return FastJSONResponse(rows)
 
 @router.get("/schedules/calendar")
+@cached("dashboard", ttl=60, depends_on=DASHBOARD_TABLES)
 async def get_schedules_calendar(
     start_date: date = Query(..., description="Ngày bắt đầu"),
     end_date: date = Query(..., description="Ngày kết thúc"),
     lecturer_id: Optional[str] = None,
     class_id: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Lấy lịch trình theo dạng calendar (cho frontend calendar view)."""
-    query = select(Schedule).where(
+    query = select(
+        Schedule.schedule_id,
+        Schedule.subject_id,
+        Schedule.room_id,
+        Schedule.lecturer_id,
+        Schedule.class_id,
+        Schedule.learn_date,
+        Schedule.start_period,
+        Schedule.end_period
+    ).where(
         and_(
             Schedule.learn_date >= start_date,
             Schedule.learn_date <= end_date
@@ -387,7 +436,7 @@ async def get_schedules_calendar(
 
     query = query.order_by(Schedule.learn_date, Schedule.start_period)
     result = await db.execute(query)
-    schedules = result.scalars().all()
+    schedules = result.all()
 
     # Format for calendar view
     calendar_events = []
@@ -405,4 +454,4 @@ async def get_schedules_calendar(
             }
         })
 
-    return calendar_events
\ No newline at end of file
+    return FastJSONResponse(calendar_events)
\ No newline at end of file
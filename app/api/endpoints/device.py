@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends
+from datetime import date
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.api import deps
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
+from app.schemas import AttendanceCreate
+from app.services.file_serving import serve_file
+from app.services.offline_bundle import bundle_path, build_bundle, reconcile_checkins
 
 # Khởi tạo Router cho phân vùng tài nguyên thiết bị
 router = APIRouter()
@@ -17,4 +22,64 @@ async def device_checkin(
     """
     Endpoint cho check-in thiết bị phần cứng với xác thực hỗn hợp.
     """
-    return {"status": "success", "message": "Thiết bị đã được xác thực thành công"}
\ No newline at end of file
+    return {"status": "success", "message": "Thiết bị đã được xác thực thành công"}
+
+@router.api_route("/offline_bundle/{room_id}", methods=["GET", "HEAD"])
+async def get_offline_bundle(
+    request: Request,
+    room_id: str,
+    day: Optional[date] = Query(None, description="Ngày học (mặc định hôm nay)"),
+    db: AsyncSession = Depends(get_read_db),
+    _: bool = Depends(deps.verify_device_or_admin)
+):
+    """
+    Tải gói dữ liệu ngoại tuyến của phòng trong ngày. Yêu cầu API key thiết bị hoặc quyền admin.
+
+    Gói gồm lịch học, danh sách sinh viên đăng ký và template vân tay, ký HMAC-SHA256 (xem
+    app/services/offline_bundle.py). Gói do tác vụ nền dựng sẵn; nếu chưa có thì dựng ngay.
+    Máy chấm công gửi If-None-Match để chỉ tải lại khi gói thay đổi.
+
+    Args:
+        request: Request (đọc If-None-Match, Range)
+        room_id: ID phòng
+        day: Ngày học
+        db: Database session
+        _: Device/admin authentication dependency
+
+    Returns:
+        Response: Gói application/octet-stream với ETag, hoặc 304 nếu không đổi
+    """
+    day = day or date.today()
+    try:
+        path = bundle_path(room_id, day)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="room_id không hợp lệ")
+    if not path.is_file():
+        path = await build_bundle(db, room_id, day)
+        if path is None:
+            raise HTTPException(status_code=404, detail="Phòng không có lịch học trong ngày")
+    # Gói chứa template sinh trắc: chỉ máy chấm công được cache
+    return await serve_file(
+        request, path, media_type="application/octet-stream", headers={"Cache-Control": "private, no-cache"},
+    )
+
+@router.post("/offline_checkins")
+async def reconcile_offline_checkins(
+    checkins: List[AttendanceCreate],
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(deps.verify_device_or_admin)
+):
+    """
+    Đối soát điểm danh máy chấm công ghi khi ngoại tuyến. Yêu cầu API key thiết bị hoặc quyền admin.
+
+    Lượt trùng hoặc tham chiếu lịch/người dùng không tồn tại bị bỏ qua nên có thể gửi lại cả lô.
+
+    Args:
+        checkins: Các lượt điểm danh (schedule_id, user_id, status, time)
+        db: Database session
+        _: Device/admin authentication dependency
+
+    Returns:
+        dict: received, inserted và skipped
+    """
+    return await reconcile_checkins(db, checkins)
@@ -1,39 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import Optional
+from typing import List, Optional
 from app.api import deps
 from app.db.session import get_db
+from app.api.responses import FastJSONResponse, records_response, project_record
+from app.api.fields import sparse_fields
+from app.core.reference_cache import education_levels
 from app.models import EducationLevel
 from app.schemas import EducationLevelBase, EducationLevelResponse
 
 router = APIRouter()
 
 @router.get("/", response_model=list[EducationLevelResponse])
-async def read_education_levels(skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+async def read_education_levels(request: Request, skip: int = 0, limit: Optional[int] = None, fields: Optional[List[str]] = Depends(sparse_fields(EducationLevelResponse))):
     """Lấy danh sách cấp độ giáo dục."""
-    query = select(EducationLevel).offset(skip)
-    if limit:
-        query = query.limit(limit)
-    result = await db.execute(query)
-    return result.scalars().all()
+    snapshot = await education_levels.snapshot()
+    return records_response(request, snapshot.page(skip, limit), fields)
 
 @router.get("/{edu_level_id}", response_model=EducationLevelResponse)
-async def read_education_level(edu_level_id: str, db: AsyncSession = Depends(get_db)):
+async def read_education_level(edu_level_id: str, fields: Optional[List[str]] = Depends(sparse_fields(EducationLevelResponse))):
     """Lấy cấp độ giáo dục theo ID."""
-    result = await db.execute(select(EducationLevel).where(EducationLevel.edu_level_id == edu_level_id))
-    level = result.scalars().first()
-    if not level:
+    level = (await education_levels.snapshot()).get(edu_level_id)
+    if level is None:
         raise HTTPException(status_code=404, detail="Education level not found")
-    return level
+    return FastJSONResponse(project_record(level, fields))
 
 @router.post("/", response_model=EducationLevelResponse)
 async def create_education_level(data: EducationLevelBase, db: AsyncSession = Depends(get_db), _: str = Depends(deps.verify_admin_auth)):
     """Tạo cấp độ giáo dục mới."""
     obj = EducationLevel(**data.dict())
     db.add(obj)
+    await education_levels.publish(db, obj.edu_level_id)
     await db.commit()
     await db.refresh(obj)
+    education_levels.put(obj)
     return obj
 
 @router.put("/{edu_level_id}", response_model=EducationLevelResponse)
@@ -48,8 +48,10 @@ async def update_education_level(edu_level_id: str, data: EducationLevelBase, db
         setattr(existing, field, value)
     
     try:
+        await education_levels.publish(db, edu_level_id)
         await db.commit()
         await db.refresh(existing)
+        education_levels.put(existing, replaces=edu_level_id)
         return existing
     except Exception as e:
         await db.rollback()
@@ -62,5 +64,7 @@ async def delete_education_level(edu_level_id: str, db: AsyncSession = Depends(g
     if not existing:
         raise HTTPException(status_code=404, detail="Education level not found")
     await db.delete(existing)
+    await education_levels.publish(db, edu_level_id)
     await db.commit()
+    education_levels.discard(edu_level_id)
     return {"message": f"Đã xóa cấp độ giáo dục {edu_level_id}"}
\ No newline at end of file
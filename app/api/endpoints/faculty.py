@@ -1,43 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from typing import Optional
+from sqlalchemy import delete
+from typing import List, Optional
 from app.api import deps
 from app.db.session import get_db
+from app.api.responses import FastJSONResponse, records_response, project_record
+from app.api.fields import sparse_fields
+from app.core.reference_cache import faculties
 from app.models import Faculty
 from app.schemas import FacultyBase
 
 router = APIRouter()
 
 @router.get("/", response_model=list[FacultyBase])
-async def list_faculty(skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+async def list_faculty(request: Request, skip: int = 0, limit: Optional[int] = None, fields: Optional[List[str]] = Depends(sparse_fields(FacultyBase))):
     """
     API endpoint lấy danh sách khoa với phân trang offset/limit.
 
     Hỗ trợ phân trang bằng offset/limit để tối ưu hiệu suất.
 
     Args:
+        request: Request (Accept: application/x-ndjson để stream từng dòng)
         skip: Số bản ghi bỏ qua (offset)
         limit: Số lượng bản ghi tối đa trả về
-        db: Session database async
+        fields: Danh sách trường cần lấy (?fields=a,b)
 
     Returns:
         List[FacultyBase]: Danh sách các khoa
     """
-    query = select(Faculty).order_by(Faculty.faculty_id.asc()).offset(skip)
-    if limit is not None:
-        query = query.limit(limit)
-    result = await db.execute(query)
-    return result.scalars().all()
+    snapshot = await faculties.snapshot()
+    return records_response(request, snapshot.page(skip, limit), fields)
 
 @router.get("/{faculty_id}", response_model=FacultyBase)
-async def read_faculty(faculty_id: str, db: AsyncSession = Depends(get_db)):
+async def read_faculty(faculty_id: str, fields: Optional[List[str]] = Depends(sparse_fields(FacultyBase))):
     """Lấy thông tin khoa cụ thể."""
-    result = await db.execute(select(Faculty).where(Faculty.faculty_id == faculty_id))
-    faculty = result.scalars().first()
-    if not faculty:
+    faculty = (await faculties.snapshot()).get(faculty_id)
+    if faculty is None:
         raise HTTPException(status_code=404, detail="Khoa không tồn tại")
-    return faculty
+    return FastJSONResponse(project_record(faculty, fields))
 
 @router.put("/{faculty_id}", response_model=FacultyBase)
 async def update_faculty(faculty_id: str, data: FacultyBase, db: AsyncSession = Depends(get_db), _: str = Depends(deps.verify_admin_auth)):
@@ -51,8 +51,10 @@ async def update_faculty(faculty_id: str, data: FacultyBase, db: AsyncSession =
         setattr(existing, field, value)
     
     try:
+        await faculties.publish(db, faculty_id)
         await db.commit()
         await db.refresh(existing)
+        faculties.put(existing, replaces=faculty_id)
         return existing
     except Exception as e:
         await db.rollback()
@@ -63,7 +65,9 @@ async def create_faculty(data: FacultyBase, db: AsyncSession = Depends(get_db),
     """Tạo khoa mới."""
     obj = Faculty(**data.dict())
     db.add(obj)
+    await faculties.publish(db, obj.faculty_id)
     await db.commit()
+    faculties.put(obj)
     return obj
 
 @router.delete("/{id}")
@@ -73,5 +77,7 @@ async def remove_faculty(id: str, db: AsyncSession = Depends(get_db), _: str = D
     if not existing:
         raise HTTPException(status_code=404, detail="Khoa không tồn tại")
     await db.delete(existing)
+    await faculties.publish(db, id)
     await db.commit()
+    faculties.discard(id)
     return {"message": f"Đã xóa khoa {id}"}
@@ -1,34 +1,79 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import Optional
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional
 from app.api import deps
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.session import get_db, get_read_db
+from app.api.validation import Reference, ensure_references
+from app.api.responses import wants_ndjson, stream_ndjson, rows_response, row_response
+from app.api.fields import sparse_fields, project_columns
 from app.models import Fingerprint, User
-from app.schemas import FingerprintResponse, FingerprintCreate
+from app.schemas import FingerprintResponse, FingerprintCreate, FingerprintEnrollment
+from app.services.fingerprint_enrollment import (
+    FINGER_ID, discard_fingerprint_image, publish_fingerprint_image, read_capture, score_capture, stage_fingerprint_image,
+)
+from app.services.fingerprint_sync import encode_changes, load_changes
 
 router = APIRouter()
 
+# Các trường metadata trả về mặc định (không gồm finger_data)
+METADATA_FIELDS = list(FingerprintResponse.model_fields)
+
 @router.get("/", response_model=list[FingerprintResponse])
-async def read_fingerprints(skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
-    """Lấy danh sách vân tay."""
-    query = select(Fingerprint).offset(skip)
+async def read_fingerprints(request: Request, skip: int = 0, limit: Optional[int] = None, fields: Optional[List[str]] = Depends(sparse_fields(FingerprintResponse)), db: AsyncSession = Depends(get_read_db)):
+    """Lấy danh sách vân tay (chỉ metadata, không tải finger_data)."""
+    query = select(*project_columns(Fingerprint, fields or METADATA_FIELDS)).offset(skip)
     if limit:
         query = query.limit(limit)
-    result = await db.execute(query)
-    return result.scalars().all()
+    if wants_ndjson(request):
+        return stream_ndjson(db, query, None)
+    return rows_response(await db.execute(query))
+
+@router.get("/sync")
+async def sync_fingerprints(
+    request: Request,
+    since: int = Query(0, ge=0, description="Phiên bản đã đồng bộ (X-Sync-Version của lần trước), 0 để tải toàn bộ"),
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(deps.verify_device_or_admin)
+):
+    """
+    Đồng bộ template vân tay theo phiên bản. Yêu cầu API key thiết bị hoặc quyền admin.
+
+    Chỉ trả các template thêm/sửa và các finger_id bị xóa kể từ phiên bản since, đóng gói
+    nhị phân (xem app/services/fingerprint_sync.py), gzip khi Accept-Encoding cho phép.
+    Đọc từ primary để phiên bản trả về không vượt quá dữ liệu đã thấy.
+
+    Args:
+        request: Request (đọc Accept-Encoding)
+        since: Phiên bản đã đồng bộ
+        db: Database session
+        _: Device/admin authentication dependency
+
+    Returns:
+        Response: Gói application/octet-stream, header X-Sync-Version là since cho lần sau
+    """
+    changes = await load_changes(db, since)
+    compress = "gzip" in request.headers.get("accept-encoding", "")
+    bundle = await run_in_threadpool(encode_changes, changes, compress)
+    headers = {"X-Sync-Version": str(changes.next), "Cache-Control": "no-store", "Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=bundle, media_type="application/octet-stream", headers=headers)
 
 @router.get("/{finger_id}", response_model=FingerprintResponse)
-async def read_fingerprint(finger_id: str, db: AsyncSession = Depends(get_db)):
-    """Lấy vân tay theo ID."""
-    result = await db.execute(select(Fingerprint).where(Fingerprint.finger_id == finger_id))
-    fp = result.scalars().first()
+async def read_fingerprint(finger_id: str, fields: Optional[List[str]] = Depends(sparse_fields(FingerprintResponse)), db: AsyncSession = Depends(get_read_db)):
+    """Lấy vân tay theo ID (chỉ metadata, không tải finger_data)."""
+    query = select(*project_columns(Fingerprint, fields or METADATA_FIELDS)).where(Fingerprint.finger_id == finger_id)
+    fp = (await db.execute(query)).first()
     if not fp:
         raise HTTPException(status_code=404, detail="Fingerprint not found")
-    return fp
+    return row_response(fp)
 
 @router.get("/user/{user_id}", response_model=list[FingerprintResponse])
-async def read_fingerprints_by_user(user_id: str, skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+async def read_fingerprints_by_user(user_id: str, skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_read_db)):
     """
     API endpoint lấy danh sách vân tay theo người dùng với phân trang offset/limit.
 
@@ -43,18 +88,54 @@ async def read_fingerprints_by_user(user_id: str, skip: int = 0, limit: Optional
     Returns:
         List[FingerprintResponse]: Danh sách vân tay của người dùng
     """
-    query = select(Fingerprint).where(Fingerprint.user_id == user_id).order_by(Fingerprint.finger_id.asc()).offset(skip)
+    query = (
+        select(*project_columns(Fingerprint, METADATA_FIELDS))
+        .where(Fingerprint.user_id == user_id)
+        .order_by(Fingerprint.finger_id.asc())
+        .offset(skip)
+    )
     if limit:
         query = query.limit(limit)
-    result = await db.execute(query)
-    return result.scalars().all()
+    return rows_response(await db.execute(query))
+
+@router.get("/{finger_id}/template")
+async def download_fingerprint_template(
+    finger_id: str,
+    db: AsyncSession = Depends(get_read_db),
+    _: bool = Depends(deps.verify_device_or_admin)
+):
+    """
+    Tải template vân tay (bytes thô). Yêu cầu API key thiết bị hoặc quyền admin.
+
+    Đây là đường duy nhất đọc finger_data; các endpoint danh sách/chi tiết chỉ trả metadata.
+
+    Args:
+        finger_id: ID vân tay
+        db: Session database async
+        _: Device/admin authentication dependency
+
+    Returns:
+        Response: Template dạng application/octet-stream, không cho phép cache
+    """
+    result = await db.execute(select(Fingerprint.finger_data).where(Fingerprint.finger_id == finger_id))
+    template = result.scalar_one_or_none()
+    if template is None:
+        raise HTTPException(status_code=404, detail="Fingerprint not found")
+    return Response(
+        content=template,
+        media_type="application/octet-stream",
+        headers={"Cache-Control": "no-store"},
+    )
 
 @router.post("/", response_model=FingerprintResponse)
 async def create_fingerprint(data: FingerprintCreate, db: AsyncSession = Depends(get_db), _: str = Depends(deps.verify_admin_auth)):
     """Tạo vân tay mới."""
-    # Validate user exists
-    if not await db.get(User, data.user_id):
-        raise HTTPException(status_code=400, detail="User not found")
+    # Validate user exists và finger_id chưa dùng trong một truy vấn
+    await ensure_references(
+        db,
+        Reference(User.user_id, data.user_id, "User not found"),
+        Reference(Fingerprint.finger_id, data.finger_id, "Fingerprint already exists", should_exist=False),
+    )
     
     obj = Fingerprint(**data.dict())
     db.add(obj)
@@ -62,6 +143,81 @@ async def create_fingerprint(data: FingerprintCreate, db: AsyncSession = Depends
     await db.refresh(obj)
     return FingerprintResponse(finger_id=obj.finger_id, user_id=obj.user_id)
 
+@router.post("/enroll", response_model=FingerprintEnrollment)
+async def enroll_fingerprint(
+    request: Request,
+    user_id: str = Query(..., description="ID người dùng"),
+    finger_id: str = Query(..., description="ID vân tay (chữ, số, _ và -)"),
+    replace: bool = Query(False, description="Ghi đè vân tay đã có cùng finger_id"),
+    db: AsyncSession = Depends(get_db),
+    _: bool = Depends(deps.verify_device_or_admin)
+):
+    """
+    Đăng ký vân tay từ trạm quét. Yêu cầu API key thiết bị hoặc quyền admin.
+
+    Body là template thô (application/octet-stream) hoặc multipart với phần template và phần
+    image (ảnh vân tay gốc, tùy chọn). Chất lượng được chấm từ ảnh (process pool) hoặc từ
+    template ISO/IEC 19794-2; lần quét dưới FINGERPRINT_MIN_QUALITY bị từ chối với 422 để
+    trạm yêu cầu quét lại. Ảnh gốc chỉ thay ảnh cũ sau khi commit; finger_id bị đăng ký đồng
+    thời (hoặc người dùng vừa bị xóa) trả về 409.
+
+    Args:
+        request: Request chứa body nhị phân hoặc multipart
+        user_id: ID người dùng
+        finger_id: ID vân tay, cũng là tên file ảnh gốc
+        replace: True để ghi đè vân tay đã có
+        db: Database session
+        _: Device/admin authentication dependency
+
+    Returns:
+        FingerprintEnrollment: finger_id, user_id, điểm chất lượng (None nếu không chấm được)
+        và tên file ảnh gốc đã lưu
+    """
+    if not FINGER_ID.match(finger_id):
+        raise HTTPException(status_code=400, detail="finger_id chỉ gồm chữ, số, _ và - (tối đa 32 ký tự)")
+    capture = await read_capture(request)
+
+    # Validate user exists và (khi không ghi đè) finger_id chưa dùng trong một truy vấn
+    await ensure_references(
+        db,
+        Reference(User.user_id, user_id, "User not found"),
+        Reference(Fingerprint.finger_id, None if replace else finger_id, "Fingerprint already exists", should_exist=False),
+    )
+
+    quality = await score_capture(capture)
+    if quality is not None and quality < settings.FINGERPRINT_MIN_QUALITY:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Chất lượng vân tay thấp ({quality:.0f}/{settings.FINGERPRINT_MIN_QUALITY}), vui lòng quét lại",
+        )
+
+    # Ảnh mới chỉ thay ảnh hiện có sau khi commit thành công
+    staged = await stage_fingerprint_image(capture)
+    try:
+        existing = await db.get(Fingerprint, finger_id) if replace else None
+        if existing:
+            existing.user_id = user_id
+            existing.finger_data = capture.template
+        else:
+            db.add(Fingerprint(finger_id=finger_id, user_id=user_id, finger_data=capture.template))
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Đăng ký đồng thời cùng finger_id, hoặc người dùng vừa bị xóa
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="Vân tay đã tồn tại hoặc người dùng không còn tồn tại")
+    except BaseException:
+        if staged is not None:
+            await discard_fingerprint_image(staged)
+        raise
+    image_path = await publish_fingerprint_image(finger_id, staged) if staged is not None else None
+    return FingerprintEnrollment(
+        finger_id=finger_id,
+        user_id=user_id,
+        quality=quality,
+        image=image_path.name if image_path else None,
+    )
+
 @router.put("/{finger_id}", response_model=FingerprintResponse)
 async def update_fingerprint(finger_id: str, data: FingerprintCreate, db: AsyncSession = Depends(get_db), _: str = Depends(deps.verify_admin_auth)):
     """Cập nhật vân tay."""
@@ -70,8 +226,7 @@ async def update_fingerprint(finger_id: str, data: FingerprintCreate, db: AsyncS
         raise HTTPException(status_code=404, detail="Fingerprint not found")
     
     # Validate user exists
-    if not await db.get(User, data.user_id):
-        raise HTTPException(status_code=400, detail="User not found")
+    await ensure_references(db, Reference(User.user_id, data.user_id, "User not found"))
     
     update_data = data.dict(exclude_unset=True)
     for field, value in update_data.items():
@@ -0,0 +1,118 @@
+"""
+Endpoints import hàng loạt từ CSV và ZIP ảnh.
+
+Nạp thời khóa biểu và đăng ký khóa học cả học kỳ trong một request: parse theo lô,
+kiểm tra khóa ngoại trong bộ nhớ, COPY vào bảng tạm rồi gộp vào bảng chính. Ảnh đại diện
+của cả khóa được nạp từ một file ZIP đặt tên theo user_id.
+"""
+
+from fastapi import APIRouter, BackgroundTasks, Depends, File, UploadFile
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api import deps
+from app.core.config import settings
+from app.db.session import get_db
+from app.services.bulk_import import (
+    COURSE_REGISTRATION_IMPORT,
+    SCHEDULE_IMPORT,
+    report_path,
+    run_import,
+)
+from app.services.images import generate_derivatives_batch
+from app.services.profile_image_import import import_profile_images
+from app.services.storage import profile_images
+
+router = APIRouter()
+
+def _with_report_url(summary: dict) -> dict:
+    """
+    Thêm đường dẫn tải báo cáo lỗi vào kết quả import.
+    """
+    report_id = summary["report_id"]
+    summary["report_url"] = f"{settings.API_V1_STR}/imports/reports/{report_id}" if report_id else None
+    return summary
+
+@router.post("/schedules")
+async def import_schedules(
+    file: UploadFile = File(..., description="CSV: subject_id, room_id, lecturer_id, class_id, learn_date, start_period, end_period, is_open"),
+    db: AsyncSession = Depends(get_db),
+    _: str = Depends(deps.verify_admin_auth)
+):
+    """
+    Import thời khóa biểu từ CSV. Yêu cầu quyền admin.
+
+    Lịch trùng (class_id, subject_id, learn_date, start_period) với dữ liệu đã có bị bỏ qua.
+
+    Args:
+        file: File CSV có dòng tiêu đề
+        db: Database session
+        _: Admin authentication dependency
+
+    Returns:
+        dict: total, inserted, rejected, report_id và report_url của báo cáo dòng bị loại
+    """
+    return _with_report_url(await run_import(db, file, SCHEDULE_IMPORT))
+
+@router.post("/course_registrations")
+async def import_course_registrations(
+    file: UploadFile = File(..., description="CSV: user_id, subject_id, host_class_id, semester, year"),
+    db: AsyncSession = Depends(get_db),
+    _: str = Depends(deps.verify_admin_auth)
+):
+    """
+    Import đăng ký khóa học từ CSV. Yêu cầu quyền admin.
+
+    Đăng ký trùng (user_id, subject_id, semester, year) với dữ liệu đã có bị bỏ qua.
+
+    Args:
+        file: File CSV có dòng tiêu đề
+        db: Database session
+        _: Admin authentication dependency
+
+    Returns:
+        dict: total, inserted, rejected, report_id và report_url của báo cáo dòng bị loại
+    """
+    return _with_report_url(await run_import(db, file, COURSE_REGISTRATION_IMPORT))
+
+@router.post("/profile_images")
+async def import_profile_image_archive(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(..., description="ZIP ảnh đại diện, mỗi file đặt tên {user_id}.jpg/.png/.gif/.webp"),
+    db: AsyncSession = Depends(get_db),
+    _: str = Depends(deps.verify_admin_auth)
+):
+    """
+    Import ảnh đại diện sinh viên/giảng viên hàng loạt từ file ZIP. Yêu cầu quyền admin.
+
+    Mỗi file được khớp với hồ sơ theo tên (bỏ thư mục và đuôi); ảnh được lưu vào kho theo
+    nội dung và profile_image_url được cập nhật trong một transaction. Ảnh thu nhỏ/WebP được
+    sinh sau khi trả phản hồi.
+
+    Args:
+        background_tasks: Hàng đợi tác vụ sinh ảnh phái sinh
+        file: File ZIP
+        db: Database session
+        _: Admin authentication dependency
+
+    Returns:
+        dict: total, updated, unchanged, rejected và files (kết quả từng file: file, user_id,
+        status, detail là khóa ảnh hoặc lý do bị loại)
+    """
+    summary, created = await import_profile_images(db, file)
+    if created:
+        background_tasks.add_task(generate_derivatives_batch, profile_images.root, created)
+    return summary
+
+@router.get("/reports/{report_id}")
+async def download_import_report(report_id: str, _: str = Depends(deps.verify_admin_auth)):
+    """
+    Tải báo cáo các dòng bị loại của một lần import. Yêu cầu quyền admin.
+
+    Args:
+        report_id: ID báo cáo trả về từ endpoint import
+        _: Admin authentication dependency
+
+    Returns:
+        FileResponse: File CSV gồm số dòng, lý do và dữ liệu gốc
+    """
+    return FileResponse(report_path(report_id), media_type="text/csv", filename=f"import_errors_{report_id}.csv")
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 # Sử dụng nhà cung cấp DB bất đồng bộ (đã nhập sai app.api.session)
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
+from app.api.responses import wants_ndjson, stream_ndjson, rows_response, row_response
+from app.api.fields import sparse_fields, apply_fields
 from app.api import deps
 
 from app.models import LecturerProfile, Account
@@ -14,9 +16,11 @@ router = APIRouter()
 
 @router.get("/", response_model=List[LecturerProfileResponse])
 async def read_lecturer_profiles(
+    request: Request,
     skip: int = 0,
     limit: Optional[int] = None,
-    db: AsyncSession = Depends(get_db)
+    fields: Optional[List[str]] = Depends(sparse_fields(LecturerProfileResponse)),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     API endpoint lấy danh sách hồ sơ giảng viên với phân trang offset/limit.
@@ -24,8 +28,10 @@ async def read_lecturer_profiles(
     Hỗ trợ phân trang bằng offset/limit để tối ưu hiệu suất.
 
     Args:
+        request: Request (Accept: application/x-ndjson để stream từng dòng)
         skip: Số bản ghi bỏ qua (offset)
         limit: Số lượng bản ghi tối đa trả về
+        fields: Danh sách trường cần lấy (?fields=a,b), chiếu cột trong SQL
         db: Session database async
 
     Returns:
@@ -34,7 +40,12 @@ async def read_lecturer_profiles(
     query = select(LecturerProfile).order_by(LecturerProfile.user_id.asc()).offset(skip)
     if limit is not None:
         query = query.limit(limit)
+    query = apply_fields(query, LecturerProfile, fields)
+    if wants_ndjson(request):
+        return stream_ndjson(db, query, None if fields else LecturerProfileResponse)
     result = await db.execute(query)
+    if fields:
+        return rows_response(result)
     return result.scalars().all()
     result = await db.execute(query)
     return result.scalars().all()
@@ -68,9 +79,16 @@ async def create_lecturer_profile(
 @router.get("/{user_id}", response_model=LecturerProfileResponse)
 async def read_lecturer_profile_by_id(
     user_id: str,
-    db: AsyncSession = Depends(get_db)
+    fields: Optional[List[str]] = Depends(sparse_fields(LecturerProfileResponse)),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Lấy hồ sơ giảng viên theo ID người dùng."""
+    if fields:
+        result = await db.execute(apply_fields(select(LecturerProfile).where(LecturerProfile.user_id == user_id), LecturerProfile, fields))
+        row = result.first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Không tìm thấy hồ sơ giảng viên")
+        return row_response(row)
     profile = await db.get(LecturerProfile, user_id)
     if not profile:
         raise HTTPException(status_code=404, detail="Không tìm thấy hồ sơ giảng viên")
@@ -1,34 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import Optional
+from typing import List, Optional
 from app.api import deps
 from app.db.session import get_db
+from app.api.validation import Reference, ensure_references
+from app.api.responses import FastJSONResponse, records_response, project_record
+from app.api.fields import sparse_fields
+from app.core.reference_cache import majors
 from app.models import Major, Faculty
 from app.schemas import MajorResponse, MajorBase
 
 router = APIRouter()
 
 @router.get("/", response_model=list[MajorResponse])
-async def read_majors(skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+async def read_majors(request: Request, skip: int = 0, limit: Optional[int] = None, fields: Optional[List[str]] = Depends(sparse_fields(MajorResponse))):
     """Lấy danh sách chuyên ngành."""
-    query = select(Major).offset(skip)
-    if limit:
-        query = query.limit(limit)
-    result = await db.execute(query)
-    return result.scalars().all()
+    snapshot = await majors.snapshot()
+    return records_response(request, snapshot.page(skip, limit), fields)
 
 @router.get("/{major_id}", response_model=MajorResponse)
-async def read_major(major_id: str, db: AsyncSession = Depends(get_db)):
+async def read_major(major_id: str, fields: Optional[List[str]] = Depends(sparse_fields(MajorResponse))):
     """Lấy chuyên ngành theo ID."""
-    result = await db.execute(select(Major).where(Major.major_id == major_id))
-    major = result.scalars().first()
-    if not major:
+    major = (await majors.snapshot()).get(major_id)
+    if major is None:
         raise HTTPException(status_code=404, detail="Major not found")
-    return major
+    return FastJSONResponse(project_record(major, fields))
 
 @router.get("/faculty/{faculty_id}", response_model=list[MajorResponse])
-async def read_majors_by_faculty(faculty_id: str, skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+async def read_majors_by_faculty(faculty_id: str, skip: int = 0, limit: Optional[int] = None):
     """
     API endpoint lấy danh sách chuyên ngành theo khoa với phân trang offset/limit.
 
@@ -38,28 +37,31 @@ async def read_majors_by_faculty(faculty_id: str, skip: int = 0, limit: Optional
         faculty_id: ID khoa
         skip: Số bản ghi bỏ qua (offset)
         limit: Số lượng bản ghi tối đa trả về
-        db: Session database async
 
     Returns:
         List[MajorResponse]: Danh sách chuyên ngành của khoa
     """
-    query = select(Major).where(Major.faculty_id == faculty_id).order_by(Major.major_id.asc()).offset(skip)
-    if limit:
-        query = query.limit(limit)
-    result = await db.execute(query)
-    return result.scalars().all()
+    snapshot = await majors.snapshot()
+    rows = [major for major in snapshot.rows if major["faculty_id"] == faculty_id]
+    end = skip + limit if limit else None
+    return FastJSONResponse([project_record(major) for major in rows[skip:end]])
 
 @router.post("/", response_model=MajorResponse)
 async def create_major(data: MajorBase, db: AsyncSession = Depends(get_db), _: str = Depends(deps.verify_admin_auth)):
     """Tạo chuyên ngành mới."""
-    # Validate faculty exists
-    if not await db.get(Faculty, data.faculty_id):
-        raise HTTPException(status_code=400, detail="Faculty not found")
+    # Validate faculty exists và major_id chưa dùng trong một truy vấn
+    await ensure_references(
+        db,
+        Reference(Faculty.faculty_id, data.faculty_id, "Faculty not found"),
+        Reference(Major.major_id, data.major_id, "Major already exists", should_exist=False),
+    )
     
     obj = Major(**data.dict())
     db.add(obj)
+    await majors.publish(db, obj.major_id)
     await db.commit()
     await db.refresh(obj)
+    majors.put(obj)
     return obj
 
 @router.put("/{major_id}", response_model=MajorResponse)
@@ -70,16 +72,17 @@ async def update_major(major_id: str, data: MajorBase, db: AsyncSession = Depend
         raise HTTPException(status_code=404, detail="Major not found")
     
     # Validate faculty exists
-    if not await db.get(Faculty, data.faculty_id):
-        raise HTTPException(status_code=400, detail="Faculty not found")
+    await ensure_references(db, Reference(Faculty.faculty_id, data.faculty_id, "Faculty not found"))
     
     update_data = data.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(existing, field, value)
     
     try:
+        await majors.publish(db, major_id)
         await db.commit()
         await db.refresh(existing)
+        majors.put(existing, replaces=major_id)
         return existing
     except Exception as e:
         await db.rollback()
@@ -92,5 +95,7 @@ async def delete_major(major_id: str, db: AsyncSession = Depends(get_db), _: str
     if not existing:
         raise HTTPException(status_code=404, detail="Major not found")
     await db.delete(existing)
+    await majors.publish(db, major_id)
     await db.commit()
+    majors.discard(major_id)
     return {"message": f"Đã xóa chuyên ngành {major_id}"}
\ No newline at end of file
@@ -0,0 +1,27 @@
+"""
+Endpoints metrics vận hành cho admin.
+
+Cung cấp thống kê trực tiếp của pool kết nối database để tinh chỉnh dưới tải.
+"""
+
+from fastapi import APIRouter, Depends
+from app.api import deps
+from app.db.session import get_pool_statistics
+
+router = APIRouter()
+
+@router.get("/db_pool")
+async def read_db_pool_metrics(_: str = Depends(deps.verify_admin_auth)):
+    """
+    API endpoint lấy thống kê pool kết nối database. Yêu cầu quyền admin.
+
+    Bao gồm số kết nối đang dùng/rảnh, overflow, số request đang chờ kết nối,
+    số lần timeout và histogram thời gian chờ lấy kết nối.
+
+    Args:
+        _: Token xác thực admin
+
+    Returns:
+        dict: Thống kê pool của từng engine
+    """
+    return {"engines": get_pool_statistics()}
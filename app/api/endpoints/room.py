@@ -1,43 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from typing import Optional
+from sqlalchemy import delete
+from typing import List, Optional
 from app.api import deps
 from app.db.session import get_db
+from app.api.responses import FastJSONResponse, records_response, project_record
+from app.api.fields import sparse_fields
+from app.core.reference_cache import rooms
 from app.models import Room
 from app.schemas import RoomBase
 
 router = APIRouter()
 
 @router.get("/", response_model=list[RoomBase])
-async def list_rooms(skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+async def list_rooms(request: Request, skip: int = 0, limit: Optional[int] = None, fields: Optional[List[str]] = Depends(sparse_fields(RoomBase))):
     """
     API endpoint lấy danh sách phòng học với phân trang offset/limit.
 
     Hỗ trợ phân trang bằng offset/limit để tối ưu hiệu suất.
 
     Args:
+        request: Request (Accept: application/x-ndjson để stream từng dòng)
         skip: Số bản ghi bỏ qua (offset)
         limit: Số lượng bản ghi tối đa trả về
-        db: Session database async
+        fields: Danh sách trường cần lấy (?fields=a,b)
 
     Returns:
         List[RoomBase]: Danh sách các phòng học
     """
-    query = select(Room).order_by(Room.room_id.asc()).offset(skip)
-    if limit is not None:
-        query = query.limit(limit)
-    result = await db.execute(query)
-    return result.scalars().all()
+    snapshot = await rooms.snapshot()
+    return records_response(request, snapshot.page(skip, limit), fields)
 
 @router.get("/{room_id}", response_model=RoomBase)
-async def read_room(room_id: str, db: AsyncSession = Depends(get_db)):
+async def read_room(room_id: str, fields: Optional[List[str]] = Depends(sparse_fields(RoomBase))):
     """Lấy thông tin phòng cụ thể."""
-    result = await db.execute(select(Room).where(Room.room_id == room_id))
-    room = result.scalars().first()
-    if not room:
+    room = (await rooms.snapshot()).get(room_id)
+    if room is None:
         raise HTTPException(status_code=404, detail="Phòng không tồn tại")
-    return room
+    return FastJSONResponse(project_record(room, fields))
 
 @router.put("/{room_id}", response_model=RoomBase)
 async def update_room(room_id: str, data: RoomBase, db: AsyncSession = Depends(get_db), _: str = Depends(deps.verify_admin_auth)):
@@ -51,8 +51,10 @@ async def update_room(room_id: str, data: RoomBase, db: AsyncSession = Depends(g
         setattr(existing, field, value)
     
     try:
+        await rooms.publish(db, room_id)
         await db.commit()
         await db.refresh(existing)
+        rooms.put(existing, replaces=room_id)
         return existing
     except Exception as e:
         await db.rollback()
@@ -63,7 +65,9 @@ async def create_room(data: RoomBase, db: AsyncSession = Depends(get_db), _: str
     """Tạo phòng mới."""
     obj = Room(**data.dict())
     db.add(obj)
+    await rooms.publish(db, obj.room_id)
     await db.commit()
+    rooms.put(obj)
     return obj
 
 @router.delete("/{room_id}")
@@ -73,5 +77,7 @@ async def delete_room(room_id: str, db: AsyncSession = Depends(get_db), _: str =
     if not existing:
         raise HTTPException(status_code=404, detail="Phòng không tồn tại")
     await db.delete(existing)
+    await rooms.publish(db, room_id)
     await db.commit()
+    rooms.discard(room_id)
     return {"message": f"Đã xóa phòng {room_id}"}
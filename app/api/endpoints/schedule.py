@@ -1,34 +1,69 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from typing import Optional
+from sqlalchemy import select, delete, insert, update
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional
 from datetime import date
 from app.api import deps
-from app.db.session import get_db
-from app.models import Schedule, Subject, Room, User, ClassModel
-from app.schemas import ScheduleBase, ScheduleResponse
+from app.db.session import get_db, get_read_db
+from app.api.validation import Reference, ensure_references
+from app.api.responses import wants_ndjson, stream_ndjson, rows_response, row_response
+from app.api.fields import sparse_fields, project_columns
+from app.core.cache import cached
+from app.core.invalidation import publish
+from app.models import Schedule, ScheduleSeries, Subject, Room, User, ClassModel
+from app.schemas import ScheduleBase, ScheduleResponse, ScheduleSeriesCreate, ScheduleSeriesUpdate, ScheduleSeriesResponse, ScheduleConflictCheck
+from app.services.recurrence import expand_weekly
+from app.services.schedule_conflicts import Conflict, Slot, find_conflicts
 
 router = APIRouter()
 
-@router.get("/", response_model=list[ScheduleBase])
-async def get_schedules(skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
-    """Lấy danh sách lịch trình."""
+# Cột của bảng schedule, dùng cho các câu select theo cột (serialize thẳng từ row)
+SCHEDULE_COLUMNS = tuple(Schedule.__table__.columns)
+
+def schedule_slot(ref, data) -> Slot:
+    """
+    Buổi học cần kiểm tra trùng lịch từ lược đồ hoặc ORM object.
+    """
+    return Slot(ref, data.room_id, data.lecturer_id, data.class_id, data.learn_date, data.start_period, data.end_period)
+
+def raise_if_conflicts(conflicts: List[Conflict]) -> None:
+    """
+    Trả về 409 kèm danh sách lịch xung đột nếu có.
+    """
+    if conflicts:
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "message": "Trùng lịch phòng, giảng viên hoặc lớp",
+                "conflicts": jsonable_encoder([conflict.as_dict() for conflict in conflicts]),
+            },
+        )
+
+@router.get("/", response_model=list[ScheduleResponse])
+async def get_schedules(request: Request, skip: int = 0, limit: Optional[int] = None, fields: Optional[List[str]] = Depends(sparse_fields(ScheduleResponse)), db: AsyncSession = Depends(get_read_db)):
+    """Lấy danh sách lịch trình. Hỗ trợ ?fields= và stream NDJSON."""
     query = select(Schedule).order_by(Schedule.schedule_id.asc()).offset(skip)
     if limit is not None:
         query = query.limit(limit)
-    result = await db.execute(query)
-    return result.scalars().all()
+    columns = project_columns(Schedule, fields) if fields else SCHEDULE_COLUMNS
+    if wants_ndjson(request):
+        return stream_ndjson(db, query.with_only_columns(*columns), None)
+    result = await db.execute(query.with_only_columns(*columns))
+    return rows_response(result)
 
-@router.get("/{schedule_id}", response_model=ScheduleBase)
-async def read_schedule(schedule_id: int, db: AsyncSession = Depends(get_db)):
-    """Lấy thông tin lịch trình cụ thể."""
-    result = await db.execute(select(Schedule).where(Schedule.schedule_id == schedule_id))
-    schedule = result.scalars().first()
+@router.get("/{schedule_id}", response_model=ScheduleResponse)
+async def read_schedule(schedule_id: int, fields: Optional[List[str]] = Depends(sparse_fields(ScheduleResponse)), db: AsyncSession = Depends(get_read_db)):
+    """Lấy thông tin lịch trình cụ thể. Hỗ trợ ?fields=."""
+    columns = project_columns(Schedule, fields) if fields else SCHEDULE_COLUMNS
+    result = await db.execute(select(*columns).where(Schedule.schedule_id == schedule_id))
+    schedule = result.first()
     if not schedule:
         raise HTTPException(status_code=404, detail="Lịch trình không tồn tại")
-    return schedule
+    return row_response(schedule)
 
-@router.put("/{schedule_id}", response_model=ScheduleBase)
+@router.put("/{schedule_id}", response_model=ScheduleResponse)
 async def update_schedule(schedule_id: int, data: ScheduleBase, db: AsyncSession = Depends(get_db), _: str = Depends(deps.verify_admin_auth)):
     """Cập nhật lịch trình."""
     existing = await db.get(Schedule, schedule_id)
@@ -36,10 +71,17 @@ async def update_schedule(schedule_id: int, data: ScheduleBase, db: AsyncSession
         raise HTTPException(status_code=404, detail="Lịch trình không tồn tại")
     
     update_data = data.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(existing, field, value)
+    # Kiểm tra trên bản ghép, chưa gán vào ORM object: autoflush khi truy vấn trùng lịch sẽ gửi
+    # UPDATE ra ngoài khối try bên dưới
+    slot = schedule_slot(schedule_id, existing)._replace(**{field: update_data[field] for field in Slot._fields if field in update_data})
+    if slot.end_period < slot.start_period:
+        raise HTTPException(status_code=400, detail="end_period phải lớn hơn hoặc bằng start_period")
+    raise_if_conflicts(await find_conflicts(db, [slot], exclude_schedule_ids={schedule_id}))
     
     try:
+        for field, value in update_data.items():
+            setattr(existing, field, value)
+        await publish(db, "schedule")
         await db.commit()
         await db.refresh(existing)
         return existing
@@ -50,18 +92,21 @@ async def update_schedule(schedule_id: int, data: ScheduleBase, db: AsyncSession
 @router.post("/")
 async def add_schedule(data: ScheduleBase, db: AsyncSession = Depends(get_db), _: str = Depends(deps.verify_admin_auth)):
     """Tạo lịch trình mới."""
-    # Validate FK
-    if not await db.get(Subject, data.subject_id):
-        raise HTTPException(status_code=400, detail="Môn học không tồn tại")
-    if not await db.get(Room, data.room_id):
-        raise HTTPException(status_code=400, detail="Phòng không tồn tại")
-    if not await db.get(User, data.lecturer_id):
-        raise HTTPException(status_code=400, detail="Giảng viên không tồn tại")
-    if not await db.get(ClassModel, data.class_id):
-        raise HTTPException(status_code=400, detail="Lớp không tồn tại")
+    # Validate FK trong một truy vấn
+    await ensure_references(
+        db,
+        Reference(Subject.subject_id, data.subject_id, "Môn học không tồn tại"),
+        Reference(Room.room_id, data.room_id, "Phòng không tồn tại"),
+        Reference(User.user_id, data.lecturer_id, "Giảng viên không tồn tại"),
+        Reference(ClassModel.class_id, data.class_id, "Lớp không tồn tại"),
+    )
+    if data.end_period < data.start_period:
+        raise HTTPException(status_code=400, detail="end_period phải lớn hơn hoặc bằng start_period")
+    raise_if_conflicts(await find_conflicts(db, [schedule_slot(None, data)]))
     
     obj = Schedule(**data.dict())
     db.add(obj)
+    await publish(db, "schedule")
     await db.commit()
     return obj
 
@@ -72,26 +117,185 @@ async def delete_schedule(id: int, db: AsyncSession = Depends(get_db), _: str =
     if not existing:
         raise HTTPException(status_code=404, detail="Lịch trình không tồn tại")
     await db.delete(existing)
+    await publish(db, "schedule")
     await db.commit()
     return {"message": f"Đã xóa lịch trình {id}"}
 
-@router.get("/lecturer/{lecturer_id}", response_model=list[ScheduleBase])
-async def get_schedules_by_lecturer(lecturer_id: str, db: AsyncSession = Depends(get_db)):
+@router.get("/lecturer/{lecturer_id}", response_model=list[ScheduleResponse])
+async def get_schedules_by_lecturer(lecturer_id: str, db: AsyncSession = Depends(get_read_db)):
     """Lấy danh sách lịch trình theo giảng viên."""
-    query = select(Schedule).where(Schedule.lecturer_id == lecturer_id).order_by(Schedule.learn_date, Schedule.start_period)
+    query = select(*SCHEDULE_COLUMNS).where(Schedule.lecturer_id == lecturer_id).order_by(Schedule.learn_date, Schedule.start_period)
     result = await db.execute(query)
-    return result.scalars().all()
+    return rows_response(result)
 
-@router.get("/class/{class_id}", response_model=list[ScheduleBase])
-async def get_schedules_by_class(class_id: str, db: AsyncSession = Depends(get_db)):
+@router.get("/class/{class_id}", response_model=list[ScheduleResponse])
+async def get_schedules_by_class(class_id: str, db: AsyncSession = Depends(get_read_db)):
     """Lấy danh sách lịch trình theo lớp."""
-    query = select(Schedule).where(Schedule.class_id == class_id).order_by(Schedule.learn_date, Schedule.start_period)
+    query = select(*SCHEDULE_COLUMNS).where(Schedule.class_id == class_id).order_by(Schedule.learn_date, Schedule.start_period)
     result = await db.execute(query)
-    return result.scalars().all()
+    return rows_response(result)
 
-@router.get("/date/{learn_date}", response_model=list[ScheduleBase])
-async def get_schedules_by_date(learn_date: date, db: AsyncSession = Depends(get_db)):
+@router.get("/date/{learn_date}", response_model=list[ScheduleResponse])
+@cached("schedules", ttl=60, depends_on=("schedule",))
+async def get_schedules_by_date(learn_date: date, db: AsyncSession = Depends(get_read_db)):
     """Lấy danh sách lịch trình theo ngày."""
-    query = select(Schedule).where(Schedule.learn_date == learn_date).order_by(Schedule.start_period)
+    query = select(*SCHEDULE_COLUMNS).where(Schedule.learn_date == learn_date).order_by(Schedule.start_period)
     result = await db.execute(query)
-    return result.scalars().all()
+    return rows_response(result)
+
+@router.post("/conflicts/check")
+async def check_schedule_conflicts(items: List[ScheduleConflictCheck], db: AsyncSession = Depends(get_read_db)):
+    """
+    Kiểm tra trùng lịch (dry-run), không ghi dữ liệu.
+
+    Các buổi được kiểm tra theo thứ tự với lịch đã có và với các buổi trước trong
+    danh sách; buổi có schedule_id được coi là bản sửa của lịch đó.
+
+    Returns:
+        dict: Số buổi đã kiểm tra và danh sách xung đột (ref là vị trí trong danh sách)
+    """
+    for item in items:
+        if item.end_period < item.start_period:
+            raise HTTPException(status_code=400, detail="end_period phải lớn hơn hoặc bằng start_period")
+    slots = [schedule_slot(index, item) for index, item in enumerate(items)]
+    excluded = {item.schedule_id for item in items if item.schedule_id is not None}
+    conflicts = await find_conflicts(db, slots, exclude_schedule_ids=excluded)
+    return {"checked": len(slots), "conflicts": [conflict.as_dict() for conflict in conflicts]}
+
+# =================================================================
+# CHUỖI LỊCH LẶP HẰNG TUẦN
+# =================================================================
+
+async def get_series_or_404(db: AsyncSession, series_id: int) -> ScheduleSeries:
+    """
+    Lấy chuỗi lịch theo ID hoặc trả về 404.
+    """
+    series = await db.get(ScheduleSeries, series_id)
+    if not series:
+        raise HTTPException(status_code=404, detail="Chuỗi lịch không tồn tại")
+    return series
+
+@router.post("/series", response_model=ScheduleSeriesResponse)
+async def create_schedule_series(data: ScheduleSeriesCreate, db: AsyncSession = Depends(get_db), _: str = Depends(deps.verify_admin_auth)):
+    """
+    Tạo chuỗi lịch lặp hằng tuần và sinh toàn bộ buổi học trong một lần.
+
+    Các buổi được kiểm tra trùng phòng/giảng viên/lớp trong một lượt và chèn
+    hàng loạt; có xung đột thì không buổi nào được tạo (409).
+    """
+    await ensure_references(
+        db,
+        Reference(Subject.subject_id, data.subject_id, "Môn học không tồn tại"),
+        Reference(Room.room_id, data.room_id, "Phòng không tồn tại"),
+        Reference(User.user_id, data.lecturer_id, "Giảng viên không tồn tại"),
+        Reference(ClassModel.class_id, data.class_id, "Lớp không tồn tại"),
+    )
+    dates = expand_weekly(data.weekday, data.start_date, data.end_date, data.excluded_dates)
+    if not dates:
+        raise HTTPException(status_code=400, detail="Chuỗi lịch không có buổi học nào")
+    raise_if_conflicts(await find_conflicts(db, [
+        Slot(day, data.room_id, data.lecturer_id, data.class_id, day, data.start_period, data.end_period)
+        for day in dates
+    ]))
+
+    series = ScheduleSeries(**data.dict())
+    db.add(series)
+    await db.flush()
+    await db.execute(insert(Schedule), [
+        {
+            "subject_id": data.subject_id,
+            "room_id": data.room_id,
+            "lecturer_id": data.lecturer_id,
+            "class_id": data.class_id,
+            "learn_date": day,
+            "start_period": data.start_period,
+            "end_period": data.end_period,
+            "is_open": data.is_open,
+            "series_id": series.series_id,
+        } for day in dates
+    ])
+    await publish(db, "schedule")
+    await db.commit()
+    return ScheduleSeriesResponse(series_id=series.series_id, occurrences=dates, **data.dict())
+
+@router.get("/series/{series_id}", response_model=ScheduleSeriesResponse)
+async def read_schedule_series(series_id: int, db: AsyncSession = Depends(get_read_db)):
+    """Lấy chuỗi lịch kèm ngày các buổi học còn lại của chuỗi."""
+    series = await get_series_or_404(db, series_id)
+    result = await db.execute(
+        select(Schedule.learn_date).where(Schedule.series_id == series_id).order_by(Schedule.learn_date)
+    )
+    response = ScheduleSeriesResponse.model_validate(series)
+    response.occurrences = list(result.scalars())
+    return response
+
+@router.patch("/series/{series_id}", response_model=ScheduleSeriesResponse)
+async def update_schedule_series(
+    series_id: int,
+    data: ScheduleSeriesUpdate,
+    from_date: Optional[date] = Query(None, description="Chỉ áp dụng cho các buổi từ ngày này"),
+    db: AsyncSession = Depends(get_db),
+    _: str = Depends(deps.verify_admin_auth)
+):
+    """
+    Cập nhật đồng loạt các buổi của chuỗi bằng một câu UPDATE.
+
+    Đổi phòng, giảng viên hoặc tiết học được kiểm tra xung đột với các lịch khác
+    (không tính chính chuỗi) trước khi cập nhật.
+    """
+    series = await get_series_or_404(db, series_id)
+    changes = data.dict(exclude_unset=True, exclude_none=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="Không có trường nào để cập nhật")
+
+    merged = {**{key: getattr(series, key) for key in ("room_id", "lecturer_id", "start_period", "end_period")}, **changes}
+    if merged["end_period"] < merged["start_period"]:
+        raise HTTPException(status_code=400, detail="end_period phải lớn hơn hoặc bằng start_period")
+    await ensure_references(
+        db,
+        Reference(Subject.subject_id, changes.get("subject_id"), "Môn học không tồn tại"),
+        Reference(Room.room_id, changes.get("room_id"), "Phòng không tồn tại"),
+        Reference(User.user_id, changes.get("lecturer_id"), "Giảng viên không tồn tại"),
+    )
+
+    in_scope = [Schedule.series_id == series_id]
+    if from_date:
+        in_scope.append(Schedule.learn_date >= from_date)
+    if changes.keys() & {"room_id", "lecturer_id", "start_period", "end_period"}:
+        dates = list((await db.execute(select(Schedule.learn_date).where(*in_scope))).scalars())
+        raise_if_conflicts(await find_conflicts(db, [
+            Slot(day, merged["room_id"], merged["lecturer_id"], series.class_id, day, merged["start_period"], merged["end_period"])
+            for day in dates
+        ], exclude_series_id=series_id))
+
+    await db.execute(update(Schedule).where(*in_scope).values(**changes))
+    for key, value in changes.items():
+        setattr(series, key, value)
+    await publish(db, "schedule")
+    await db.commit()
+    return await read_schedule_series(series_id, db)
+
+@router.delete("/series/{series_id}")
+async def delete_schedule_series(
+    series_id: int,
+    from_date: Optional[date] = Query(None, description="Chỉ xóa các buổi từ ngày này"),
+    db: AsyncSession = Depends(get_db),
+    _: str = Depends(deps.verify_admin_auth)
+):
+    """
+    Xóa các buổi của chuỗi bằng một câu DELETE; không có from_date thì xóa cả chuỗi.
+    """
+    series = await get_series_or_404(db, series_id)
+    in_scope = [Schedule.series_id == series_id]
+    if from_date:
+        in_scope.append(Schedule.learn_date >= from_date)
+    try:
+        result = await db.execute(delete(Schedule).where(*in_scope))
+        if from_date is None:
+            await db.delete(series)
+        await publish(db, "schedule")
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Không thể xóa buổi học đã có điểm danh")
+    return {"message": f"Đã xóa {result.rowcount} buổi của chuỗi lịch {series_id}"}
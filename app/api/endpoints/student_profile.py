@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
 from app.api import deps
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
+from app.api.responses import wants_ndjson, stream_ndjson, rows_response, row_response
+from app.api.fields import sparse_fields, apply_fields
 from app.models import StudentProfile, Account
 from app.schemas import StudentProfileBase
 
@@ -11,9 +13,11 @@ router = APIRouter()
 
 @router.get("/", response_model=List[StudentProfileBase])
 async def read_student_profiles(
+    request: Request,
     skip: int = 0,
     limit: Optional[int] = None,
-    db: AsyncSession = Depends(get_db)
+    fields: Optional[List[str]] = Depends(sparse_fields(StudentProfileBase)),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     API endpoint lấy danh sách hồ sơ sinh viên với phân trang offset/limit.
@@ -21,8 +25,10 @@ async def read_student_profiles(
     Hỗ trợ phân trang bằng offset/limit để tối ưu hiệu suất.
 
     Args:
+        request: Request (Accept: application/x-ndjson để stream từng dòng)
         skip: Số bản ghi bỏ qua (offset)
         limit: Số lượng bản ghi tối đa trả về
+        fields: Danh sách trường cần lấy (?fields=a,b), chiếu cột trong SQL
         db: Session database async
 
     Returns:
@@ -31,12 +37,22 @@ async def read_student_profiles(
     query = select(StudentProfile).order_by(StudentProfile.user_id.asc()).offset(skip)
     if limit is not None:
         query = query.limit(limit)
+    query = apply_fields(query, StudentProfile, fields)
+    if wants_ndjson(request):
+        return stream_ndjson(db, query, None if fields else StudentProfileBase)
     result = await db.execute(query)
+    if fields:
+        return rows_response(result)
     return result.scalars().all()
 
 @router.get("/{user_id}", response_model=StudentProfileBase)
-async def get_profile(user_id: str, db: AsyncSession = Depends(get_db), _: str = Depends(deps.verify_admin_auth)):
+async def get_profile(user_id: str, fields: Optional[List[str]] = Depends(sparse_fields(StudentProfileBase)), db: AsyncSession = Depends(get_read_db), _: str = Depends(deps.verify_admin_auth)):
     """Lấy hồ sơ sinh viên theo ID người dùng."""
+    if fields:
+        result = await db.execute(apply_fields(select(StudentProfile).where(StudentProfile.user_id == user_id), StudentProfile, fields))
+        row = result.first()
+        if not row: raise HTTPException(404, "Not Found")
+        return row_response(row)
     res = await db.get(StudentProfile, user_id)
     if not res: raise HTTPException(404, "Not Found")
     return res
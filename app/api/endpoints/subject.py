@@ -1,43 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from typing import Optional
+from sqlalchemy import delete
+from typing import List, Optional
 from app.api import deps
 from app.db.session import get_db
+from app.api.responses import FastJSONResponse, records_response, project_record
+from app.api.fields import sparse_fields
+from app.core.reference_cache import subjects
 from app.models import Subject
 from app.schemas import SubjectBase
 
 router = APIRouter()
 
 @router.get("/", response_model=list[SubjectBase])
-async def list_subjects(skip: int = 0, limit: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+async def list_subjects(request: Request, skip: int = 0, limit: Optional[int] = None, fields: Optional[List[str]] = Depends(sparse_fields(SubjectBase))):
     """
     API endpoint lấy danh sách môn học với phân trang offset/limit.
 
     Hỗ trợ phân trang bằng offset/limit để tối ưu hiệu suất.
 
     Args:
+        request: Request (Accept: application/x-ndjson để stream từng dòng)
         skip: Số bản ghi bỏ qua (offset)
         limit: Số lượng bản ghi tối đa trả về
-        db: Session database async
+        fields: Danh sách trường cần lấy (?fields=a,b)
 
     Returns:
         List[SubjectBase]: Danh sách các môn học
     """
-    query = select(Subject).order_by(Subject.subject_id.asc()).offset(skip)
-    if limit is not None:
-        query = query.limit(limit)
-    result = await db.execute(query)
-    return result.scalars().all()
+    snapshot = await subjects.snapshot()
+    return records_response(request, snapshot.page(skip, limit), fields)
 
 @router.get("/{subject_id}", response_model=SubjectBase)
-async def read_subject(subject_id: str, db: AsyncSession = Depends(get_db)):
+async def read_subject(subject_id: str, fields: Optional[List[str]] = Depends(sparse_fields(SubjectBase))):
     """Lấy thông tin môn học cụ thể."""
-    result = await db.execute(select(Subject).where(Subject.subject_id == subject_id))
-    subject = result.scalars().first()
-    if not subject:
+    subject = (await subjects.snapshot()).get(subject_id)
+    if subject is None:
         raise HTTPException(status_code=404, detail="Môn học không tồn tại")
-    return subject
+    return FastJSONResponse(project_record(subject, fields))
 
 @router.put("/{subject_id}", response_model=SubjectBase)
 async def update_subject(subject_id: str, data: SubjectBase, db: AsyncSession = Depends(get_db), _: str = Depends(deps.verify_admin_auth)):
@@ -51,8 +51,10 @@ async def update_subject(subject_id: str, data: SubjectBase, db: AsyncSession =
         setattr(existing, field, value)
     
     try:
+        await subjects.publish(db, subject_id)
         await db.commit()
         await db.refresh(existing)
+        subjects.put(existing, replaces=subject_id)
         return existing
     except Exception as e:
         await db.rollback()
@@ -63,7 +65,9 @@ async def create_subject(data: SubjectBase, db: AsyncSession = Depends(get_db),
     """Tạo môn học mới."""
     obj = Subject(**data.dict())
     db.add(obj)
+    await subjects.publish(db, obj.subject_id)
     await db.commit()
+    subjects.put(obj)
     return obj
 
 @router.delete("/{subject_id}")
@@ -73,5 +77,7 @@ async def delete_subject(subject_id: str, db: AsyncSession = Depends(get_db), _:
     if not existing:
         raise HTTPException(status_code=404, detail="Môn học không tồn tại")
     await db.delete(existing)
+    await subjects.publish(db, subject_id)
     await db.commit()
+    subjects.discard(subject_id)
     return {"message": f"Đã xóa môn học {subject_id}"}
@@ -1,43 +1,128 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse
+import logging
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import os
 import shutil
 from pathlib import Path
 from app.api import deps
+from app.core.config import settings
 from app.db.session import get_db
 from app.models.student_profile import StudentProfile
 from app.models.lecturer_profile import LecturerProfile
+from app.services.file_serving import serve_file
+from app.services.fingerprint_enrollment import FINGERPRINT_IMAGES_DIR
+from app.services.storage import profile_images
+from app.services.upload_gc import collect_garbage
+from app.services.uploads import save_image
+from app.services.images import DERIVATIVE_SIZES, FORMAT_MEDIA_TYPES, derivative_format, ensure_derivative, generate_derivatives
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-UPLOAD_DIR = Path("uploads")
+# Phục vụ thư mục uploads (thay cho StaticFiles), gắn tại /uploads trong app/main.py
+static_router = APIRouter()
+
+UPLOAD_DIR = Path(settings.UPLOAD_DIR)
 UPLOAD_DIR.mkdir(exist_ok=True)
 
 # Tạo thư mục con cho các loại file khác nhau
-PROFILE_IMAGES_DIR = UPLOAD_DIR / "profile_images"
-FINGERPRINT_IMAGES_DIR = UPLOAD_DIR / "fingerprint_images"
-PROFILE_IMAGES_DIR.mkdir(exist_ok=True)
-FINGERPRINT_IMAGES_DIR.mkdir(exist_ok=True)
-
-@router.get("/profile_images/{filename}")
-async def get_profile_image(filename: str):
-    """Lấy ảnh đại diện từ thư mục profile_images."""
-    file_path = PROFILE_IMAGES_DIR / filename
-    
-    # Security check - chỉ cho phép lấy file trong thư mục profile_images
+PROFILE_IMAGES_DIR = profile_images.root
+PROFILE_IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+FINGERPRINT_IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+
+# Thư mục ảnh vân tay cũ trong uploads/ (trước khi chuyển ra FINGERPRINT_IMAGE_DIR)
+LEGACY_FINGERPRINT_DIR = "fingerprint_images"
+
+@router.get("/profile_images/{filename:path}")
+async def get_profile_image(
+    request: Request,
+    filename: str,
+    size: Optional[str] = Query(None, description=f"Cỡ ảnh thu nhỏ: {', '.join(DERIVATIVE_SIZES)}"),
+    image_format: Optional[str] = Query(None, alias="format", description="webp hoặc original; mặc định WebP nếu Accept hỗ trợ"),
+):
+    """
+    Lấy ảnh đại diện từ thư mục profile_images, tùy chọn bản thu nhỏ/WebP.
+
+    Ảnh phái sinh được sinh trong process pool và lưu trên đĩa khi chưa có. Ảnh định địa
+    chỉ theo nội dung được trả với Cache-Control: immutable; hỗ trợ If-None-Match và Range.
+
+    Args:
+        request: Request (header Accept dùng để chọn WebP khi không chỉ định format)
+        filename: Khóa ảnh gốc trong kho (ab/cd/{sha256}.{đuôi}, hoặc tên file ảnh cũ)
+        size: Cỡ ảnh thu nhỏ, bỏ trống để lấy kích thước gốc
+        image_format: webp để lấy bản WebP, original để giữ định dạng gốc
+
+    Returns:
+        Response: Ảnh gốc hoặc ảnh phái sinh (200/206/304)
+    """
+    # Security check - chỉ cho phép lấy file trong kho profile_images
+    try:
+        file_path = profile_images.path(filename)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Đường dẫn không hợp lệ")
+
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="Ảnh không tồn tại")
     
     if not file_path.is_file():
         raise HTTPException(status_code=400, detail="Đường dẫn không hợp lệ")
-    
-    return FileResponse(path=file_path, media_type="image/jpeg")
+
+    if size is not None and size not in DERIVATIVE_SIZES:
+        raise HTTPException(status_code=400, detail=f"Cỡ ảnh không hợp lệ (chọn: {', '.join(DERIVATIVE_SIZES)})")
+    if image_format not in (None, "webp", "original"):
+        raise HTTPException(status_code=400, detail="format chỉ nhận webp hoặc original")
+
+    negotiated = image_format is None and size is not None
+    webp = image_format == "webp" or (negotiated and "image/webp" in request.headers.get("accept", ""))
+    if size is None and not webp:
+        tag = profile_images.immutable_tag(file_path)
+        return await serve_file(request, file_path, etag=tag, immutable=tag is not None)
+
+    try:
+        derivative = await ensure_derivative(PROFILE_IMAGES_DIR, filename, size, webp)
+    except Exception as e:
+        logger.error("Lỗi sinh ảnh phái sinh %s: %s", filename, e)
+        raise HTTPException(status_code=500, detail="Không xử lý được ảnh")
+    media_type = FORMAT_MEDIA_TYPES[derivative_format(file_path, webp)]
+    tag = profile_images.immutable_tag(derivative)
+    return await serve_file(
+        request, derivative, media_type=media_type, etag=tag, immutable=tag is not None,
+        headers={"Vary": "Accept"} if negotiated else None,
+    )
+
+@static_router.api_route("/{file_path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_uploaded_file(request: Request, file_path: str):
+    """
+    Trả file trong thư mục uploads với ETag, Range và Cache-Control: immutable cho file
+    định địa chỉ theo nội dung.
+    """
+    root = UPLOAD_DIR.resolve()
+    full_path = (root / file_path).resolve()
+    # Security check - chỉ trong thư mục uploads, không lộ file tạm/ẩn
+    if root not in full_path.parents or any(part.startswith(".") for part in full_path.relative_to(root).parts):
+        raise HTTPException(status_code=404, detail="File không tồn tại")
+    # Ảnh vân tay cũ còn nằm trong uploads/ chỉ đọc được qua endpoint có xác thực
+    if full_path.relative_to(root).parts[0] == LEGACY_FINGERPRINT_DIR:
+        raise HTTPException(status_code=404, detail="File không tồn tại")
+    if not full_path.is_file():
+        raise HTTPException(status_code=404, detail="File không tồn tại")
+    tag = profile_images.immutable_tag(full_path)
+    return await serve_file(request, full_path, etag=tag, immutable=tag is not None)
 
 @router.get("/fingerprint_images/{filename}")
-async def get_fingerprint_image(filename: str):
-    """Lấy ảnh vân tay từ thư mục fingerprint_images."""
+async def get_fingerprint_image(
+    request: Request,
+    filename: str,
+    _: bool = Depends(deps.verify_device_or_admin)
+):
+    """
+    Lấy ảnh vân tay gốc. Yêu cầu API key thiết bị hoặc quyền admin.
+
+    Ảnh nằm ngoài UPLOAD_DIR (FINGERPRINT_IMAGE_DIR) nên không lộ qua /uploads.
+    """
     file_path = FINGERPRINT_IMAGES_DIR / filename
     
     # Security check - chỉ cho phép lấy file trong thư mục fingerprint_images
@@ -46,12 +131,14 @@ async def get_fingerprint_image(filename: str):
     
     if not file_path.is_file():
         raise HTTPException(status_code=400, detail="Đường dẫn không hợp lệ")
-    
-    return FileResponse(path=file_path, media_type="image/jpeg")
+
+    # Dữ liệu sinh trắc: không cho proxy/cache dùng chung giữ lại
+    return await serve_file(request, file_path, headers={"Cache-Control": "private, no-cache"})
 
 @router.post("/student_profile_image/{student_id}")
 async def upload_student_profile_image(
     student_id: str,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db),
     _: str = Depends(deps.verify_admin_auth)
@@ -64,46 +151,35 @@ async def upload_student_profile_image(
     if not student_profile:
         raise HTTPException(status_code=404, detail="Không tìm thấy hồ sơ sinh viên")
 
-    # Validate file type
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="Chỉ chấp nhận file ảnh")
-
-    # Validate file size (max 5MB)
-    content = await file.read()
-    file_size = len(content)
-
-    if file_size > 5 * 1024 * 1024:  # 5MB
-        raise HTTPException(status_code=400, detail="File quá lớn (tối đa 5MB)")
-
-    # Generate filename
-    file_extension = Path(file.filename).suffix.lower()
-    if file_extension not in [".jpg", ".jpeg", ".png", ".gif"]:
-        raise HTTPException(status_code=400, detail="Định dạng file không hỗ trợ")
-
-    filename = f"{student_id}_profile{file_extension}"
-    file_path = PROFILE_IMAGES_DIR / filename
-
-    # Save file
+    # Stream vào file tạm, kiểm tra dung lượng và loại ảnh theo magic bytes, lưu theo hash nội dung
     try:
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
-    except Exception as e:
+        stored = await save_image(file, profile_images)
+    except OSError as e:
         raise HTTPException(status_code=500, detail=f"Lỗi lưu file: {str(e)}")
+    # Sinh trước thumbnail/WebP sau khi trả phản hồi (ảnh trùng nội dung đã có sẵn)
+    if stored.created:
+        background_tasks.add_task(generate_derivatives, PROFILE_IMAGES_DIR, stored.key)
 
     # Update profile_image_url in database
-    student_profile.profile_image_url = filename
+    previous = student_profile.profile_image_url
+    student_profile.profile_image_url = stored.key
     await db.commit()
 
+    # Xóa ảnh cũ nếu không còn hồ sơ nào dùng
+    if previous and previous != stored.key:
+        await profile_images.release(db, previous)
+
     return {
-        "filename": filename,
-        "url": filename,
-        "size": file_size,
+        "filename": stored.key,
+        "url": stored.key,
+        "size": stored.size,
         "message": "Upload ảnh đại diện sinh viên thành công"
     }
 
 @router.post("/lecturer_profile_image/{lecturer_id}")
 async def upload_lecturer_profile_image(
     lecturer_id: str,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db),
     _: str = Depends(deps.verify_admin_auth)
@@ -116,43 +192,53 @@ async def upload_lecturer_profile_image(
     if not lecturer_profile:
         raise HTTPException(status_code=404, detail="Không tìm thấy hồ sơ giảng viên")
 
-    # Validate file type
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="Chỉ chấp nhận file ảnh")
-
-    # Validate file size (max 5MB)
-    content = await file.read()
-    file_size = len(content)
-
-    if file_size > 5 * 1024 * 1024:  # 5MB
-        raise HTTPException(status_code=400, detail="File quá lớn (tối đa 5MB)")
-
-    # Generate filename
-    file_extension = Path(file.filename).suffix.lower()
-    if file_extension not in [".jpg", ".jpeg", ".png", ".gif"]:
-        raise HTTPException(status_code=400, detail="Định dạng file không hỗ trợ")
-
-    filename = f"{lecturer_id}_profile{file_extension}"
-    file_path = PROFILE_IMAGES_DIR / filename
-
-    # Save file
+    # Stream vào file tạm, kiểm tra dung lượng và loại ảnh theo magic bytes, lưu theo hash nội dung
     try:
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
-    except Exception as e:
+        stored = await save_image(file, profile_images)
+    except OSError as e:
         raise HTTPException(status_code=500, detail=f"Lỗi lưu file: {str(e)}")
+    # Sinh trước thumbnail/WebP sau khi trả phản hồi (ảnh trùng nội dung đã có sẵn)
+    if stored.created:
+        background_tasks.add_task(generate_derivatives, PROFILE_IMAGES_DIR, stored.key)
 
     # Update profile_image_url in database
-    lecturer_profile.profile_image_url = filename
+    previous = lecturer_profile.profile_image_url
+    lecturer_profile.profile_image_url = stored.key
     await db.commit()
 
+    # Xóa ảnh cũ nếu không còn hồ sơ nào dùng
+    if previous and previous != stored.key:
+        await profile_images.release(db, previous)
+
     return {
-        "filename": filename,
-        "url": filename,
-        "size": file_size,
+        "filename": stored.key,
+        "url": stored.key,
+        "size": stored.size,
         "message": "Upload ảnh đại diện giảng viên thành công"
     }
 
+@router.post("/gc")
+async def collect_orphaned_files(
+    dry_run: bool = Query(True, description="Chỉ báo cáo, không xóa"),
+    db: AsyncSession = Depends(get_db),
+    _: str = Depends(deps.verify_admin_auth)
+):
+    """
+    Dọn ảnh đại diện không còn hồ sơ nào tham chiếu. Yêu cầu quyền admin.
+
+    Chỉ xóa file không đổi trong UPLOAD_GC_GRACE giây, theo lô có giới hạn tốc độ.
+    Mặc định chạy thử (dry_run) để xem trước.
+
+    Args:
+        dry_run: True để chỉ báo cáo
+        db: Database session
+        _: Admin authentication dependency
+
+    Returns:
+        dict: scanned, orphaned, deleted, bytes, dry_run và sample (một phần đường dẫn)
+    """
+    return await collect_garbage(db, dry_run=dry_run)
+
 @router.delete("/files/{file_path:path}")
 async def delete_uploaded_file(
     file_path: str,
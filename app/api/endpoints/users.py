@@ -1,34 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete
-from typing import Optional
+from typing import List, Optional
 from app.api import deps
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
+from app.api.responses import wants_ndjson, stream_ndjson, rows_response, row_response
+from app.api.fields import sparse_fields, apply_fields
 from app.models import User, Account
 from app.schemas import UserCreate, UserResponse, UserBase, UserUpdate
 
 router = APIRouter()
 
 @router.get("/", response_model=list[UserBase])
-async def read_users(skip: int = 0, limit: Optional[int] = None, role: Optional[str] = None, db: AsyncSession = Depends(get_db)):
-    """Lấy danh sách người dùng với phân trang."""
+async def read_users(request: Request, skip: int = 0, limit: Optional[int] = None, role: Optional[str] = None, fields: Optional[List[str]] = Depends(sparse_fields(UserBase)), db: AsyncSession = Depends(get_read_db)):
+    """Lấy danh sách người dùng với phân trang. Hỗ trợ stream NDJSON."""
     if role:
         query = select(User).join(Account).where(Account.role == role).order_by(User.user_id.asc()).offset(skip)
     else:
         query = select(User).order_by(User.user_id.asc()).offset(skip)
     if limit is not None:
         query = query.limit(limit)
+    query = apply_fields(query, User, fields)
+    if wants_ndjson(request):
+        return stream_ndjson(db, query, None if fields else UserBase)
     result = await db.execute(query)
+    if fields:
+        return rows_response(result)
     return result.scalars().all()
 
 @router.get("/{user_id}", response_model=UserBase)
-async def read_user(user_id: str, db: AsyncSession = Depends(get_db)):
+async def read_user(user_id: str, fields: Optional[List[str]] = Depends(sparse_fields(UserBase)), db: AsyncSession = Depends(get_read_db)):
     """Lấy thông tin của một người dùng cụ thể."""
-    result = await db.execute(select(User).where(User.user_id == user_id))
-    user = result.scalars().first()
+    query = apply_fields(select(User).where(User.user_id == user_id), User, fields)
+    result = await db.execute(query)
+    user = result.first() if fields else result.scalars().first()
     if not user:
         raise HTTPException(status_code=404, detail="Người dùng không tồn tại")
-    return user
+    return row_response(user) if fields else user
 
 @router.post("/", response_model=UserBase)
 async def create_user(user_in: UserCreate, db: AsyncSession = Depends(get_db), _: str = Depends(deps.verify_admin_auth)):
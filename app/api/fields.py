@@ -0,0 +1,70 @@
+"""
+Sparse fieldsets cho các endpoint CRUD (?fields=a,b,c).
+
+Validate danh sách trường theo lược đồ phản hồi và đẩy phép chiếu cột xuống SQL,
+giảm I/O database, chi phí dựng ORM và kích thước payload cùng lúc.
+"""
+
+from typing import Callable, Dict, List, Optional, Type
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+
+def sparse_fields(schema: Type[BaseModel]) -> Callable[..., Optional[List[str]]]:
+    """
+    Tạo dependency đọc query parameter `fields` và validate theo lược đồ.
+
+    Args:
+        schema: Lược đồ Pydantic định nghĩa các trường được phép chọn
+
+    Returns:
+        Callable: Dependency trả về danh sách trường (giữ thứ tự, bỏ trùng) hoặc None
+    """
+    allowed = list(schema.model_fields)
+
+    def dependency(
+        fields: Optional[str] = Query(
+            None,
+            description=f"Danh sách trường cần lấy, phân tách bằng dấu phẩy: {', '.join(allowed)}"
+        )
+    ) -> Optional[List[str]]:
+        if not fields:
+            return None
+        requested = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in requested if f not in allowed]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Trường không hợp lệ: {', '.join(unknown)}")
+        return requested or None
+
+    return dependency
+
+def project_columns(model, fields: List[str], aliases: Optional[Dict[str, str]] = None) -> list:
+    """
+    Ánh xạ danh sách trường của lược đồ sang cột của mô hình ORM.
+
+    Args:
+        model: Lớp mô hình ORM
+        fields: Danh sách trường đã validate
+        aliases: Ánh xạ tên trường lược đồ -> tên thuộc tính mô hình khi khác nhau
+
+    Returns:
+        list: Các cột đã đặt nhãn theo tên trường, dùng cho select(*columns)
+    """
+    aliases = aliases or {}
+    return [getattr(model, aliases.get(field, field)).label(field) for field in fields]
+
+def apply_fields(query, model, fields: Optional[List[str]], aliases: Optional[Dict[str, str]] = None):
+    """
+    Thu hẹp câu select về các cột được yêu cầu (giữ nguyên where/join/order/offset/limit).
+
+    Args:
+        query: Câu select gốc
+        model: Lớp mô hình ORM
+        fields: Danh sách trường đã validate, None để giữ nguyên câu select
+        aliases: Ánh xạ tên trường lược đồ -> tên thuộc tính mô hình khi khác nhau
+
+    Returns:
+        Select: Câu select đã chiếu cột (hoặc câu select gốc)
+    """
+    if not fields:
+        return query
+    return query.with_only_columns(*project_columns(model, fields, aliases))
@@ -0,0 +1,202 @@
+"""
+Lớp phản hồi dùng chung cho các endpoint danh sách.
+
+Cung cấp đường serialize nhanh bằng orjson và TypeAdapter biên dịch sẵn cho các lược đồ,
+serialize trực tiếp từ row tuple không qua ORM, và chế độ NDJSON (Accept: application/x-ndjson)
+để stream toàn bộ bảng theo từng dòng thay vì dựng toàn bộ danh sách trong bộ nhớ.
+"""
+
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, AsyncIterator, Iterable, List, Mapping, Optional, Sequence, Type
+import orjson
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy.engine import Result, Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Số dòng lấy từ server-side cursor mỗi lượt
+STREAM_BATCH_SIZE = 1000
+
+class FastJSONResponse(Response):
+    """
+    Phản hồi JSON encode bằng orjson.
+
+    Nhận nội dung là bytes đã serialize sẵn (trả nguyên) hoặc object Python (encode bằng orjson).
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return orjson.dumps(content, default=_default)
+
+def _default(obj: Any) -> Any:
+    """
+    Encoder bổ sung cho các kiểu orjson không hỗ trợ sẵn.
+
+    Args:
+        obj: Giá trị cần encode
+
+    Returns:
+        Any: Giá trị tương đương orjson encode được
+
+    Raises:
+        TypeError: Nếu kiểu dữ liệu không được hỗ trợ
+    """
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Không thể serialize kiểu {type(obj).__name__}")
+
+@lru_cache(maxsize=None)
+def item_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    """
+    TypeAdapter biên dịch sẵn cho một bản ghi của lược đồ (cache theo lược đồ).
+    """
+    return TypeAdapter(schema)
+
+@lru_cache(maxsize=None)
+def list_adapter(schema: Type[BaseModel]) -> TypeAdapter:
+    """
+    TypeAdapter biên dịch sẵn cho danh sách bản ghi của lược đồ (cache theo lược đồ).
+    """
+    return TypeAdapter(list[schema])
+
+def dump_rows(keys: Iterable[str], rows: Sequence[Sequence[Any]]) -> bytes:
+    """
+    Serialize danh sách row tuple thành mảng JSON object.
+
+    Args:
+        keys: Tên cột theo thứ tự trong row
+        rows: Các row trả về từ câu select theo cột
+
+    Returns:
+        bytes: Mảng JSON
+    """
+    keys = list(keys)
+    return orjson.dumps([dict(zip(keys, row)) for row in rows], default=_default)
+
+def rows_response(result: Result) -> FastJSONResponse:
+    """
+    Tạo phản hồi JSON trực tiếp từ kết quả select theo cột, không dựng ORM instance
+    và không validate lại qua response_model.
+
+    Args:
+        result: Kết quả của câu select(*columns)
+
+    Returns:
+        FastJSONResponse: Mảng JSON các bản ghi
+    """
+    return FastJSONResponse(dump_rows(result.keys(), result.all()))
+
+def row_response(row: Row) -> FastJSONResponse:
+    """
+    Tạo phản hồi JSON object từ một row của câu select theo cột.
+
+    Args:
+        row: Row kết quả
+
+    Returns:
+        FastJSONResponse: JSON object với khóa là tên cột
+    """
+    return FastJSONResponse(dict(row._mapping))
+
+def orm_response(objs: Sequence[Any], schema: Type[BaseModel]) -> FastJSONResponse:
+    """
+    Tạo phản hồi JSON từ ORM objects qua TypeAdapter biên dịch sẵn.
+
+    Validate một lượt (from_attributes) rồi dump thẳng ra bytes, bỏ qua bước
+    jsonable_encoder + json.dumps của response_model mặc định.
+
+    Args:
+        objs: Danh sách ORM objects
+        schema: Lược đồ Pydantic của phản hồi
+
+    Returns:
+        FastJSONResponse: Mảng JSON các bản ghi
+    """
+    adapter = list_adapter(schema)
+    return FastJSONResponse(adapter.dump_json(adapter.validate_python(objs, from_attributes=True)))
+
+def project_record(record: Mapping[str, Any], fields: Optional[List[str]] = None) -> dict:
+    """
+    Chuyển bản ghi trong bộ nhớ (ví dụ cache danh mục) thành dict, chỉ giữ các trường yêu cầu.
+
+    Args:
+        record: Bản ghi dạng mapping
+        fields: Danh sách trường đã validate (?fields=), None để giữ tất cả
+
+    Returns:
+        dict: Bản ghi orjson encode được
+    """
+    if not fields:
+        return dict(record)
+    return {field: record[field] for field in fields}
+
+def records_response(request: Request, records: Iterable[Mapping[str, Any]], fields: Optional[List[str]] = None) -> Response:
+    """
+    Tạo phản hồi danh sách từ bản ghi trong bộ nhớ, hỗ trợ NDJSON và sparse fieldsets
+    như các phản hồi đọc từ database.
+
+    Args:
+        request: FastAPI request object
+        records: Các bản ghi dạng mapping
+        fields: Danh sách trường đã validate, None để giữ tất cả
+
+    Returns:
+        Response: Mảng JSON hoặc NDJSON
+    """
+    if wants_ndjson(request):
+        body = b"".join(
+            orjson.dumps(project_record(record, fields), default=_default) + b"\n" for record in records
+        )
+        return Response(body, media_type=NDJSON_MEDIA_TYPE)
+    return FastJSONResponse([project_record(record, fields) for record in records])
+
+def wants_ndjson(request: Request) -> bool:
+    """
+    Kiểm tra client có yêu cầu phản hồi dạng NDJSON hay không.
+
+    Args:
+        request: FastAPI request object
+
+    Returns:
+        bool: True nếu header Accept chứa application/x-ndjson
+    """
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def stream_ndjson(db: AsyncSession, query: Select, schema: Optional[Type[BaseModel]]) -> StreamingResponse:
+    """
+    Tạo phản hồi NDJSON stream từng dòng kết quả của query qua server-side cursor.
+
+    Session stream được mở riêng trên cùng engine với session của request, vì session
+    của dependency get_db đóng lại trước khi body phản hồi được gửi đi.
+
+    Args:
+        db: Session database của request (dùng để lấy engine)
+        query: Câu lệnh select trả về ORM entity, hoặc select theo cột khi schema là None
+        schema: Lược đồ Pydantic dùng để serialize mỗi entity; None để serialize thẳng row
+
+    Returns:
+        StreamingResponse: Phản hồi với mỗi bản ghi là một dòng JSON
+    """
+    bind = db.bind
+    adapter = item_adapter(schema) if schema is not None else None
+
+    async def generate() -> AsyncIterator[bytes]:
+        async with AsyncSession(bind=bind, expire_on_commit=False) as session:
+            result = await session.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+            if adapter is None:
+                async for row in result.mappings():
+                    yield orjson.dumps(dict(row), default=_default) + b"\n"
+                return
+            async for obj in result.scalars():
+                yield adapter.dump_json(adapter.validate_python(obj, from_attributes=True)) + b"\n"
+
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE)
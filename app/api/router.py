@@ -24,7 +24,9 @@ from app.api.endpoints import (
     fingerprint,
     device,
     dashboard,
-    upload
+    upload,
+    metrics,
+    imports
 )
 
 # Khởi tạo router chính
@@ -55,6 +57,13 @@ api_router.include_router(
     tags=["Hardware"]
 )
 
+# Metrics vận hành cho admin
+api_router.include_router(
+    metrics.router,
+    prefix="/admin/metrics",
+    tags=["Admin Metrics"]
+)
+
 # =================================================================
 # HỒ SƠ NGƯỜI DÙNG
 # =================================================================
@@ -155,6 +164,13 @@ api_router.include_router(
     tags=["Course Registrations"]
 )
 
+# Import CSV hàng loạt
+api_router.include_router(
+    imports.router,
+    prefix="/imports",
+    tags=["Bulk Import"]
+)
+
 # Dashboard và phân tích
 api_router.include_router(
     dashboard.router,
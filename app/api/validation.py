@@ -0,0 +1,50 @@
+"""
+Kiểm tra khóa tham chiếu cho các endpoint ghi.
+
+Gộp mọi kiểm tra tồn tại (khóa ngoại, trùng khóa chính) của một request vào một câu
+SELECT EXISTS(...), EXISTS(...) duy nhất thay vì mỗi khóa một lần db.get.
+"""
+
+from typing import Any, List, NamedTuple
+from fastapi import HTTPException
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+class Reference(NamedTuple):
+    """
+    Một kiểm tra tồn tại.
+
+    Attributes:
+        column: Cột khóa của bảng được tham chiếu (ví dụ Subject.subject_id)
+        value: Giá trị cần kiểm tra; None thì bỏ qua (khóa ngoại nullable)
+        detail: Thông báo lỗi 400 khi kiểm tra không đạt
+        should_exist: True nếu giá trị phải tồn tại, False nếu phải chưa tồn tại
+    """
+    column: InstrumentedAttribute
+    value: Any
+    detail: str
+    should_exist: bool = True
+
+async def ensure_references(db: AsyncSession, *references: Reference) -> None:
+    """
+    Kiểm tra tất cả tham chiếu trong một round-trip.
+
+    Args:
+        db: Database session
+        *references: Các kiểm tra theo thứ tự ưu tiên báo lỗi
+
+    Raises:
+        HTTPException: 400 với detail của kiểm tra đầu tiên không đạt
+    """
+    checks: List[Reference] = [ref for ref in references if ref.value is not None]
+    if not checks:
+        return
+    query = select(*(
+        exists().where(ref.column == ref.value).label(f"ref_{index}")
+        for index, ref in enumerate(checks)
+    ))
+    row = (await db.execute(query)).one()
+    for ref, found in zip(checks, row):
+        if found != ref.should_exist:
+            raise HTTPException(status_code=400, detail=ref.detail)
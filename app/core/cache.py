@@ -0,0 +1,385 @@
+"""
+Cache phản hồi cho các endpoint GET.
+
+Decorator cached() lưu phản hồi đã serialize (bytes) theo khóa dựng từ tham số của
+endpoint, hết hạn sau ttl giây. Backend mặc định là LRU/TTL trong tiến trình; backend
+ngoài (dùng chung giữa các worker) cắm qua KeyValueBackend với client tương thích một
+tập con của redis.asyncio.Redis, LocalKeyValueStore là bản thay thế trong tiến trình
+để chạy thử đường đi đó không cần hạ tầng.
+
+Khi nhiều request trượt cache cùng một khóa (200 người mở dashboard lúc 08:00), chỉ một
+request tính toán, các request còn lại chờ kết quả đó (single-flight). Namespace được xóa
+khi các bảng phụ thuộc thay đổi qua bus app.core.invalidation.
+"""
+
+import asyncio
+import fnmatch
+import functools
+import hashlib
+import inspect
+import logging
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, NamedTuple, Optional, Protocol, Set, Tuple
+import orjson
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from app.core import invalidation
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Hàm dựng khóa từ tham số đã bind của endpoint
+KeyBuilder = Callable[[Dict[str, Any]], str]
+
+# Kiểu tham số được đưa vào khóa mặc định (bỏ qua session, request, ...)
+KEY_TYPES = (str, int, float, bool, date, datetime, Enum, type(None))
+
+class CacheBackend:
+    """
+    Giao diện backend lưu phản hồi đã serialize.
+    """
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError
+
+    async def clear(self, prefix: str = "") -> None:
+        """
+        Xóa mọi khóa bắt đầu bằng prefix.
+        """
+        raise NotImplementedError
+
+class MemoryBackend(CacheBackend):
+    """
+    LRU có TTL trong tiến trình.
+
+    Attributes:
+        max_entries: Số khóa tối đa; khóa dùng lâu nhất bị loại trước
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def clear(self, prefix: str = "") -> None:
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+class KeyValueClient(Protocol):
+    """
+    Tập con API của redis.asyncio.Redis mà KeyValueBackend dùng.
+    """
+
+    async def get(self, name: str) -> Optional[bytes]: ...
+
+    async def set(self, name: str, value: bytes, px: Optional[int] = None) -> Any: ...
+
+    async def delete(self, *names: str) -> int: ...
+
+    def scan_iter(self, match: Optional[str] = None) -> AsyncIterator[Any]: ...
+
+class KeyValueBackend(CacheBackend):
+    """
+    Backend trên kho key-value ngoài, dùng chung giữa các worker.
+
+    Attributes:
+        client: Client tương thích KeyValueClient
+    """
+
+    # Số khóa mỗi lệnh DELETE khi xóa theo prefix
+    DELETE_BATCH_SIZE = 500
+
+    def __init__(self, client: KeyValueClient):
+        self.client = client
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.client.set(key, value, px=max(1, int(ttl * 1000)))
+
+    async def clear(self, prefix: str = "") -> None:
+        batch = []
+        async for key in self.client.scan_iter(match=f"{prefix}*"):
+            batch.append(key)
+            if len(batch) >= self.DELETE_BATCH_SIZE:
+                await self.client.delete(*batch)
+                batch = []
+        if batch:
+            await self.client.delete(*batch)
+
+class LocalKeyValueStore:
+    """
+    Kho key-value trong tiến trình cài đặt KeyValueClient, thay cho Redis khi phát
+    triển và kiểm thử KeyValueBackend.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Optional[float], bytes]] = {}
+
+    def _alive(self, name: str) -> bool:
+        entry = self._data.get(name)
+        if entry is None:
+            return False
+        if entry[0] is not None and entry[0] <= time.monotonic():
+            del self._data[name]
+            return False
+        return True
+
+    async def get(self, name: str) -> Optional[bytes]:
+        return self._data[name][1] if self._alive(name) else None
+
+    async def set(self, name: str, value: bytes, px: Optional[int] = None) -> bool:
+        expires_at = time.monotonic() + px / 1000 if px is not None else None
+        self._data[name] = (expires_at, value)
+        return True
+
+    async def delete(self, *names: str) -> int:
+        return sum(self._data.pop(name, None) is not None for name in names)
+
+    async def scan_iter(self, match: Optional[str] = None) -> AsyncIterator[str]:
+        for name in list(self._data):
+            if self._alive(name) and (match is None or fnmatch.fnmatchcase(name, match)):
+                yield name
+
+class CachedResponse(NamedTuple):
+    """
+    Phản hồi đã serialize để lưu cache.
+    """
+    status_code: int
+    media_type: str
+    body: bytes
+
+    def dumps(self) -> bytes:
+        return f"{self.status_code}\n{self.media_type}\n".encode() + self.body
+
+    @classmethod
+    def loads(cls, data: bytes) -> "CachedResponse":
+        status_code, media_type, body = data.split(b"\n", 2)
+        return cls(int(status_code), media_type.decode(), body)
+
+    def response(self, state: str) -> Response:
+        return Response(self.body, status_code=self.status_code, media_type=self.media_type, headers={"X-Cache": state})
+
+def to_cached(result: Any) -> Optional[CachedResponse]:
+    """
+    Serialize kết quả của endpoint; None nếu không cache được (stream, lỗi, ...).
+    """
+    if isinstance(result, StreamingResponse):
+        return None
+    if isinstance(result, Response):
+        if result.status_code != 200:
+            return None
+        return CachedResponse(result.status_code, result.headers.get("content-type", "application/json"), bytes(result.body))
+    return CachedResponse(200, "application/json", orjson.dumps(jsonable_encoder(result)))
+
+class ResponseCache:
+    """
+    Cache phản hồi với single-flight và xóa theo namespace.
+
+    Khóa chứa phiên bản trong tiến trình (thế hệ toàn cục và epoch của namespace): xóa
+    tăng phiên bản ngay lập tức nên khóa cũ không còn được đọc và kết quả đang tính từ
+    trước thời điểm xóa không được lưu, sau đó các khóa cũ được xóa trên backend.
+    """
+
+    def __init__(self, backend: CacheBackend, prefix: str = ""):
+        self.backend = backend
+        self.prefix = prefix
+        self._generation = 0
+        self._epochs: Dict[str, int] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _version(self, namespace: str) -> str:
+        return f"{self._generation}.{self._epochs.get(namespace, 0)}"
+
+    def key(self, namespace: str, suffix: str) -> str:
+        return f"{self.prefix}{namespace}:{self._version(namespace)}:{suffix}"
+
+    async def _get(self, key: str) -> Optional[CachedResponse]:
+        try:
+            data = await self.backend.get(key)
+        except Exception as e:
+            logger.warning("Lỗi đọc cache %s: %s", key, e)
+            return None
+        return CachedResponse.loads(data) if data is not None else None
+
+    async def _set(self, key: str, value: CachedResponse, ttl: float) -> None:
+        try:
+            await self.backend.set(key, value.dumps(), ttl)
+        except Exception as e:
+            logger.warning("Lỗi ghi cache %s: %s", key, e)
+
+    async def fetch(self, namespace: str, suffix: str, ttl: float, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Lấy phản hồi từ cache hoặc tính một lần cho mọi request trượt cùng khóa.
+
+        Args:
+            namespace: Namespace của khóa
+            suffix: Phần khóa dựng từ tham số
+            ttl: Thời gian sống (giây)
+            compute: Hàm tính kết quả khi trượt cache
+
+        Returns:
+            Any: Response từ cache, hoặc kết quả gốc nếu không cache được
+        """
+        key = self.key(namespace, suffix)
+        cached = await self._get(key)
+        if cached is not None:
+            return cached.response("HIT")
+
+        future = self._inflight.get(key)
+        if future is not None:
+            try:
+                cached = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Request dẫn đầu bị hủy: tự tính; nếu chính request này bị hủy thì dừng
+                if not future.cancelled():
+                    raise
+                cached = None
+            if cached is not None:
+                return cached.response("HIT")
+            return await compute()
+
+        version = self._version(namespace)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await compute()
+            cached = to_cached(result)
+            future.set_result(cached)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Đánh dấu đã đọc để không log cảnh báo khi không có request nào chờ
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        if cached is None:
+            return result
+        if self._version(namespace) == version:
+            await self._set(key, cached, ttl)
+        return cached.response("MISS")
+
+    def _spawn(self, coroutine: Awaitable[None]) -> None:
+        try:
+            task = asyncio.get_running_loop().create_task(coroutine)
+        except RuntimeError:
+            # Không có event loop (gọi từ ngữ cảnh đồng bộ ngoài ứng dụng)
+            coroutine.close()
+            return
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _clear(self, prefix: str) -> None:
+        try:
+            await self.backend.clear(prefix)
+        except Exception as e:
+            logger.warning("Lỗi xóa cache %s: %s", prefix, e)
+
+    def invalidate(self, namespace: str) -> None:
+        """
+        Xóa mọi khóa của namespace.
+        """
+        self._epochs[namespace] = self._epochs.get(namespace, 0) + 1
+        self._spawn(self._clear(f"{self.prefix}{namespace}:"))
+
+    def invalidate_all(self) -> None:
+        """
+        Xóa toàn bộ cache phản hồi.
+        """
+        self._generation += 1
+        self._spawn(self._clear(self.prefix))
+
+def build_backend() -> CacheBackend:
+    """
+    Tạo backend theo CACHE_BACKEND: "memory", "local-kv" (KeyValueBackend trên
+    LocalKeyValueStore) hoặc "redis" (cần gói redis và CACHE_URL).
+    """
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryBackend(settings.CACHE_MAX_ENTRIES)
+    if settings.CACHE_BACKEND == "local-kv":
+        return KeyValueBackend(LocalKeyValueStore())
+    if settings.CACHE_BACKEND == "redis":
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis cần cài gói redis") from e
+        if not settings.CACHE_URL:
+            raise RuntimeError("CACHE_BACKEND=redis cần CACHE_URL")
+        return KeyValueBackend(redis_asyncio.from_url(settings.CACHE_URL))
+    raise RuntimeError(f"CACHE_BACKEND không hợp lệ: {settings.CACHE_BACKEND}")
+
+response_cache = ResponseCache(build_backend(), settings.CACHE_KEY_PREFIX)
+invalidation.subscribe_flush(response_cache.invalidate_all)
+
+def default_key(func: Callable, params: Dict[str, Any]) -> str:
+    """
+    Khóa mặc định: tên endpoint và các tham số kiểu đơn giản (path, query), bỏ qua
+    dependency như session database.
+    """
+    values = {
+        name: value for name, value in sorted(params.items())
+        if isinstance(value, KEY_TYPES) or (isinstance(value, (list, tuple)) and all(isinstance(v, KEY_TYPES) for v in value))
+    }
+    raw = orjson.dumps([func.__module__, func.__qualname__, values], default=str)
+    return hashlib.sha1(raw).hexdigest()
+
+def cached(namespace: str, ttl: float, key_builder: Optional[KeyBuilder] = None, depends_on: Iterable[str] = ()):
+    """
+    Decorator cache phản hồi của route handler (đặt dưới @router.get).
+
+    Handler phải trả Response hoặc giá trị serialize được thành JSON; phản hồi khác 200,
+    StreamingResponse và lỗi không được cache.
+
+    Args:
+        namespace: Namespace của khóa, dùng để xóa theo nhóm
+        ttl: Thời gian sống (giây)
+        key_builder: Hàm dựng khóa từ tham số; mặc định dùng các tham số kiểu đơn giản
+        depends_on: Các bảng mà thay đổi (qua app.core.invalidation) sẽ xóa namespace
+
+    Returns:
+        Callable: Decorator giữ nguyên chữ ký handler cho FastAPI
+    """
+    for table in depends_on:
+        invalidation.subscribe(table, lambda key: response_cache.invalidate(namespace))
+
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            params = signature.bind_partial(*args, **kwargs).arguments
+            suffix = key_builder(params) if key_builder else default_key(func, params)
+            return await response_cache.fetch(namespace, suffix, ttl, lambda: func(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
@@ -5,7 +5,7 @@ Quản lý cấu hình type-safe sử dụng Pydantic, load từ file .env.
 """
 
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 
 class Settings(BaseSettings):
     """
@@ -13,6 +13,52 @@ class Settings(BaseSettings):
 
     Attributes:
         DATABASE_URL: Chuỗi kết nối PostgreSQL async
+        DB_POOL_SIZE: Số kết nối thường trực trong pool
+        DB_MAX_OVERFLOW: Số kết nối vượt pool_size được phép mở thêm
+        DB_POOL_TIMEOUT: Thời gian tối đa (giây) chờ lấy kết nối từ pool
+        DB_POOL_RECYCLE: Tuổi tối đa (giây) của kết nối trước khi mở lại
+        DB_POOL_PRE_PING: Kiểm tra kết nối còn sống trước khi dùng (sau failover)
+        DB_STATEMENT_CACHE_SIZE: Kích thước cache prepared statement của asyncpg (0 để tắt)
+        DATABASE_REPLICA_URLS: Danh sách chuỗi kết nối read replica (rỗng để tắt)
+        REPLICA_STICKY_SECONDS: Thời gian (giây) client đọc từ primary sau khi ghi
+        REPLICA_MAX_LAG_SECONDS: Độ trễ replica tối đa trước khi chuyển đọc về primary
+        REPLICA_LAG_CHECK_INTERVAL: Chu kỳ (giây) kiểm tra độ trễ replica
+        ATTENDANCE_PARTITIONS_AHEAD: Số tháng tạo sẵn partition điểm danh phía trước
+        ATTENDANCE_PARTITION_CHECK_INTERVAL: Chu kỳ (giây) bảo trì partition điểm danh
+        ATTENDANCE_RETENTION_MONTHS: Số tháng giữ partition trong bảng (None để không tự tách)
+        ARCHIVE_DIR: Thư mục kho lưu trữ Parquet của điểm danh cũ
+        ARCHIVE_TIMEZONE: Múi giờ chia tháng và lọc ngày của điểm danh lưu trữ
+        IMPORT_REPORT_DIR: Thư mục lưu báo cáo dòng bị loại khi import CSV
+        IMPORT_MAX_BYTES: Dung lượng tối đa của một request import (CSV hoặc ZIP ảnh)
+        IMPORT_MAX_ZIP_ENTRIES: Số mục tối đa trong file ZIP ảnh đại diện
+        INVALIDATION_CHANNEL: Kênh LISTEN/NOTIFY vô hiệu hóa cache giữa các worker
+        INVALIDATION_HEARTBEAT_INTERVAL: Chu kỳ (giây) kiểm tra kết nối LISTEN còn sống
+        INVALIDATION_RECONNECT_DELAY: Thời gian (giây) chờ trước khi kết nối LISTEN lại
+        CACHE_BACKEND: Backend cache phản hồi: memory, local-kv hoặc redis
+        CACHE_URL: Chuỗi kết nối kho key-value ngoài (khi CACHE_BACKEND=redis)
+        CACHE_MAX_ENTRIES: Số khóa tối đa của cache phản hồi trong tiến trình
+        CACHE_KEY_PREFIX: Tiền tố khóa cache phản hồi
+        UPLOAD_DIR: Thư mục lưu file upload
+        UPLOAD_MAX_BYTES: Dung lượng tối đa của một file upload
+        UPLOAD_CHUNK_SIZE: Kích thước chunk (byte) khi ghi file upload ra đĩa
+        UPLOAD_RELEASE_GRACE: Thời gian (giây) giữ file vừa ghi trước khi được xóa khi hết tham chiếu
+        UPLOAD_GC_INTERVAL: Chu kỳ (giây) dọn file upload không còn tham chiếu (None để tắt)
+        UPLOAD_GC_GRACE: Thời gian (giây) file không đổi trước khi được dọn
+        UPLOAD_GC_BATCH_SIZE: Số file mỗi lô xóa khi dọn
+        UPLOAD_GC_BATCH_DELAY: Thời gian (giây) nghỉ giữa các lô xóa
+        FILE_DELIVERY: Cách gửi file upload: direct, x-accel-redirect (nginx) hoặc x-sendfile (Apache)
+        FILE_ACCEL_PREFIX: Location internal của nginx ánh xạ tới UPLOAD_DIR (chế độ x-accel-redirect)
+        FILE_IMMUTABLE_MAX_AGE: max-age (giây) của file định địa chỉ theo nội dung
+        IMAGE_PROCESS_WORKERS: Số process sinh ảnh thu nhỏ/WebP
+        PROFILE_IMAGE_IMPORT_WORKERS: Số worker song song lưu ảnh khi import ZIP ảnh đại diện
+        FINGERPRINT_MIN_QUALITY: Điểm chất lượng (0-100) tối thiểu để nhận một lần quét vân tay
+        FINGERPRINT_TEMPLATE_MAX_BYTES: Dung lượng tối đa của template vân tay
+        FINGERPRINT_IMAGE_DIR: Thư mục lưu ảnh vân tay gốc (ngoài UPLOAD_DIR, không phục vụ công khai)
+        OFFLINE_BUNDLE_DIR: Thư mục lưu gói dữ liệu ngoại tuyến của máy chấm công (ngoài UPLOAD_DIR)
+        OFFLINE_BUNDLE_INTERVAL: Chu kỳ (giây) dựng lại gói ngoại tuyến (None để tắt tác vụ nền)
+        OFFLINE_BUNDLE_DAYS_AHEAD: Số ngày tới được dựng sẵn gói ngoại tuyến, ngoài hôm nay
+        OFFLINE_BUNDLE_SIGNING_KEY: Khóa HMAC ký gói ngoại tuyến (None để dùng HARDWARE_API_KEY)
+        IMAGE_QUALITY: Chất lượng nén JPEG/WebP của ảnh phái sinh
         SECRET_KEY: Key ký JWT cho authentication
         HARDWARE_API_KEY: API key xác thực thiết bị phần cứng
         ADMIN_USERNAME: Username admin mặc định
@@ -24,6 +70,76 @@ class Settings(BaseSettings):
     # Cấu hình database
     DATABASE_URL: str
 
+    # Cấu hình pool kết nối database
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 30
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
+    # Cấu hình read replica
+    DATABASE_REPLICA_URLS: List[str] = []
+    REPLICA_STICKY_SECONDS: float = 5.0
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_LAG_CHECK_INTERVAL: float = 2.0
+
+    # Cấu hình phân vùng bảng điểm danh
+    ATTENDANCE_PARTITIONS_AHEAD: int = 3
+    ATTENDANCE_PARTITION_CHECK_INTERVAL: float = 3600.0
+    ATTENDANCE_RETENTION_MONTHS: Optional[int] = None
+
+    # Cấu hình lưu trữ lạnh điểm danh
+    ARCHIVE_DIR: str = "archive"
+    ARCHIVE_TIMEZONE: str = "UTC"
+
+    # Cấu hình import hàng loạt
+    IMPORT_REPORT_DIR: str = "import_reports"
+    IMPORT_MAX_BYTES: int = 200 * 1024 * 1024
+    IMPORT_MAX_ZIP_ENTRIES: int = 20000
+
+    # Cấu hình bus vô hiệu hóa cache
+    INVALIDATION_CHANNEL: str = "cache_invalidation"
+    INVALIDATION_HEARTBEAT_INTERVAL: float = 30.0
+    INVALIDATION_RECONNECT_DELAY: float = 5.0
+
+    # Cấu hình cache phản hồi
+    CACHE_BACKEND: str = "memory"
+    CACHE_URL: Optional[str] = None
+    CACHE_MAX_ENTRIES: int = 2048
+    CACHE_KEY_PREFIX: str = "bas:"
+
+    # Cấu hình upload file
+    UPLOAD_DIR: str = "uploads"
+    UPLOAD_MAX_BYTES: int = 5 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024
+    UPLOAD_RELEASE_GRACE: int = 600
+    UPLOAD_GC_INTERVAL: Optional[float] = 6 * 3600
+    UPLOAD_GC_GRACE: int = 24 * 3600
+    UPLOAD_GC_BATCH_SIZE: int = 500
+    UPLOAD_GC_BATCH_DELAY: float = 0.5
+
+    # Cấu hình phục vụ file upload
+    FILE_DELIVERY: str = "direct"
+    FILE_ACCEL_PREFIX: str = "/internal/uploads/"
+    FILE_IMMUTABLE_MAX_AGE: int = 365 * 24 * 3600
+
+    # Cấu hình ảnh phái sinh
+    IMAGE_PROCESS_WORKERS: int = 2
+    IMAGE_QUALITY: int = 80
+    PROFILE_IMAGE_IMPORT_WORKERS: int = 4
+
+    # Cấu hình đăng ký vân tay
+    FINGERPRINT_MIN_QUALITY: int = 40
+    FINGERPRINT_TEMPLATE_MAX_BYTES: int = 64 * 1024
+    FINGERPRINT_IMAGE_DIR: str = "fingerprint_images"
+
+    # Cấu hình gói dữ liệu ngoại tuyến
+    OFFLINE_BUNDLE_DIR: str = "offline_bundles"
+    OFFLINE_BUNDLE_INTERVAL: Optional[float] = 1800.0
+    OFFLINE_BUNDLE_DAYS_AHEAD: int = 1
+    OFFLINE_BUNDLE_SIGNING_KEY: Optional[str] = None
+
     # Keys bảo mật
     SECRET_KEY: str
     HARDWARE_API_KEY: str
@@ -0,0 +1,155 @@
+"""
+Bus vô hiệu hóa cache giữa các worker qua PostgreSQL LISTEN/NOTIFY.
+
+Mỗi worker giữ một kết nối asyncpg riêng (ngoài pool) LISTEN trên kênh
+INVALIDATION_CHANNEL. Endpoint ghi gọi publish() trong transaction của mình; PostgreSQL
+chỉ phát thông báo khi transaction commit (rollback thì không phát), nên worker khác
+không bao giờ xóa cache trước khi dữ liệu mới thấy được. Trong worker phát, các callback
+được gọi ngay sau khi session commit (event after_commit), trừ callback chỉ-từ-xa (cache đã
+ghi xuyên như cache danh mục); thông báo của chính worker nhận lại qua LISTEN bị bỏ qua.
+
+Khi mất kết nối LISTEN, các thông báo trong lúc mất có thể bị lỡ: sau mỗi lần kết nối
+(lại) mọi cache đã đăng ký bị xóa toàn bộ.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+import asyncpg
+import orjson
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Định danh tiến trình, dùng để bỏ qua thông báo của chính mình
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Callback nhận khóa thay đổi (None nếu cả bảng thay đổi)
+KeyHandler = Callable[[Optional[str]], None]
+
+# Khóa trong Session.info chứa các thay đổi chờ commit
+PENDING_KEY = "invalidation_pending"
+
+_handlers: Dict[str, List[Tuple[KeyHandler, bool]]] = {}
+_flush_handlers: List[Callable[[], None]] = []
+
+def subscribe(table: str, handler: KeyHandler, remote_only: bool = False) -> None:
+    """
+    Đăng ký callback khi bảng thay đổi.
+
+    Args:
+        table: Tên bảng
+        handler: Hàm đồng bộ nhận khóa thay đổi (None nếu không rõ khóa)
+        remote_only: Chỉ gọi khi thay đổi đến từ worker khác (cache tự ghi xuyên)
+    """
+    _handlers.setdefault(table, []).append((handler, remote_only))
+
+def subscribe_flush(handler: Callable[[], None]) -> None:
+    """
+    Đăng ký callback xóa toàn bộ cache khi có thể đã lỡ thông báo.
+    """
+    _flush_handlers.append(handler)
+
+async def publish(db: AsyncSession, table: str, key: Optional[str] = None) -> None:
+    """
+    Phát sự kiện thay đổi trong transaction hiện tại; gọi trước db.commit().
+
+    Worker khác nhận khi transaction commit; worker hiện tại gọi callback ngay sau commit.
+
+    Args:
+        db: Session đang ghi
+        table: Tên bảng thay đổi
+        key: Khóa chính bản ghi thay đổi (None nếu nhiều bản ghi)
+    """
+    payload = orjson.dumps({"o": ORIGIN, "t": table, "k": key}).decode()
+    await db.execute(select(func.pg_notify(settings.INVALIDATION_CHANNEL, payload)))
+    db.sync_session.info.setdefault(PENDING_KEY, []).append((table, key))
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_committed(session: Session) -> None:
+    for table, key in session.info.pop(PENDING_KEY, ()):
+        dispatch(table, key, remote=False)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
+
+def dispatch(table: str, key: Optional[str], remote: bool = True) -> None:
+    """
+    Gọi các callback của bảng; lỗi của một callback không chặn các callback khác.
+
+    Args:
+        table: Tên bảng thay đổi
+        key: Khóa thay đổi
+        remote: True nếu thay đổi đến từ worker khác
+    """
+    for handler, remote_only in _handlers.get(table, ()):
+        if remote_only and not remote:
+            continue
+        try:
+            handler(key)
+        except Exception as e:
+            logger.error("Lỗi xử lý vô hiệu hóa cache %s: %s", table, e)
+
+def flush_all() -> None:
+    """
+    Xóa toàn bộ cache đã đăng ký.
+    """
+    for handler in _flush_handlers:
+        try:
+            handler()
+        except Exception as e:
+            logger.error("Lỗi xóa cache: %s", e)
+
+def _on_notification(connection, pid: int, channel: str, payload: str) -> None:
+    try:
+        message = orjson.loads(payload)
+    except orjson.JSONDecodeError:
+        logger.warning("Bỏ qua thông báo vô hiệu hóa không hợp lệ: %s", payload)
+        return
+    if message.get("o") == ORIGIN:
+        return
+    dispatch(message["t"], message.get("k"))
+
+def _listener_dsn() -> str:
+    # asyncpg nhận URL postgresql:// thuần, không có hậu tố driver của SQLAlchemy
+    return make_url(settings.DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+
+async def listen_for_invalidations() -> None:
+    """
+    Vòng lặp nền giữ kết nối LISTEN, tự kết nối lại khi mất kết nối.
+
+    Kết nối được kiểm tra định kỳ bằng SELECT 1 để phát hiện kết nối TCP chết im lặng.
+    """
+    interval = settings.INVALIDATION_HEARTBEAT_INTERVAL
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(_listener_dsn())
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _: closed.set())
+            await connection.add_listener(settings.INVALIDATION_CHANNEL, _on_notification)
+            # Thay đổi trước khi LISTEN có hiệu lực có thể đã bị lỡ
+            flush_all()
+            while not closed.is_set():
+                try:
+                    await asyncio.wait_for(closed.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    await connection.fetchval("SELECT 1", timeout=interval)
+            logger.warning("Mất kết nối LISTEN vô hiệu hóa cache")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Lỗi kết nối LISTEN vô hiệu hóa cache: %s", e)
+        finally:
+            if connection is not None and not connection.is_closed():
+                connection.terminate()
+        flush_all()
+        await asyncio.sleep(settings.INVALIDATION_RECONNECT_DELAY)
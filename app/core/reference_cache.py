@@ -0,0 +1,195 @@
+"""
+Cache dữ liệu danh mục trong tiến trình.
+
+Các bảng danh mục (khoa, chuyên ngành, cấp độ giáo dục, lớp, môn học, phòng) chỉ thay đổi
+vài lần mỗi học kỳ nhưng được đọc liên tục, cả trực tiếp lẫn làm bảng join trong báo cáo.
+Mỗi bảng được nạp toàn bộ vào một snapshot bất biến (MappingProxyType) lúc khởi động;
+endpoint GET đọc thẳng từ snapshot, endpoint ghi thay snapshot mới sau khi commit
+(copy-on-write, gán một tham chiếu nên người đọc không bao giờ thấy trạng thái dở dang).
+Worker khác nhận thay đổi qua bus LISTEN/NOTIFY (app.core.invalidation) và bỏ snapshot
+của bảng đó để nạp lại ở lần đọc sau. Lần nạp lại luôn đọc từ primary: replica có thể chưa
+nhận transaction vừa phát NOTIFY, và snapshot cũ sẽ nằm lại cho đến lần ghi kế tiếp.
+"""
+
+import logging
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import invalidation
+from app.db.session import AsyncSessionLocal
+from app.models import Faculty, Major, EducationLevel, ClassModel, Subject, Room
+
+logger = logging.getLogger(__name__)
+
+Record = Mapping[str, Any]
+
+class ReferenceSnapshot:
+    """
+    Ảnh chụp bất biến của một bảng danh mục.
+
+    Attributes:
+        by_id: Bản ghi theo khóa chính
+        rows: Bản ghi sắp theo khóa chính (dùng cho phân trang)
+    """
+
+    __slots__ = ("by_id", "rows")
+
+    def __init__(self, records: Iterable[Record], key: str):
+        ordered = sorted(records, key=lambda record: record[key])
+        self.rows: Tuple[Record, ...] = tuple(MappingProxyType(dict(record)) for record in ordered)
+        self.by_id: Mapping[str, Record] = MappingProxyType({record[key]: record for record in self.rows})
+
+    def get(self, key: str) -> Optional[Record]:
+        return self.by_id.get(key)
+
+    def page(self, skip: int = 0, limit: Optional[int] = None) -> Tuple[Record, ...]:
+        """
+        Cắt trang theo offset/limit như câu select gốc (limit rỗng hoặc 0 là không giới hạn, giống `if limit:` ở các router).
+        """
+        end = skip + limit if limit else None
+        return self.rows[skip:end]
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+class ReferenceTable:
+    """
+    Cache một bảng danh mục.
+
+    Attributes:
+        model: Lớp mô hình ORM
+        key: Tên cột khóa chính
+        columns: Tên các cột được cache
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.key = inspect(model).primary_key[0].key
+        self.columns = [attr.key for attr in inspect(model).column_attrs]
+        self._snapshot: Optional[ReferenceSnapshot] = None
+
+    @property
+    def name(self) -> str:
+        return self.model.__tablename__
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def record(self, obj) -> Dict[str, Any]:
+        """
+        Chuyển ORM object thành bản ghi cache.
+        """
+        return {column: getattr(obj, column) for column in self.columns}
+
+    async def load(self, db: AsyncSession) -> ReferenceSnapshot:
+        """
+        Nạp lại toàn bộ bảng và thay snapshot.
+        """
+        columns = [getattr(self.model, column) for column in self.columns]
+        result = await db.execute(select(*columns))
+        snapshot = ReferenceSnapshot(result.mappings().all(), self.key)
+        self._snapshot = snapshot
+        return snapshot
+
+    async def snapshot(self) -> ReferenceSnapshot:
+        """
+        Snapshot hiện tại; nạp từ primary nếu chưa có (khởi động lỗi hoặc vừa bị xóa cache).
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            async with AsyncSessionLocal() as db:
+                snapshot = await self.load(db)
+        return snapshot
+
+    def current(self) -> Optional[ReferenceSnapshot]:
+        """
+        Snapshot hiện tại hoặc None nếu chưa nạp (không truy vấn db).
+        """
+        return self._snapshot
+
+    def put(self, obj, replaces: Optional[str] = None) -> None:
+        """
+        Ghi xuyên một bản ghi vừa tạo/cập nhật (gọi sau khi commit).
+
+        Args:
+            obj: ORM object đã commit
+            replaces: Khóa cũ khi khóa chính bị đổi
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return
+        records = dict(snapshot.by_id)
+        if replaces is not None:
+            records.pop(replaces, None)
+        record = self.record(obj)
+        records[record[self.key]] = record
+        self._snapshot = ReferenceSnapshot(records.values(), self.key)
+
+    def discard(self, key: str) -> None:
+        """
+        Bỏ một bản ghi vừa xóa (gọi sau khi commit).
+        """
+        snapshot = self._snapshot
+        if snapshot is None or key not in snapshot.by_id:
+            return
+        self._snapshot = ReferenceSnapshot(
+            (record for record_key, record in snapshot.by_id.items() if record_key != key), self.key
+        )
+
+    async def publish(self, db: AsyncSession, key: Optional[str] = None) -> None:
+        """
+        Báo worker khác bỏ snapshot của bảng; gọi trong transaction ghi, trước commit.
+        """
+        await invalidation.publish(db, self.name, key)
+
+    def clear(self) -> None:
+        """
+        Xóa snapshot; lần đọc sau sẽ nạp lại từ primary.
+        """
+        self._snapshot = None
+
+    def lookup(self, key: Optional[str], column: str) -> Any:
+        """
+        Giá trị một cột của bản ghi theo khóa (thay cho join), None nếu không có.
+        """
+        snapshot = self._snapshot
+        record = snapshot.get(key) if snapshot is not None and key is not None else None
+        return record[column] if record is not None else None
+
+faculties = ReferenceTable(Faculty)
+majors = ReferenceTable(Major)
+education_levels = ReferenceTable(EducationLevel)
+classes = ReferenceTable(ClassModel)
+subjects = ReferenceTable(Subject)
+rooms = ReferenceTable(Room)
+
+REFERENCE_TABLES: Dict[str, ReferenceTable] = {
+    table.name: table for table in (faculties, majors, education_levels, classes, subjects, rooms)
+}
+
+def clear_reference_data() -> None:
+    """
+    Bỏ snapshot của mọi bảng danh mục.
+    """
+    for table in REFERENCE_TABLES.values():
+        table.clear()
+
+for _table in REFERENCE_TABLES.values():
+    invalidation.subscribe(_table.name, lambda key, table=_table: table.clear(), remote_only=True)
+invalidation.subscribe_flush(clear_reference_data)
+
+async def load_reference_data(db: AsyncSession) -> None:
+    """
+    Nạp tất cả bảng danh mục (gọi lúc khởi động).
+
+    Lỗi không chặn khởi động: bảng chưa nạp được sẽ nạp lười ở lần đọc đầu tiên.
+    """
+    for table in REFERENCE_TABLES.values():
+        try:
+            await table.load(db)
+        except Exception as e:
+            await db.rollback()
+            logger.error("Không nạp được cache danh mục %s: %s", table.name, e)
+
@@ -0,0 +1,493 @@
+"""
+Lưu trữ lạnh dữ liệu điểm danh cũ dưới dạng Parquet.
+
+Mỗi partition tháng đã đóng được tách khỏi bảng attendance (DETACH, chỉ sửa catalog) rồi
+xuất ra file Parquet (nén zstd, sắp theo user_id để thống kê row group cho phép bỏ qua dữ
+liệu của người khác khi đọc), kèm tên lớp/môn/phòng tại thời điểm lưu trữ, và bị DROP sau
+khi manifest đã ghi file. Không có DELETE hàng loạt nên không giữ khóa dòng lâu hay sinh
+WAL/bloat theo số dòng. DETACH ... CONCURRENTLY không dùng được vì bảng có partition mặc
+định; DETACH thường cần khóa ACCESS EXCLUSIVE trên bảng cha trong chốc lát nên chạy với
+lock_timeout ngắn và thử lại. Partition đã tách trước đó (ATTENDANCE_RETENTION_MONTHS hoặc
+scripts.attendance_partitions detach) cũng được xuất ở lần chạy sau.
+
+Dòng ghi muộn vào khoảng thời gian đã lưu trữ rơi vào partition mặc định; chúng được chuyển
+theo lô ROW_GROUP_SIZE dòng, mỗi lô một câu DELETE ... RETURNING ghi thẳng vào một file bổ
+sung trong một transaction ngắn. File bổ sung được đưa vào vị trí trước khi commit và mang ID
+transaction trong tên ({tháng}.{xid}.parquet); nếu tiến trình dừng giữa lúc commit và lúc
+ghi manifest, lần chạy sau tra pg_xact_status để nhận file của transaction đã commit và xóa
+file của transaction bị hủy.
+
+manifest.json ghi danh sách file (kèm khoảng attend_time của từng file) và watermark: cận
+dưới của partition tháng đầu tiên còn gắn vào bảng. Điểm danh trước watermark nằm trong kho
+lưu trữ, từ watermark trở đi nằm trong bảng attendance. Ngày khi lọc được tính theo
+ARCHIVE_TIMEZONE.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Select, String, bindparam, cast, column, delete, func, select, table, text, tuple_
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.ext.asyncio.result import AsyncResult
+from app.core.config import settings
+from app.db.partitions import (
+    PARENT_TABLE,
+    add_months,
+    list_attendance_partitions,
+    list_detached_partitions,
+    month_start,
+    partition_lower_bound,
+    partition_month,
+)
+from app.models import Attendance, ClassModel, Room, Schedule, Subject
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+# Số dòng mỗi row group Parquet, cũng là số dòng mỗi lô chuyển dòng ghi muộn
+ROW_GROUP_SIZE = 65536
+
+# DETACH chờ khóa bảng cha tối đa DETACH_LOCK_TIMEOUT mỗi lần, thử lại DETACH_ATTEMPTS lần
+DETACH_LOCK_TIMEOUT = "5s"
+DETACH_ATTEMPTS = 5
+DETACH_RETRY_DELAY = 2.0
+
+# SQLSTATE lock_not_available (hết lock_timeout)
+LOCK_NOT_AVAILABLE = "55P03"
+
+ARCHIVE_SCHEMA = pa.schema([
+    ("attend_id", pa.int64()),
+    ("schedule_id", pa.int64()),
+    ("user_id", pa.string()),
+    ("attend_time", pa.timestamp("us", tz="UTC")),
+    ("status", pa.bool_()),
+    ("class_name", pa.string()),
+    ("subject_name", pa.string()),
+    ("room_name", pa.string()),
+])
+
+# Cột điểm danh được chuyển, khớp thứ tự đầu ARCHIVE_SCHEMA
+MOVED_COLUMNS = (
+    Attendance.attend_id,
+    Attendance.schedule_id,
+    Attendance.user_id,
+    Attendance.attend_time,
+    Attendance.status,
+)
+
+# Tên file bổ sung của một lô dòng ghi muộn: {YYYY-MM}.{xid}.parquet
+_PART_NAME = re.compile(r"^(\d{4}-\d{2})\.(\d+)\.parquet$")
+
+_manifest_lock = threading.Lock()
+_manifest_cache: dict = {"mtime": None, "data": None}
+
+def archive_root() -> Path:
+    """
+    Thư mục gốc của kho lưu trữ điểm danh.
+    """
+    return Path(settings.ARCHIVE_DIR) / "attendance"
+
+def archive_tz() -> ZoneInfo:
+    """
+    Múi giờ dùng để chia tháng và lọc ngày của điểm danh lưu trữ.
+    """
+    return ZoneInfo(settings.ARCHIVE_TIMEZONE)
+
+def month_bounds(month: date) -> Tuple[datetime, datetime]:
+    """
+    Khoảng [đầu tháng, đầu tháng sau) của month theo ARCHIVE_TIMEZONE.
+    """
+    tz = archive_tz()
+    return datetime.combine(month, time(), tz), datetime.combine(add_months(month, 1), time(), tz)
+
+def day_start(day: date) -> datetime:
+    """
+    Đầu ngày day theo ARCHIVE_TIMEZONE.
+    """
+    return datetime.combine(day, time(), archive_tz())
+
+def _empty_manifest() -> dict:
+    return {"watermark": None, "files": {}}
+
+def month_parts(entry: dict) -> List[dict]:
+    """
+    Các file của một tháng trong manifest (file đầu và các file bổ sung).
+
+    Manifest cũ ghi một file mỗi tháng trực tiếp trong entry.
+    """
+    if "parts" in entry:
+        return entry["parts"]
+    return [{"path": entry["path"], "rows": entry["rows"], "archived_at": entry.get("archived_at")}]
+
+def part_bounds(key: str, part: dict) -> Tuple[datetime, datetime]:
+    """
+    Khoảng [start, end) của attend_time trong một file.
+
+    File cũ không ghi khoảng thì chứa đúng tháng key theo ARCHIVE_TIMEZONE.
+    """
+    if "start" in part:
+        return datetime.fromisoformat(part["start"]), datetime.fromisoformat(part["end"])
+    return month_bounds(date.fromisoformat(f"{key}-01"))
+
+def _iter_paths(manifest: dict) -> Iterator[str]:
+    for entry in manifest["files"].values():
+        for part in month_parts(entry):
+            yield part["path"]
+
+def load_manifest() -> dict:
+    """
+    Đọc manifest (cache theo mtime của file).
+
+    Returns:
+        dict: watermark (ISO date hoặc None) và files theo tháng "YYYY-MM"
+    """
+    path = archive_root() / MANIFEST_NAME
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return _empty_manifest()
+    with _manifest_lock:
+        if _manifest_cache["mtime"] != mtime:
+            _manifest_cache["data"] = json.loads(path.read_text(encoding="utf-8"))
+            _manifest_cache["mtime"] = mtime
+        return _manifest_cache["data"]
+
+def _save_manifest(manifest: dict) -> None:
+    """
+    Ghi manifest nguyên tử (ghi file tạm rồi os.replace).
+    """
+    root = archive_root()
+    root.mkdir(parents=True, exist_ok=True)
+    tmp = root / f".{MANIFEST_NAME}.tmp"
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, root / MANIFEST_NAME)
+
+def _parse_watermark(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    watermark = datetime.fromisoformat(value)
+    return watermark if watermark.tzinfo else watermark.replace(tzinfo=archive_tz())
+
+def archive_watermark() -> Optional[datetime]:
+    """
+    Thời điểm đầu tiên còn nằm trong bảng attendance, None nếu chưa lưu trữ tháng nào.
+
+    Manifest cũ ghi watermark là ngày đầu tháng theo ARCHIVE_TIMEZONE.
+    """
+    return _parse_watermark(load_manifest().get("watermark"))
+
+def reads_archive(start_date: Optional[date]) -> bool:
+    """
+    Khoảng ngày bắt đầu từ start_date (None là không giới hạn) có chạm kho lưu trữ không.
+    """
+    watermark = archive_watermark()
+    return watermark is not None and (start_date is None or day_start(start_date) < watermark)
+
+def reads_live(end_date: Optional[date]) -> bool:
+    """
+    Khoảng ngày kết thúc ở end_date (None là không giới hạn) có chạm bảng attendance không.
+    """
+    watermark = archive_watermark()
+    return watermark is None or end_date is None or day_start(end_date + timedelta(days=1)) > watermark
+
+def read_archived_attendance(
+    user_id: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+) -> List[dict]:
+    """
+    Đọc điểm danh đã lưu trữ của một người dùng, mới nhất trước.
+
+    Chỉ mở file có khoảng attend_time giao với khoảng ngày; lọc user_id được đẩy xuống Parquet
+    để bỏ qua các row group không chứa người dùng. Hàm chặn I/O, gọi qua threadpool.
+
+    Args:
+        user_id: ID người dùng
+        start_date: Ngày bắt đầu (theo ARCHIVE_TIMEZONE), None nếu không giới hạn
+        end_date: Ngày kết thúc (bao gồm), None nếu không giới hạn
+
+    Returns:
+        List[dict]: Các bản ghi theo ARCHIVE_SCHEMA, attend_time giảm dần
+    """
+    manifest = load_manifest()
+    lower = day_start(start_date) if start_date else None
+    upper = day_start(end_date + timedelta(days=1)) if end_date else None
+    paths = []
+    for key, entry in sorted(manifest["files"].items()):
+        for part in month_parts(entry):
+            start, end = part_bounds(key, part)
+            if (lower is None or end > lower) and (upper is None or start < upper):
+                paths.append(archive_root() / part["path"])
+    tz = archive_tz()
+    records = []
+    for path in paths:
+        data = pq.read_table(path, filters=[("user_id", "=", user_id)])
+        for record in data.to_pylist():
+            day = record["attend_time"].astimezone(tz).date()
+            if (start_date and day < start_date) or (end_date and day > end_date):
+                continue
+            records.append(record)
+    records.sort(key=lambda record: record["attend_time"], reverse=True)
+    return records
+
+def _fsync(path: Path) -> None:
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+async def _current_xid(conn: AsyncConnection) -> int:
+    # Gán ID transaction ngay (xid8 ép sang số qua text)
+    return int((await conn.execute(select(cast(func.pg_current_xact_id(), String)))).scalar_one())
+
+def _annotated(source) -> Select:
+    """
+    Dòng điểm danh của source kèm tên lớp/môn/phòng, sắp theo user_id rồi attend_time.
+    """
+    return select(
+        *source.c,
+        ClassModel.class_name,
+        Subject.subject_name,
+        Room.room_name,
+    ).select_from(source).outerjoin(
+        Schedule, source.c.schedule_id == Schedule.schedule_id
+    ).outerjoin(
+        ClassModel, Schedule.class_id == ClassModel.class_id
+    ).outerjoin(
+        Subject, Schedule.subject_id == Subject.subject_id
+    ).outerjoin(
+        Room, Schedule.room_id == Room.room_id
+    ).order_by(source.c.user_id, source.c.attend_time)
+
+async def _write_parquet(result: AsyncResult, path: Path) -> Optional[dict]:
+    """
+    Ghi kết quả stream vào file Parquet qua file tạm, fsync rồi đưa vào vị trí.
+
+    Returns:
+        Optional[dict]: rows và khoảng [start, end) của attend_time, None nếu không có dòng
+        nào (không tạo file)
+    """
+    tmp = path.with_name(f".{path.name}.tmp")
+    rows = 0
+    first = last = None
+    try:
+        with pq.ParquetWriter(tmp, ARCHIVE_SCHEMA, compression="zstd") as writer:
+            async for partition in result.partitions():
+                columns = list(zip(*partition))
+                writer.write_batch(pa.record_batch(
+                    [pa.array(values, type=field.type) for values, field in zip(columns, ARCHIVE_SCHEMA)],
+                    schema=ARCHIVE_SCHEMA,
+                ))
+                rows += len(partition)
+                times = columns[3]
+                first = min(times) if first is None else min(first, *times)
+                last = max(times) if last is None else max(last, *times)
+        if not rows:
+            tmp.unlink()
+            return None
+        _fsync(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return {
+        "rows": rows,
+        "start": first.isoformat(),
+        "end": (last + timedelta(microseconds=1)).isoformat(),
+        "archived_at": datetime.now(archive_tz()).isoformat(),
+    }
+
+async def _detach(engine: AsyncEngine, name: str) -> None:
+    """
+    Tách một partition khỏi attendance, chờ khóa bảng cha tối đa DETACH_LOCK_TIMEOUT mỗi lần.
+    """
+    for attempt in range(1, DETACH_ATTEMPTS + 1):
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT}'"))
+                await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            return
+        except DBAPIError as e:
+            if getattr(e.orig, "sqlstate", None) != LOCK_NOT_AVAILABLE or attempt == DETACH_ATTEMPTS:
+                raise
+            logger.warning("Chưa lấy được khóa để tách %s (lần %d), thử lại", name, attempt)
+            await asyncio.sleep(DETACH_RETRY_DELAY)
+
+async def _export_partition(engine: AsyncEngine, manifest: dict, name: str) -> Optional[dict]:
+    """
+    Xuất một partition đã tách ra file Parquet, ghi manifest rồi DROP bảng.
+
+    Partition đã có trong manifest (tiến trình dừng trước khi DROP) chỉ bị DROP. Bảng đã
+    tách không còn nhận ghi nên được đọc trong một transaction chỉ đọc, không khóa dòng.
+
+    Returns:
+        Optional[dict]: Mục manifest của file mới, None nếu partition rỗng hoặc đã xuất
+    """
+    month = partition_month(name)
+    key = month.strftime("%Y-%m")
+    exported = any(part.get("source") == name for entry in manifest["files"].values() for part in month_parts(entry))
+    part = None
+    if not exported:
+        relative = f"{month.year:04d}/{name}.parquet"
+        (archive_root() / relative).parent.mkdir(parents=True, exist_ok=True)
+        source = table(name, *(column(attribute.key) for attribute in MOVED_COLUMNS))
+        async with engine.connect() as conn:
+            result = await conn.stream(_annotated(source).execution_options(yield_per=ROW_GROUP_SIZE))
+            part = await _write_parquet(result, archive_root() / relative)
+        if part is not None:
+            part = {"path": relative, "source": name, **part}
+            _add_part(manifest, key, part)
+            _save_manifest(manifest)
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+    return part
+
+async def _move_late_rows(engine: AsyncEngine, month: date, start: datetime, end: datetime) -> Optional[dict]:
+    """
+    Chuyển tối đa ROW_GROUP_SIZE dòng có attend_time trong [start, end) sang một file bổ sung.
+
+    DELETE ... RETURNING được stream vào file tạm trong một transaction; file được đưa vào vị
+    trí trước khi commit (nếu commit thất bại, file mang xid bị hủy và được dọn ở lần chạy sau).
+
+    Returns:
+        Optional[dict]: Mục manifest của file mới, None nếu khoảng không còn dòng nào
+    """
+    in_range = (Attendance.attend_time >= start, Attendance.attend_time < end)
+    batch = select(Attendance.attend_id, Attendance.attend_time).where(*in_range).order_by(Attendance.attend_time).limit(ROW_GROUP_SIZE)
+    moved = delete(Attendance).where(
+        *in_range,
+        tuple_(Attendance.attend_id, Attendance.attend_time).in_(batch),
+    ).returning(*MOVED_COLUMNS).cte("moved")
+
+    key = month.strftime("%Y-%m")
+    (archive_root() / f"{month.year:04d}").mkdir(parents=True, exist_ok=True)
+    async with engine.connect() as conn:
+        async with conn.begin():
+            xid = await _current_xid(conn)
+            relative = f"{month.year:04d}/{key}.{xid}.parquet"
+            result = await conn.stream(_annotated(moved).execution_options(yield_per=ROW_GROUP_SIZE))
+            part = await _write_parquet(result, archive_root() / relative)
+    return {"path": relative, **part} if part is not None else None
+
+def _add_part(manifest: dict, key: str, part: dict) -> None:
+    entry = manifest["files"].get(key)
+    parts = month_parts(entry) if entry else []
+    parts = [*parts, part]
+    manifest["files"][key] = {"parts": parts, "rows": sum(item["rows"] for item in parts)}
+
+async def _recover_parts(engine: AsyncEngine, manifest: dict) -> None:
+    """
+    Xử lý file của lần chạy trước bị dừng giữa commit và ghi manifest.
+
+    File của transaction đã commit được thêm vào manifest (dòng đã bị xóa khỏi bảng), file
+    của transaction bị hủy bị xóa (dòng vẫn còn trong bảng).
+    """
+    known = set(_iter_paths(manifest))
+    orphans = []
+    for path in archive_root().glob("*/*.parquet"):
+        match = _PART_NAME.match(path.name)
+        relative = f"{path.parent.name}/{path.name}"
+        if match and relative not in known:
+            orphans.append((path, relative, match.group(1), match.group(2)))
+    if not orphans:
+        return
+    status_query = text("SELECT pg_xact_status(CAST(CAST(:xid AS text) AS xid8))").bindparams(
+        bindparam("xid", type_=String)
+    )
+    async with engine.connect() as conn:
+        for path, relative, key, xid in orphans:
+            status = (await conn.execute(status_query, {"xid": xid})).scalar()
+            if status == "committed":
+                rows = pq.ParquetFile(path).metadata.num_rows
+                _add_part(manifest, key, {"path": relative, "rows": rows, "archived_at": None})
+                logger.warning("Nhận lại file lưu trữ %s của transaction %s đã commit", relative, xid)
+            elif status == "aborted":
+                path.unlink(missing_ok=True)
+                logger.warning("Xóa file lưu trữ %s của transaction %s bị hủy", relative, xid)
+            else:
+                logger.warning("Bỏ qua file lưu trữ %s: trạng thái transaction %s là %s", relative, xid, status)
+    _save_manifest(manifest)
+
+async def _move_all_late_rows(engine: AsyncEngine, manifest: dict, watermark: datetime) -> List[str]:
+    """
+    Chuyển mọi dòng còn trong bảng có attend_time trước watermark (chỉ có thể nằm ở partition
+    mặc định), theo lô, thành file bổ sung của tháng (ARCHIVE_TIMEZONE) chứa chúng.
+    """
+    moved = []
+    while True:
+        async with engine.connect() as conn:
+            oldest = (await conn.execute(
+                select(func.min(Attendance.attend_time)).where(Attendance.attend_time < watermark)
+            )).scalar()
+        if oldest is None:
+            return moved
+        month = month_start(oldest.astimezone(archive_tz()).date())
+        start, end = month_bounds(month)
+        part = await _move_late_rows(engine, month, start, min(end, watermark))
+        if part is None:
+            return moved
+        key = month.strftime("%Y-%m")
+        _add_part(manifest, key, part)
+        _save_manifest(manifest)
+        moved.append(key)
+        logger.info("Đã chuyển %s dòng điểm danh ghi muộn của tháng %s", part["rows"], key)
+
+async def archive_attendance(engine: AsyncEngine, before: date) -> List[str]:
+    """
+    Lưu trữ các partition tháng trước tháng chứa before.
+
+    Chạy lại an toàn: partition đã tách nhưng chưa xuất (kể cả do tác vụ lưu giữ tách) được
+    xuất tiếp, dòng ghi muộn vào khoảng đã lưu trữ được chuyển thành file bổ sung.
+
+    Args:
+        engine: Engine primary
+        before: Giữ lại partition của tháng chứa ngày này và các tháng sau trong bảng
+
+    Returns:
+        List[str]: Các tháng "YYYY-MM" đã có file mới trong lần chạy này
+    """
+    cutoff = month_start(before)
+    manifest = dict(load_manifest())
+    manifest["files"] = dict(manifest["files"])
+    timezone = manifest.setdefault("timezone", settings.ARCHIVE_TIMEZONE)
+    if timezone != settings.ARCHIVE_TIMEZONE:
+        raise ValueError(f"Kho lưu trữ chia tháng theo {timezone}, ARCHIVE_TIMEZONE đang là {settings.ARCHIVE_TIMEZONE}")
+    await _recover_parts(engine, manifest)
+
+    async with engine.connect() as conn:
+        attached = await list_attendance_partitions(conn)
+    for name in attached:
+        if partition_month(name) < cutoff:
+            await _detach(engine, name)
+            logger.info("Đã tách partition %s", name)
+
+    async with engine.connect() as conn:
+        detached = await list_detached_partitions(conn)
+        remaining = await list_attendance_partitions(conn)
+        bound = await partition_lower_bound(conn, remaining[0]) if remaining else None
+
+    archived = []
+    for name in detached:
+        part = await _export_partition(engine, manifest, name)
+        if part is not None:
+            archived.append(partition_month(name).strftime("%Y-%m"))
+            logger.info("Đã lưu trữ %s dòng điểm danh của partition %s", part["rows"], name)
+
+    # Watermark chỉ tiến khi mọi partition trước nó đã xuất và DROP
+    watermark = _parse_watermark(manifest.get("watermark"))
+    if bound is not None and (watermark is None or bound > watermark):
+        manifest["watermark"] = bound.isoformat()
+        _save_manifest(manifest)
+        watermark = bound
+    if watermark is not None:
+        archived += await _move_all_late_rows(engine, manifest, watermark)
+    return list(dict.fromkeys(archived))
@@ -0,0 +1,177 @@
+"""
+Quản lý phân vùng theo tháng của bảng attendance.
+
+Bảng attendance phân vùng RANGE trên attend_time, mỗi tháng một partition tên
+attendance_yYYYYmMM. Tác vụ nền tạo trước partition cho các tháng sắp tới; partition
+cũ có thể tách khỏi bảng (DETACH) để lưu trữ hoặc xóa mà không phải DELETE từng dòng.
+"""
+
+import asyncio
+import logging
+import re
+from datetime import date, datetime
+from typing import List, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.core.config import settings
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "attendance"
+
+# Partition nhận các dòng nằm ngoài mọi khoảng tháng (phải luôn rỗng khi vận hành bình thường)
+DEFAULT_PARTITION = "attendance_default"
+
+_PARTITION_NAME = re.compile(r"^attendance_y(\d{4})m(\d{2})$")
+
+def month_start(day: date) -> date:
+    """
+    Ngày đầu tháng chứa day.
+    """
+    return day.replace(day=1)
+
+def add_months(month: date, count: int) -> date:
+    """
+    Cộng count tháng vào ngày đầu tháng month.
+    """
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    """
+    Tên partition của tháng chứa month, ví dụ attendance_y2026m10.
+    """
+    return f"{PARENT_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+def partition_month(name: str) -> Optional[date]:
+    """
+    Tháng của partition theo tên, None nếu không phải partition tháng.
+    """
+    match = _PARTITION_NAME.match(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+def create_partition_sql(month: date) -> str:
+    """
+    Câu lệnh tạo partition cho tháng chứa month (bỏ qua nếu đã tồn tại).
+    """
+    start = month_start(month)
+    end = add_months(start, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+async def list_attendance_partitions(conn: AsyncConnection) -> List[str]:
+    """
+    Danh sách partition tháng đang gắn vào bảng attendance, theo thứ tự thời gian.
+    """
+    result = await conn.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :parent
+    """), {"parent": PARENT_TABLE})
+    return sorted(name for name in result.scalars() if partition_month(name))
+
+async def list_detached_partitions(conn: AsyncConnection) -> List[str]:
+    """
+    Các bảng partition tháng đã tách khỏi attendance (chờ lưu trữ), theo thứ tự thời gian.
+    """
+    result = await conn.execute(text("""
+        SELECT c.relname
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind = 'r' AND NOT c.relispartition
+          AND n.nspname = current_schema() AND c.relname LIKE :pattern
+    """), {"pattern": f"{PARENT_TABLE}\\_y%"})
+    return sorted(name for name in result.scalars() if partition_month(name))
+
+async def partition_lower_bound(conn: AsyncConnection, name: str) -> Optional[datetime]:
+    """
+    Cận dưới (FROM) của partition đang gắn, None nếu không phải partition.
+
+    Cận được đọc từ định nghĩa partition vì ngày đầu tháng trong CREATE TABLE được hiểu theo
+    múi giờ của phiên tạo partition.
+    """
+    result = await conn.execute(text("""
+        SELECT CAST((regexp_match(pg_get_expr(relpartbound, oid), 'FROM \\(''([^'']+)''\\)'))[1] AS timestamptz)
+        FROM pg_class
+        WHERE relname = :name AND relispartition
+    """), {"name": name})
+    return result.scalar()
+
+async def ensure_attendance_partitions(
+    conn: AsyncConnection,
+    months_ahead: Optional[int] = None,
+    today: Optional[date] = None,
+) -> List[str]:
+    """
+    Tạo partition cho tháng hiện tại và months_ahead tháng tiếp theo nếu chưa có.
+
+    Args:
+        conn: Kết nối database trong một transaction
+        months_ahead: Số tháng tạo trước (mặc định ATTENDANCE_PARTITIONS_AHEAD)
+        today: Ngày tham chiếu (mặc định hôm nay)
+
+    Returns:
+        List[str]: Tên các partition mới được tạo
+    """
+    if months_ahead is None:
+        months_ahead = settings.ATTENDANCE_PARTITIONS_AHEAD
+    current = month_start(today or date.today())
+    existing = set(await list_attendance_partitions(conn))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        await conn.execute(text(create_partition_sql(month)))
+        created.append(name)
+    return created
+
+async def detach_attendance_partitions(conn: AsyncConnection, before: date) -> List[str]:
+    """
+    Tách các partition có toàn bộ dữ liệu trước tháng chứa before.
+
+    Partition bị tách trở thành bảng độc lập (giữ nguyên tên), có thể lưu trữ rồi DROP.
+
+    Args:
+        conn: Kết nối database trong một transaction
+        before: Giữ lại tháng chứa ngày này và các tháng sau
+
+    Returns:
+        List[str]: Tên các partition đã tách
+    """
+    cutoff = month_start(before)
+    detached = []
+    for name in await list_attendance_partitions(conn):
+        if partition_month(name) < cutoff:
+            await conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            detached.append(name)
+    return detached
+
+async def maintain_attendance_partitions() -> None:
+    """
+    Tác vụ nền tạo trước partition tháng tới và (nếu cấu hình) tách partition quá hạn
+    lưu giữ, chạy theo chu kỳ ATTENDANCE_PARTITION_CHECK_INTERVAL.
+    """
+    while True:
+        try:
+            async with engine.begin() as conn:
+                created = await ensure_attendance_partitions(conn)
+                detached = []
+                if settings.ATTENDANCE_RETENTION_MONTHS:
+                    cutoff = add_months(month_start(date.today()), -settings.ATTENDANCE_RETENTION_MONTHS)
+                    detached = await detach_attendance_partitions(conn, cutoff)
+            if created:
+                logger.info("Đã tạo partition điểm danh: %s", ", ".join(created))
+            if detached:
+                logger.info("Đã tách partition điểm danh: %s", ", ".join(detached))
+        except Exception as e:
+            logger.error("Lỗi bảo trì partition điểm danh: %s", e)
+        await asyncio.sleep(settings.ATTENDANCE_PARTITION_CHECK_INTERVAL)
@@ -0,0 +1,138 @@
+"""
+Thống kê pool kết nối database.
+
+Đo thời gian chờ lấy kết nối (histogram), số request đang chờ và số lần timeout
+cho từng engine, phục vụ endpoint metrics của admin khi tinh chỉnh pool dưới tải.
+"""
+
+import threading
+import time
+from typing import Dict, Type
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Cận trên (giây) của các bucket histogram thời gian chờ kết nối
+WAIT_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class PoolMetrics:
+    """
+    Bộ đếm thời gian chờ lấy kết nối của một pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waiters = 0
+        self.acquisitions = 0
+        self.timeouts = 0
+        self.wait_time_sum = 0.0
+        self.bucket_counts = [0] * (len(WAIT_TIME_BUCKETS) + 1)
+
+    def begin_wait(self) -> None:
+        """
+        Ghi nhận một request bắt đầu chờ kết nối.
+        """
+        with self._lock:
+            self.waiters += 1
+
+    def end_wait(self, seconds: float, timed_out: bool = False) -> None:
+        """
+        Ghi nhận request kết thúc chờ và thời gian đã chờ.
+
+        Args:
+            seconds: Thời gian chờ (giây)
+            timed_out: True nếu hết DB_POOL_TIMEOUT mà không lấy được kết nối
+        """
+        with self._lock:
+            self.waiters -= 1
+            self.acquisitions += 1
+            self.wait_time_sum += seconds
+            if timed_out:
+                self.timeouts += 1
+            for index, upper in enumerate(WAIT_TIME_BUCKETS):
+                if seconds <= upper:
+                    self.bucket_counts[index] += 1
+                    break
+            else:
+                self.bucket_counts[-1] += 1
+
+    def snapshot(self) -> dict:
+        """
+        Ảnh chụp các bộ đếm (histogram dạng cộng dồn như Prometheus).
+
+        Returns:
+            dict: waiters, acquisitions, timeouts và histogram thời gian chờ
+        """
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for upper, count in zip(WAIT_TIME_BUCKETS, self.bucket_counts):
+                cumulative += count
+                buckets[str(upper)] = cumulative
+            buckets["+Inf"] = cumulative + self.bucket_counts[-1]
+            return {
+                "waiters": self.waiters,
+                "acquisitions": self.acquisitions,
+                "timeouts": self.timeouts,
+                "wait_time_seconds": {
+                    "sum": round(self.wait_time_sum, 6),
+                    "count": self.acquisitions,
+                    "buckets": buckets,
+                },
+            }
+
+# Metrics theo tên engine (primary, replica_0, ...)
+pool_metrics: Dict[str, PoolMetrics] = {}
+
+def instrumented_pool_class(name: str) -> Type[AsyncAdaptedQueuePool]:
+    """
+    Tạo lớp pool đo thời gian chờ lấy kết nối cho engine có tên cho trước.
+
+    Metrics gắn vào lớp (không phải instance) để vẫn giữ nguyên khi pool được
+    tạo lại sau engine.dispose().
+
+    Args:
+        name: Tên engine dùng làm khóa trong pool_metrics
+
+    Returns:
+        Type[AsyncAdaptedQueuePool]: Lớp pool dùng cho tham số poolclass
+    """
+    metrics = pool_metrics.setdefault(name, PoolMetrics())
+
+    def _do_get(self):
+        started = time.perf_counter()
+        metrics.begin_wait()
+        timed_out = False
+        try:
+            return AsyncAdaptedQueuePool._do_get(self)
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            metrics.end_wait(time.perf_counter() - started, timed_out)
+
+    return type("InstrumentedQueuePool", (AsyncAdaptedQueuePool,), {"_do_get": _do_get, "metrics": metrics})
+
+def pool_statistics(name: str, pool) -> dict:
+    """
+    Thống kê trực tiếp của pool kèm metrics thời gian chờ.
+
+    Args:
+        name: Tên engine
+        pool: Pool của engine (engine.pool)
+
+    Returns:
+        dict: Kích thước, số kết nối đang dùng/rảnh, overflow và metrics chờ
+    """
+    stats = {
+        "engine": name,
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": getattr(pool, "_max_overflow", None),
+        "timeout": pool.timeout(),
+    }
+    metrics = pool_metrics.get(name)
+    if metrics is not None:
+        stats.update(metrics.snapshot())
+    return stats
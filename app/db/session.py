@@ -1,14 +1,47 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import asyncio
+import hashlib
+import itertools
+import logging
+import time
+from typing import Dict, List, Optional
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.pool_metrics import instrumented_pool_class, pool_statistics
+
+logger = logging.getLogger(__name__)
+
+def create_engine(name: str, url: str) -> AsyncEngine:
+    """
+    Tạo động cơ bất đồng bộ với nhóm kết nối cấu hình từ Settings.
+
+    Args:
+        name: Tên engine dùng cho thống kê pool
+        url: Chuỗi kết nối PostgreSQL async
+
+    Returns:
+        AsyncEngine: Engine đã cấu hình pool, pre-ping và cache statement
+    """
+    return create_async_engine(
+        url,
+        echo=False,
+        poolclass=instrumented_pool_class(name),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            # Cache statement phía asyncpg và phía dialect SQLAlchemy
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        },
+    )
 
 # Động cơ bất đồng bộ với nhóm kết nối.
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=False,
-    pool_size=5,
-    max_overflow=10
-)
+engine = create_engine("primary", settings.DATABASE_URL)
 
 # Nhà máy phiên bất đồng bộ với expire_on_commit=False.
 AsyncSessionLocal = sessionmaker(
@@ -20,4 +53,170 @@ AsyncSessionLocal = sessionmaker(
 # Phụ thuộc cho vòng đời phiên bất đồng bộ.
 async def get_db():
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+# =================================================================
+# READ REPLICA
+# =================================================================
+
+class Replica:
+    """
+    Một read replica với engine, session factory và trạng thái độ trễ.
+
+    Replica chỉ nhận traffic sau khi lần kiểm tra độ trễ đầu tiên thành công.
+    """
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = create_engine(name, url)
+        self.session_factory = sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.checked_at: Optional[float] = None
+
+replicas: List[Replica] = [
+    Replica(f"replica_{index}", url) for index, url in enumerate(settings.DATABASE_REPLICA_URLS)
+]
+_replica_cycle = itertools.cycle(replicas) if replicas else None
+
+# Cookie ghi nhận thời điểm hết hạn đọc từ primary, dùng chung giữa các worker
+STICKY_COOKIE = "db_primary_until"
+
+# Hạn đọc từ primary theo client trong process hiện tại (monotonic)
+_sticky_clients: Dict[str, float] = {}
+
+# Ngưỡng số client trước khi dọn các mục đã hết hạn
+_STICKY_PRUNE_THRESHOLD = 10000
+
+# Độ trễ replica: 0 khi đã replay hết WAL nhận được, NULL khi chưa replay giao dịch nào
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END AS lag
+""")
+
+def _client_key(request: Request) -> str:
+    """
+    Khóa nhận diện client: credential (đã băm) nếu có, nếu không thì địa chỉ IP.
+    """
+    credential = request.headers.get("authorization") or request.headers.get("x-api-key")
+    if credential:
+        return hashlib.sha256(credential.encode("utf-8")).hexdigest()
+    return request.client.host if request.client else "anonymous"
+
+def mark_primary_sticky(request: Request, response: Response) -> None:
+    """
+    Ghi nhận client vừa ghi dữ liệu để các lần đọc tiếp theo đi vào primary
+    trong REPLICA_STICKY_SECONDS (read-your-writes).
+
+    Args:
+        request: Request vừa ghi dữ liệu
+        response: Response để gắn cookie cho các worker khác
+    """
+    if not replicas:
+        return
+    now = time.monotonic()
+    if len(_sticky_clients) > _STICKY_PRUNE_THRESHOLD:
+        for key in [k for k, until in _sticky_clients.items() if until <= now]:
+            _sticky_clients.pop(key, None)
+    _sticky_clients[_client_key(request)] = now + settings.REPLICA_STICKY_SECONDS
+    response.set_cookie(
+        STICKY_COOKIE,
+        str(int(time.time() + settings.REPLICA_STICKY_SECONDS) + 1),
+        max_age=int(settings.REPLICA_STICKY_SECONDS) + 1,
+        httponly=True,
+        samesite="lax",
+    )
+
+def _is_sticky(request: Request) -> bool:
+    """
+    Kiểm tra client còn trong cửa sổ đọc từ primary hay không.
+    """
+    until = _sticky_clients.get(_client_key(request))
+    if until is not None and until > time.monotonic():
+        return True
+    cookie = request.cookies.get(STICKY_COOKIE)
+    if cookie and cookie.isdigit():
+        return int(cookie) > time.time()
+    return False
+
+def _pick_replica() -> Optional[Replica]:
+    """
+    Chọn replica khỏe tiếp theo theo vòng tròn, None nếu không có replica khỏe.
+    """
+    for _ in range(len(replicas)):
+        replica = next(_replica_cycle)
+        if replica.healthy:
+            return replica
+    return None
+
+async def get_read_db(request: Request):
+    """
+    Phụ thuộc phiên cho endpoint chỉ đọc.
+
+    Dùng read replica khỏe nếu có; quay về primary khi không cấu hình replica,
+    mọi replica đều trễ quá ngưỡng, hoặc client vừa ghi dữ liệu.
+    """
+    replica = None if _is_sticky(request) else _pick_replica()
+    factory = replica.session_factory if replica else AsyncSessionLocal
+    async with factory() as session:
+        yield session
+
+async def check_replica_lag(replica: Replica) -> None:
+    """
+    Đo độ trễ của một replica và cập nhật trạng thái khỏe.
+
+    Args:
+        replica: Replica cần kiểm tra
+    """
+    try:
+        async with replica.engine.connect() as conn:
+            lag = (await conn.execute(REPLICA_LAG_QUERY)).scalar()
+    except Exception as e:
+        if replica.healthy:
+            logger.warning("Replica %s không phản hồi, chuyển đọc về primary: %s", replica.name, e)
+        replica.healthy = False
+        replica.lag_seconds = None
+        return
+    replica.lag_seconds = float(lag) if lag is not None else None
+    replica.checked_at = time.time()
+    healthy = replica.lag_seconds is not None and replica.lag_seconds <= settings.REPLICA_MAX_LAG_SECONDS
+    if replica.healthy and not healthy:
+        logger.warning("Replica %s trễ %ss, chuyển đọc về primary", replica.name, replica.lag_seconds)
+    replica.healthy = healthy
+
+async def monitor_replica_lag() -> None:
+    """
+    Tác vụ nền kiểm tra độ trễ các replica theo chu kỳ REPLICA_LAG_CHECK_INTERVAL.
+    """
+    while True:
+        await asyncio.gather(*(check_replica_lag(replica) for replica in replicas))
+        await asyncio.sleep(settings.REPLICA_LAG_CHECK_INTERVAL)
+
+async def dispose_engines() -> None:
+    """
+    Đóng pool kết nối của primary và các replica khi tắt ứng dụng.
+    """
+    await engine.dispose()
+    for replica in replicas:
+        await replica.engine.dispose()
+
+def get_pool_statistics() -> list[dict]:
+    """
+    Thống kê trực tiếp pool của tất cả engine.
+
+    Returns:
+        list[dict]: Thống kê từng engine (replica kèm trạng thái độ trễ)
+    """
+    stats = [pool_statistics("primary", engine.pool)]
+    for replica in replicas:
+        replica_stats = pool_statistics(replica.name, replica.engine.pool)
+        replica_stats.update({
+            "healthy": replica.healthy,
+            "lag_seconds": replica.lag_seconds,
+            "checked_at": replica.checked_at,
+        })
+        stats.append(replica_stats)
+    return stats
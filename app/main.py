@@ -4,11 +4,53 @@ Module khởi tạo ứng dụng chính FastAPI.
 Thiết lập ứng dụng với middleware CORS, định tuyến API và phục vụ file tĩnh.
 """
 
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
 from app.api.router import api_router
+from app.api.endpoints.upload import static_router as uploads_router
+from app.api.responses import FastJSONResponse
+from app.db.session import AsyncSessionLocal, replicas, monitor_replica_lag, mark_primary_sticky, dispose_engines
+from app.core.reference_cache import load_reference_data
+from app.core.invalidation import listen_for_invalidations
+from app.services.uploads import UploadSizeLimitMiddleware
+from app.services.images import shutdown_pool
+from app.services.upload_gc import collect_garbage_periodically
+from app.services.offline_bundle import build_bundles_periodically
+from app.db.partitions import maintain_attendance_partitions
+
+# Các method chỉ đọc, không kích hoạt đọc-từ-primary sau ghi
+READ_ONLY_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    """
+    Vòng đời ứng dụng: nạp cache danh mục, khởi động tác vụ nền (bảo trì partition, LISTEN
+    vô hiệu hóa cache, theo dõi replica, dọn file upload, dựng gói ngoại tuyến) và giải
+    phóng kết nối khi tắt.
+    """
+    async with AsyncSessionLocal() as db:
+        await load_reference_data(db)
+    tasks = [
+        asyncio.create_task(maintain_attendance_partitions()),
+        asyncio.create_task(listen_for_invalidations()),
+    ]
+    if replicas:
+        tasks.append(asyncio.create_task(monitor_replica_lag()))
+    if settings.UPLOAD_GC_INTERVAL:
+        tasks.append(asyncio.create_task(collect_garbage_periodically()))
+    if settings.OFFLINE_BUNDLE_INTERVAL:
+        tasks.append(asyncio.create_task(build_bundles_periodically()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        shutdown_pool()
+        await dispose_engines()
 
 def get_application() -> FastAPI:
     """
@@ -23,6 +65,36 @@ def get_application() -> FastAPI:
         title=settings.PROJECT_NAME,
         openapi_url=f"{settings.API_V1_STR}/openapi.json",
         debug=settings.DEBUG,
+        # Encode JSON bằng orjson cho mọi endpoint
+        default_response_class=FastJSONResponse,
+        lifespan=lifespan,
+    )
+
+    # Read-your-writes: client vừa ghi thành công sẽ đọc từ primary trong một khoảng ngắn
+    @application.middleware("http")
+    async def primary_stickiness(request: Request, call_next):
+        response = await call_next(request)
+        if request.method not in READ_ONLY_METHODS and response.status_code < 400:
+            mark_primary_sticky(request, response)
+        return response
+
+    # Từ chối upload vượt dung lượng (Content-Length, hoặc đếm byte với body chunked)
+    application.add_middleware(
+        UploadSizeLimitMiddleware,
+        path_prefix=f"{settings.API_V1_STR}/upload/",
+        max_bytes=settings.UPLOAD_MAX_BYTES,
+    )
+    # Đăng ký vân tay multipart: template cùng ảnh gốc
+    application.add_middleware(
+        UploadSizeLimitMiddleware,
+        path_prefix=f"{settings.API_V1_STR}/fingerprints/enroll",
+        max_bytes=settings.UPLOAD_MAX_BYTES + settings.FINGERPRINT_TEMPLATE_MAX_BYTES,
+    )
+    # Import CSV/ZIP ảnh hàng loạt: giới hạn riêng, lớn hơn upload đơn lẻ
+    application.add_middleware(
+        UploadSizeLimitMiddleware,
+        path_prefix=f"{settings.API_V1_STR}/imports/",
+        max_bytes=settings.IMPORT_MAX_BYTES,
     )
 
     # Middleware CORS cho cross-origin requests từ frontend
@@ -38,8 +110,8 @@ def get_application() -> FastAPI:
     # Đăng ký tất cả API endpoints
     application.include_router(api_router, prefix=settings.API_V1_STR)
 
-    # Phục vụ file tĩnh cho uploads
-    application.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+    # Phục vụ file tĩnh cho uploads (ETag, Range, cache immutable, tùy chọn X-Accel-Redirect)
+    application.include_router(uploads_router, prefix="/uploads")
 
     return application
 
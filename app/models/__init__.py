@@ -7,6 +7,7 @@ from .account import Account
 from .student_profile import StudentProfile
 from .lecturer_profile import LecturerProfile
 from .fingerprint import Fingerprint
+from .fingerprint_tombstone import FingerprintTombstone
 from .faculty import Faculty
 from .major import Major
 from .education_level import EducationLevel
@@ -14,5 +15,6 @@ from .class_model import ClassModel
 from .subject import Subject
 from .room import Room
 from .schedule import Schedule
+from .schedule_series import ScheduleSeries
 from .course_registration import CourseRegistration
 from .attendance import Attendance
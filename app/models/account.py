@@ -10,6 +10,6 @@ class Account(Base):
 
     user_id = Column(String(32), ForeignKey("users.user_id"), primary_key=True)
     password_hash = Column(String(255), nullable=False)
-    role = Column(String(1), nullable=False)
+    role = Column(String(1), nullable=False, index=True)
 
     user = relationship("User", back_populates="account")
@@ -1,14 +1,25 @@
-from sqlalchemy import Column, Integer, String, Boolean, TIMESTAMP, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, TIMESTAMP, ForeignKey, Index
 from app.db.base import Base
 
 class Attendance(Base):
     """
     Mô hình ORM cho điểm danh với ID, lịch trình, người dùng, thời gian và trạng thái.
+
+    Bảng phân vùng theo tháng trên attend_time (xem app/db/partitions.py), nên khóa chính
+    gồm cả attend_time; tra cứu theo attend_id dùng select thay vì session.get.
     """
     __tablename__ = "attendance"
 
     attend_id = Column(Integer, primary_key=True, autoincrement=True)
     schedule_id = Column(Integer, ForeignKey("schedule.schedule_id"), nullable=False)
     user_id = Column(String(32), ForeignKey("users.user_id"), nullable=False)
-    attend_time = Column(TIMESTAMP(timezone=True), nullable=False)
+    attend_time = Column(TIMESTAMP(timezone=True), primary_key=True, nullable=False)
     status = Column(Boolean, nullable=False)
+
+    # Chỉ mục cho tra cứu theo lịch trình, lịch sử theo người dùng và danh sách theo thời gian
+    __table_args__ = (
+        Index("ix_attendance_schedule_id_user_id", "schedule_id", "user_id"),
+        Index("ix_attendance_user_id_attend_time", "user_id", "attend_time"),
+        Index("ix_attendance_attend_time", "attend_time"),
+        {"postgresql_partition_by": "RANGE (attend_time)"},
+    )
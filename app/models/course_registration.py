@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, SmallInteger, TIMESTAMP, ForeignKey
+from sqlalchemy import Column, Integer, String, SmallInteger, TIMESTAMP, ForeignKey, Index
 from app.db.base import Base
 
 class CourseRegistration(Base):
@@ -14,3 +14,10 @@ class CourseRegistration(Base):
     semester = Column(SmallInteger, nullable=False)
     year = Column(SmallInteger, nullable=False)
     created_at = Column(TIMESTAMP, nullable=False)
+
+    # Chỉ mục cho tra cứu theo người dùng, môn học và lớp (kèm môn cho báo cáo điểm danh)
+    __table_args__ = (
+        Index("ix_course_registration_user_id", "user_id"),
+        Index("ix_course_registration_subject_id", "subject_id"),
+        Index("ix_course_registration_host_class_id_subject_id", "host_class_id", "subject_id"),
+    )
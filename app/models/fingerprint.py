@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, ForeignKey, LargeBinary
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, FetchedValue, String, ForeignKey, LargeBinary
+from sqlalchemy.orm import deferred, relationship
 from app.db.base import Base
 
 class Fingerprint(Base):
@@ -9,7 +9,11 @@ class Fingerprint(Base):
     __tablename__ = "fingerprint"
 
     finger_id = Column(String(32), primary_key=True)
-    user_id = Column(String(32), ForeignKey("users.user_id"), nullable=False)
-    finger_data = Column(LargeBinary, nullable=False)  # Ánh xạ tới bytea PostgreSQL
+    user_id = Column(String(32), ForeignKey("users.user_id"), nullable=False, index=True)
+    # Ánh xạ tới bytea PostgreSQL; không nạp cùng bản ghi (chỉ tải qua endpoint template),
+    # truy cập khi chưa nạp sẽ báo lỗi thay vì âm thầm truy vấn thêm
+    finger_data = deferred(Column(LargeBinary, nullable=False), raiseload=True)
+    # Phiên bản đồng bộ (ID transaction ghi cuối), do trigger gán khi INSERT/UPDATE
+    version = Column(BigInteger, nullable=False, index=True, server_default=FetchedValue(), server_onupdate=FetchedValue())
 
     user = relationship("User", back_populates="fingerprints")
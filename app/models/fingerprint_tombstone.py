@@ -0,0 +1,14 @@
+from sqlalchemy import BigInteger, Column, String, TIMESTAMP, text
+from app.db.base import Base
+
+class FingerprintTombstone(Base):
+    """
+    Mô hình ORM cho dấu xóa vân tay: finger_id đã xóa, người dùng và phiên bản của transaction
+    xóa. Do trigger trên bảng fingerprint ghi, dùng cho đồng bộ template của máy chấm công.
+    """
+    __tablename__ = "fingerprint_tombstone"
+
+    finger_id = Column(String(32), primary_key=True)
+    user_id = Column(String(32), nullable=False)
+    version = Column(BigInteger, nullable=False, index=True)
+    deleted_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"))
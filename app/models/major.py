@@ -8,5 +8,5 @@ class Major(Base):
     __tablename__ = "major"
 
     major_id = Column(String(20), primary_key=True)
-    faculty_id = Column(String(20), ForeignKey("faculty.faculty_id"), nullable=False)
+    faculty_id = Column(String(20), ForeignKey("faculty.faculty_id"), nullable=False, index=True)
     major_name = Column(Text, nullable=False)
@@ -1,9 +1,11 @@
-from sqlalchemy import Column, Integer, String, Date, SmallInteger, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, SmallInteger, Boolean, ForeignKey, Index
 from app.db.base import Base
 
 class Schedule(Base):
     """
     Mô hình ORM cho lịch trình với ID, môn học, phòng, giảng viên, lớp, ngày, kỳ và trạng thái mở.
+
+    series_id liên kết buổi học với chuỗi lịch lặp sinh ra nó (None với lịch đơn lẻ).
     """
     __tablename__ = "schedule"
 
@@ -16,3 +18,13 @@ class Schedule(Base):
     start_period = Column(SmallInteger, nullable=False)
     end_period = Column(SmallInteger, nullable=False)
     is_open = Column(Boolean, default=False)
+    series_id = Column(Integer, ForeignKey("schedule_series.series_id"), nullable=True)
+
+    # Chỉ mục cho tra cứu theo ngày, và theo phòng/giảng viên/lớp trong khoảng ngày
+    __table_args__ = (
+        Index("ix_schedule_learn_date_start_period", "learn_date", "start_period"),
+        Index("ix_schedule_room_id_learn_date", "room_id", "learn_date"),
+        Index("ix_schedule_lecturer_id_learn_date", "lecturer_id", "learn_date"),
+        Index("ix_schedule_class_id_learn_date", "class_id", "learn_date"),
+        Index("ix_schedule_series_id_learn_date", "series_id", "learn_date"),
+    )
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Date, SmallInteger, Boolean, ForeignKey
+from sqlalchemy.dialects.postgresql import ARRAY
+from app.db.base import Base
+
+class ScheduleSeries(Base):
+    """
+    Mô hình ORM cho chuỗi lịch lặp hằng tuần: lớp, môn, phòng, giảng viên, thứ, tiết,
+    khoảng ngày và các ngày nghỉ bị loại trừ. Mỗi buổi là một dòng schedule có series_id.
+    """
+    __tablename__ = "schedule_series"
+
+    series_id = Column(Integer, primary_key=True, autoincrement=True)
+    subject_id = Column(String(20), ForeignKey("subject.subject_id"), nullable=False)
+    room_id = Column(String(20), ForeignKey("room.room_id"), nullable=False)
+    lecturer_id = Column(String(32), ForeignKey("users.user_id"), nullable=False)
+    class_id = Column(String(20), ForeignKey("class.class_id"), nullable=False)
+    weekday = Column(SmallInteger, nullable=False)  # 0 = Thứ Hai ... 6 = Chủ Nhật
+    start_period = Column(SmallInteger, nullable=False)
+    end_period = Column(SmallInteger, nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    excluded_dates = Column(ARRAY(Date), nullable=False, default=list)
+    is_open = Column(Boolean, default=False)
@@ -13,6 +13,6 @@ class StudentProfile(Base):
     is_female = Column(Boolean, nullable=False, default=False)
     phone = Column(String(15), nullable=False)
     address = Column(Text, nullable=False)
-    profile_image_url = Column(Text, nullable=True)
+    profile_image_url = Column(Text, nullable=True, index=True)
 
     user = relationship("User", back_populates="student_profile")
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel
 
 class FingerprintBase(BaseModel):
@@ -20,3 +21,10 @@ class FingerprintResponse(FingerprintBase):
     """
     class Config:
         from_attributes = True
+
+class FingerprintEnrollment(FingerprintBase):
+    """
+    Lược đồ kết quả đăng ký vân tay từ trạm quét.
+    """
+    quality: Optional[float] = None
+    image: Optional[str] = None
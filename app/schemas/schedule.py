@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from datetime import date
-from typing import Optional
+from typing import List, Optional
 
 class ScheduleBase(BaseModel):
     """
@@ -27,6 +27,65 @@ class ScheduleResponse(ScheduleBase):
     Lược đồ phản hồi lịch trình với ID.
     """
     schedule_id: int  # ID tự tăng chỉ trong phản hồi
+    # Chỉ đọc: gán khi tạo/sửa chuỗi lịch, không nhận từ POST/PUT lịch đơn lẻ
+    series_id: Optional[int] = None
     
     class Config:
         from_attributes = True
+
+class ScheduleConflictCheck(BaseModel):
+    """
+    Lược đồ một buổi học cần kiểm tra trùng lịch (dry-run).
+    """
+    schedule_id: Optional[int] = None
+    room_id: str
+    lecturer_id: str
+    class_id: str
+    learn_date: date
+    start_period: int = Field(..., ge=1)
+    end_period: int = Field(..., ge=1)
+
+class ScheduleSeriesCreate(BaseModel):
+    """
+    Lược đồ tạo chuỗi lịch lặp hằng tuần.
+    """
+    subject_id: str
+    room_id: str
+    lecturer_id: str
+    class_id: str
+    weekday: int = Field(..., ge=0, le=6, description="0 = Thứ Hai ... 6 = Chủ Nhật")
+    start_period: int = Field(..., ge=1)
+    end_period: int = Field(..., ge=1)
+    start_date: date
+    end_date: date
+    excluded_dates: List[date] = Field(default_factory=list, description="Ngày nghỉ/lễ bị bỏ qua")
+    is_open: Optional[bool] = False
+
+    @model_validator(mode="after")
+    def check_ranges(self):
+        if self.end_period < self.start_period:
+            raise ValueError("end_period phải lớn hơn hoặc bằng start_period")
+        if self.end_date < self.start_date:
+            raise ValueError("end_date phải sau hoặc bằng start_date")
+        return self
+
+class ScheduleSeriesUpdate(BaseModel):
+    """
+    Lược đồ cập nhật chuỗi lịch, áp dụng đồng loạt cho các buổi của chuỗi.
+    """
+    subject_id: Optional[str] = None
+    room_id: Optional[str] = None
+    lecturer_id: Optional[str] = None
+    start_period: Optional[int] = Field(None, ge=1)
+    end_period: Optional[int] = Field(None, ge=1)
+    is_open: Optional[bool] = None
+
+class ScheduleSeriesResponse(ScheduleSeriesCreate):
+    """
+    Lược đồ phản hồi chuỗi lịch với ID và ngày các buổi học.
+    """
+    series_id: int
+    occurrences: List[date] = []
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,3 @@
+"""
+Nghiệp vụ dùng chung giữa các endpoint (import hàng loạt, xếp lịch, ...).
+"""
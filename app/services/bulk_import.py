@@ -0,0 +1,330 @@
+"""
+Import hàng loạt từ CSV qua COPY.
+
+File CSV được đọc tuần tự theo lô (không nạp cả file vào bộ nhớ), mỗi dòng được parse và
+kiểm tra khóa ngoại với tập khóa nạp sẵn trong bộ nhớ. Dòng hợp lệ được COPY
+(asyncpg copy_records_to_table) vào bảng tạm rồi gộp vào bảng chính bằng một câu
+INSERT ... SELECT, bỏ qua bản ghi đã tồn tại. Lịch trùng phòng/giảng viên/lớp bị loại
+trước khi gộp. Dòng bị loại được ghi vào báo cáo CSV có thể tải về.
+"""
+
+import csv
+import io
+import re
+import uuid
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+from app.core.config import settings
+from app.core.invalidation import publish
+from app.models import ClassModel, CourseRegistration, Room, Schedule, Subject, User
+from app.services.schedule_conflicts import Slot, find_conflicts
+
+# Số dòng mỗi lô parse + COPY
+IMPORT_BATCH_SIZE = 5000
+
+_REPORT_ID = re.compile(r"^[0-9a-f]{32}$")
+
+class RowError(ValueError):
+    """
+    Lỗi dữ liệu của một dòng CSV.
+    """
+
+def parse_str(max_length: int) -> Callable[[str], str]:
+    def parse(value: str) -> str:
+        value = value.strip()
+        if not value:
+            raise RowError("không được để trống")
+        if len(value) > max_length:
+            raise RowError(f"dài quá {max_length} ký tự")
+        return value
+    return parse
+
+def parse_int(value: str) -> int:
+    try:
+        return int(value.strip())
+    except ValueError:
+        raise RowError("không phải số nguyên")
+
+def parse_date(value: str) -> date:
+    try:
+        return date.fromisoformat(value.strip())
+    except ValueError:
+        raise RowError("không đúng định dạng YYYY-MM-DD")
+
+def parse_bool(value: str) -> bool:
+    value = value.strip().lower()
+    if value in ("1", "true", "yes", "y", "x"):
+        return True
+    if value in ("", "0", "false", "no", "n"):
+        return False
+    raise RowError("không phải giá trị đúng/sai")
+
+@dataclass
+class ImportColumn:
+    """
+    Một cột CSV được import.
+
+    Attributes:
+        name: Tên cột (trùng tên cột trong bảng đích)
+        parse: Hàm chuyển chuỗi CSV thành giá trị, raise RowError nếu sai
+        sql_type: Kiểu cột của bảng tạm
+        default: Giá trị khi cột không có trong file hoặc để trống (None là bắt buộc)
+        reference: Cột khóa được tham chiếu, kiểm tra với tập khóa nạp sẵn
+    """
+    name: str
+    parse: Callable[[str], Any]
+    sql_type: str
+    default: Any = None
+    reference: Optional[InstrumentedAttribute] = None
+
+@dataclass
+class ImportSpec:
+    """
+    Mô tả một loại import: bảng đích, cột CSV và khóa tự nhiên dùng để bỏ qua trùng lặp.
+    """
+    table: str
+    columns: List[ImportColumn]
+    natural_key: Tuple[str, ...]
+    row_check: Optional[Callable[[dict], Optional[str]]] = None
+    extra_values: Dict[str, str] = field(default_factory=dict)
+    staging_check: Optional[Callable[[AsyncSession, str], Awaitable[List[Tuple[int, str, dict]]]]] = None
+
+    @property
+    def staging_table(self) -> str:
+        return f"import_{self.table}"
+
+    @property
+    def names(self) -> List[str]:
+        return [column.name for column in self.columns]
+
+def _check_periods(values: dict) -> Optional[str]:
+    if values["start_period"] < 1 or values["end_period"] < values["start_period"]:
+        return "start_period/end_period không hợp lệ"
+    return None
+
+async def _reject_schedule_conflicts(db: AsyncSession, staging: str) -> List[Tuple[int, str, dict]]:
+    """
+    Loại khỏi bảng tạm các lịch trùng phòng/giảng viên/lớp với lịch đã có hoặc với dòng
+    trước đó trong file (một lượt qua toàn bộ file theo thứ tự dòng).
+    """
+    rows = (await db.execute(text(f"SELECT * FROM {staging} ORDER BY line"))).mappings().all()
+    slots = [
+        Slot(row["line"], row["room_id"], row["lecturer_id"], row["class_id"],
+             row["learn_date"], row["start_period"], row["end_period"])
+        for row in rows
+    ]
+    conflicts = {}
+    for conflict in await find_conflicts(db, slots):
+        conflicts.setdefault(conflict.slot.ref, conflict)
+    if not conflicts:
+        return []
+    await db.execute(text(f"DELETE FROM {staging} WHERE line = ANY(:lines)"), {"lines": list(conflicts)})
+    by_line = {row["line"]: row for row in rows}
+    new_slots = {id(slot) for slot in slots}
+    errors = []
+    for line, conflict in conflicts.items():
+        source = "dòng" if id(conflict.other) in new_slots else "schedule_id"
+        raw = {key: str(value) for key, value in by_line[line].items() if key != "line"}
+        errors.append((line, f"{conflict.message} ({source} {conflict.other.ref})", raw))
+    return errors
+
+SCHEDULE_IMPORT = ImportSpec(
+    table=Schedule.__tablename__,
+    columns=[
+        ImportColumn("subject_id", parse_str(20), "varchar(20)", reference=Subject.subject_id),
+        ImportColumn("room_id", parse_str(20), "varchar(20)", reference=Room.room_id),
+        ImportColumn("lecturer_id", parse_str(32), "varchar(32)", reference=User.user_id),
+        ImportColumn("class_id", parse_str(20), "varchar(20)", reference=ClassModel.class_id),
+        ImportColumn("learn_date", parse_date, "date"),
+        ImportColumn("start_period", parse_int, "smallint"),
+        ImportColumn("end_period", parse_int, "smallint"),
+        ImportColumn("is_open", parse_bool, "boolean", default=False),
+    ],
+    natural_key=("class_id", "subject_id", "learn_date", "start_period"),
+    row_check=_check_periods,
+    staging_check=_reject_schedule_conflicts,
+)
+
+COURSE_REGISTRATION_IMPORT = ImportSpec(
+    table=CourseRegistration.__tablename__,
+    columns=[
+        ImportColumn("user_id", parse_str(32), "varchar(32)", reference=User.user_id),
+        ImportColumn("subject_id", parse_str(20), "varchar(20)", reference=Subject.subject_id),
+        ImportColumn("host_class_id", parse_str(20), "varchar(20)", reference=ClassModel.class_id),
+        ImportColumn("semester", parse_int, "smallint"),
+        ImportColumn("year", parse_int, "smallint"),
+    ],
+    natural_key=("user_id", "subject_id", "semester", "year"),
+    extra_values={"created_at": "now()"},
+)
+
+def report_dir() -> Path:
+    """
+    Thư mục lưu báo cáo lỗi import.
+    """
+    return Path(settings.IMPORT_REPORT_DIR)
+
+def report_path(report_id: str) -> Path:
+    """
+    Đường dẫn báo cáo lỗi theo ID.
+
+    Raises:
+        HTTPException: 404 nếu ID không hợp lệ hoặc báo cáo không tồn tại
+    """
+    path = report_dir() / f"{report_id}.csv"
+    if not _REPORT_ID.match(report_id) or not path.is_file():
+        raise HTTPException(status_code=404, detail="Báo cáo không tồn tại")
+    return path
+
+async def _load_key_sets(db: AsyncSession, spec: ImportSpec) -> Dict[str, Set[str]]:
+    """
+    Nạp tập khóa của các bảng được tham chiếu (mỗi bảng một truy vấn).
+    """
+    key_sets = {}
+    for column in spec.columns:
+        if column.reference is not None:
+            key_sets[column.name] = set((await db.execute(select(column.reference))).scalars())
+    return key_sets
+
+def _iter_batches(
+    upload: UploadFile,
+    spec: ImportSpec,
+    key_sets: Dict[str, Set[str]],
+    errors: List[Tuple[int, str, dict]],
+    counter: Dict[str, int],
+) -> Iterator[List[tuple]]:
+    """
+    Parse CSV theo lô IMPORT_BATCH_SIZE bản ghi hợp lệ (số dòng, giá trị các cột).
+
+    Dòng lỗi được thêm vào errors; counter["total"] đếm tổng số dòng dữ liệu.
+    """
+    stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(stream)
+    header = set(reader.fieldnames or [])
+    missing = [column.name for column in spec.columns if column.default is None and column.name not in header]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Thiếu cột: {', '.join(missing)}")
+
+    seen = set()
+    batch = []
+    for raw in reader:
+        counter["total"] += 1
+        line = reader.line_num
+        values = {}
+        try:
+            for column in spec.columns:
+                cell = raw.get(column.name) or ""
+                if not cell.strip() and column.default is not None:
+                    values[column.name] = column.default
+                    continue
+                try:
+                    values[column.name] = column.parse(cell)
+                except RowError as e:
+                    raise RowError(f"{column.name} {e}")
+                if column.reference is not None and values[column.name] not in key_sets[column.name]:
+                    raise RowError(f"{column.name} '{values[column.name]}' không tồn tại")
+            problem = spec.row_check(values) if spec.row_check else None
+            if problem:
+                raise RowError(problem)
+            key = tuple(values[name] for name in spec.natural_key)
+            if key in seen:
+                raise RowError("trùng với dòng trước trong file")
+            seen.add(key)
+        except RowError as e:
+            errors.append((line, str(e), raw))
+            continue
+        batch.append((line, *(values[name] for name in spec.names)))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+    stream.detach()
+
+def _write_report(errors: List[Tuple[int, str, dict]]) -> str:
+    """
+    Ghi báo cáo dòng bị loại ra CSV, trả về ID báo cáo.
+    """
+    report_id = uuid.uuid4().hex
+    directory = report_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    fieldnames = []
+    for _, _, raw in errors:
+        for name in raw:
+            if name is not None and name not in fieldnames:
+                fieldnames.append(name)
+    with open(directory / f"{report_id}.csv", "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["line", "error", *fieldnames])
+        for line, message, raw in sorted(errors, key=lambda error: error[0]):
+            writer.writerow([line, message, *(raw.get(name, "") for name in fieldnames)])
+    return report_id
+
+async def run_import(db: AsyncSession, upload: UploadFile, spec: ImportSpec) -> dict:
+    """
+    Import một file CSV theo spec trong một transaction.
+
+    Args:
+        db: Database session (primary)
+        upload: File CSV upload
+        spec: Mô tả loại import
+
+    Returns:
+        dict: total, inserted, rejected, report_id (None nếu không có dòng bị loại)
+    """
+    key_sets = await _load_key_sets(db, spec)
+    staging = spec.staging_table
+    await db.execute(text(
+        f"CREATE TEMP TABLE {staging} (line integer, "
+        + ", ".join(f"{column.name} {column.sql_type}" for column in spec.columns)
+        + ") ON COMMIT DROP"
+    ))
+    raw_connection = await (await db.connection()).get_raw_connection()
+    driver = raw_connection.driver_connection
+
+    errors: List[Tuple[int, str, dict]] = []
+    counter = {"total": 0}
+    batches = _iter_batches(upload, spec, key_sets, errors, counter)
+    while True:
+        try:
+            batch = await run_in_threadpool(next, batches, None)
+        except (UnicodeDecodeError, csv.Error) as e:
+            raise HTTPException(status_code=400, detail=f"File CSV không hợp lệ: {e}")
+        if batch is None:
+            break
+        await driver.copy_records_to_table(staging, records=batch, columns=["line", *spec.names])
+
+    # Bản ghi trùng khóa tự nhiên với dữ liệu đã có thì bỏ qua và báo trong báo cáo
+    existing = " AND ".join(f"t.{name} = s.{name}" for name in spec.natural_key)
+    duplicates = await db.execute(text(
+        f"DELETE FROM {staging} s WHERE EXISTS (SELECT 1 FROM {spec.table} t WHERE {existing}) RETURNING s.*"
+    ))
+    for row in duplicates.mappings():
+        values = dict(row)
+        errors.append((values.pop("line"), "đã tồn tại", {k: str(v) for k, v in values.items()}))
+
+    if spec.staging_check:
+        errors.extend(await spec.staging_check(db, staging))
+
+    target_columns = ", ".join([*spec.names, *spec.extra_values])
+    source_columns = ", ".join([*(f"s.{name}" for name in spec.names), *spec.extra_values.values()])
+    result = await db.execute(text(
+        f"INSERT INTO {spec.table} ({target_columns}) SELECT {source_columns} FROM {staging} s ORDER BY s.line"
+    ))
+    await publish(db, spec.table)
+    await db.commit()
+
+    report_id = await run_in_threadpool(_write_report, errors) if errors else None
+    return {
+        "total": counter["total"],
+        "inserted": result.rowcount,
+        "rejected": len(errors),
+        "report_id": report_id,
+    }
@@ -0,0 +1,178 @@
+"""
+Phục vụ file upload thân thiện với cache.
+
+Mọi phản hồi file mang ETag mạnh, Accept-Ranges và Content-Type nhận diện từ nội dung
+(magic bytes, rồi tới đuôi file). File bất biến (định địa chỉ theo nội dung) được đánh dấu
+Cache-Control: immutable để trình duyệt/CDN không hỏi lại; file khác phải kiểm tra lại
+bằng If-None-Match và nhận 304 khi không đổi. Hỗ trợ Range một đoạn (206/416) và If-Range.
+
+Với FILE_DELIVERY là x-accel-redirect hoặc x-sendfile, ứng dụng chỉ kiểm tra điều kiện và
+trả header; proxy phía trước (nginx/Apache) tự gửi file (zero-copy) và xử lý Range.
+"""
+
+import mimetypes
+import os
+from pathlib import Path
+from typing import AsyncIterator, Mapping, NamedTuple, Optional, Tuple
+import anyio
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, Response, StreamingResponse
+from app.core.config import settings
+from app.services.uploads import SNIFF_BYTES, sniff_image_type
+
+# Cache-Control cho file có thể thay đổi: luôn kiểm tra lại bằng ETag
+REVALIDATE = "public, no-cache"
+
+# Kích thước chunk khi stream một đoạn file
+RANGE_CHUNK_SIZE = 64 * 1024
+
+class FileInfo(NamedTuple):
+    """
+    Thông tin file cần cho header phản hồi.
+    """
+    size: int
+    etag: str
+    media_type: str
+
+def _detect_media_type(path: Path, header: bytes) -> str:
+    image_type = sniff_image_type(header)
+    if image_type is not None:
+        return image_type.media_type
+    guessed, _ = mimetypes.guess_type(path.name)
+    return guessed or "application/octet-stream"
+
+def _inspect(path: Path, etag: Optional[str], media_type: Optional[str]) -> FileInfo:
+    stat = os.stat(path)
+    if etag is None:
+        # inode đổi mỗi lần file được thay bằng os.replace nên (inode, size, mtime) xác định nội dung
+        etag = f"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"
+    if media_type is None:
+        with open(path, "rb") as f:
+            media_type = _detect_media_type(path, f.read(SNIFF_BYTES))
+    return FileInfo(stat.st_size, f'"{etag}"', media_type)
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match so sánh yếu: bỏ tiền tố W/
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Phân tích header Range một đoạn.
+
+    Args:
+        header: Giá trị header Range
+        size: Kích thước file
+
+    Returns:
+        Optional[Tuple[int, int]]: (start, end) bao gồm end; None nếu header không dùng được
+        (sai cú pháp hoặc nhiều đoạn - trả cả file)
+
+    Raises:
+        ValueError: Đoạn nằm ngoài file (416)
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first.isdigit() or last.isdigit()):
+        return None
+    if not first:
+        length = int(last)
+        if length == 0 or size == 0:
+            # File rỗng không có byte nào để trả, kể cả với hậu tố
+            raise ValueError("Range rỗng")
+        return max(size - length, 0), size - 1
+    if last and not last.isdigit():
+        return None
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("Range nằm ngoài file")
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+async def _read_range(path: Path, start: int, end: int) -> AsyncIterator[bytes]:
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def _accel_headers(path: Path) -> Optional[Mapping[str, str]]:
+    if settings.FILE_DELIVERY == "x-sendfile":
+        return {"X-Sendfile": str(path.resolve())}
+    if settings.FILE_DELIVERY == "x-accel-redirect":
+        try:
+            relative = path.resolve().relative_to(Path(settings.UPLOAD_DIR).resolve())
+        except ValueError:
+            return None
+        return {"X-Accel-Redirect": settings.FILE_ACCEL_PREFIX.rstrip("/") + "/" + relative.as_posix()}
+    return None
+
+async def serve_file(
+    request: Request,
+    path: Path,
+    media_type: Optional[str] = None,
+    etag: Optional[str] = None,
+    immutable: bool = False,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    """
+    Trả file với ETag, Cache-Control, xử lý If-None-Match, Range và chế độ proxy gửi file.
+
+    Args:
+        request: Request (đọc If-None-Match, Range, If-Range)
+        path: File cần trả (đã kiểm tra tồn tại và nằm trong thư mục cho phép)
+        media_type: Content-Type, None để nhận diện từ nội dung
+        etag: Giá trị ETag (không có ngoặc kép), None để tính từ stat
+        immutable: File không bao giờ thay đổi (cache mãi mãi)
+        headers: Header bổ sung (ví dụ Vary)
+
+    Returns:
+        Response: 200, 206, 304 hoặc 416
+    """
+    info = await run_in_threadpool(_inspect, path, etag, media_type)
+    cache_control = f"public, max-age={settings.FILE_IMMUTABLE_MAX_AGE}, immutable" if immutable else REVALIDATE
+    common = {"ETag": info.etag, "Cache-Control": cache_control, **(headers or {})}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, info.etag):
+        return Response(status_code=304, headers=common)
+
+    accel = _accel_headers(path)
+    if accel is not None:
+        # Proxy tự đọc file, gửi Content-Length và xử lý Range
+        return Response(media_type=info.media_type, headers={**common, **accel})
+
+    common["Accept-Ranges"] = "bytes"
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == info.etag):
+        try:
+            byte_range = parse_range(range_header, info.size)
+        except ValueError:
+            return Response(status_code=416, headers={**common, "Content-Range": f"bytes */{info.size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            range_headers = {
+                **common,
+                "Content-Range": f"bytes {start}-{end}/{info.size}",
+                "Content-Length": str(end - start + 1),
+            }
+            if request.method == "HEAD":
+                return Response(status_code=206, media_type=info.media_type, headers=range_headers)
+            return StreamingResponse(
+                _read_range(path, start, end), status_code=206, media_type=info.media_type, headers=range_headers,
+            )
+
+    return FileResponse(path, media_type=info.media_type, headers=common, method=request.method)
@@ -0,0 +1,208 @@
+"""
+Đăng ký vân tay từ trạm quét.
+
+Trạm gửi template nhị phân thô (application/octet-stream) hoặc multipart gồm template và
+ảnh vân tay gốc, không cần bọc base64 trong JSON. Chất lượng lần quét được chấm trước khi
+lưu: từ ảnh (chạy trong process pool xử lý ảnh vì tốn CPU) hoặc, khi chỉ có template, từ
+trường chất lượng của template chuẩn ISO/IEC 19794-2. Lần quét kém bị từ chối ngay (422)
+để trạm yêu cầu quét lại trong cùng phiên. Template lưu vào bảng fingerprint, ảnh gốc lưu
+ra FINGERPRINT_IMAGE_DIR (ngoài UPLOAD_DIR vì là dữ liệu sinh trắc): ghi file tạm trước,
+chỉ đổi tên nguyên tử thành ảnh của finger_id sau khi transaction commit, để lần đăng ký
+thất bại không làm mất ảnh của lần đăng ký trước.
+"""
+
+import asyncio
+import io
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import NamedTuple, Optional
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.services.images import get_pool
+from app.services.uploads import SNIFF_BYTES, ImageType, sniff_image_type, too_large_detail
+
+FINGERPRINT_IMAGES_DIR = Path(settings.FINGERPRINT_IMAGE_DIR)
+
+# Cảm biến vân tay thường xuất ảnh BMP
+BMP = ImageType(".bmp", "image/bmp")
+
+# finger_id dùng làm tên file ảnh
+FINGER_ID = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+
+# Template ISO/IEC 19794-2: magic, và vị trí byte chất lượng của finger view đầu tiên
+ISO_TEMPLATE_MAGIC = b"FMR\x00"
+ISO_QUALITY_OFFSET = 26
+
+# Chấm chất lượng ảnh: cạnh dài khi thu nhỏ, kích thước khối, độ lệch chuẩn tối thiểu của
+# khối có vân và độ sắc nét cạnh (trung bình FIND_EDGES) ứng với điểm tối đa
+SCORE_MAX_SIDE = 256
+SCORE_BLOCK = 16
+RIDGE_STDDEV_MIN = 20.0
+EDGE_MEAN_TARGET = 40.0
+
+class Capture(NamedTuple):
+    """
+    Dữ liệu một lần quét vân tay.
+    """
+    template: bytes
+    image: Optional[bytes]
+    image_type: Optional[ImageType]
+
+def score_fingerprint_image(data: bytes) -> float:
+    """
+    Chấm chất lượng ảnh vân tay 0-100 (chạy trong process con).
+
+    Ảnh được chia khối SCORE_BLOCK px: khối có độ lệch chuẩn độ sáng đủ lớn được coi là có
+    vân. Điểm = tỉ lệ khối có vân (độ phủ) x độ sắc nét cạnh trung bình trên các khối đó.
+    Ảnh trống, nhòe hoặc chỉ chạm một góc cảm biến đều cho điểm thấp.
+    """
+    from PIL import Image, ImageFilter, ImageStat
+
+    with Image.open(io.BytesIO(data)) as original:
+        gray = original.convert("L")
+    gray.thumbnail((SCORE_MAX_SIDE, SCORE_MAX_SIDE))
+    edges = gray.filter(ImageFilter.FIND_EDGES)
+    width, height = gray.size
+    total = ridge_blocks = 0
+    sharpness = 0.0
+    for top in range(0, height - SCORE_BLOCK + 1, SCORE_BLOCK):
+        for left in range(0, width - SCORE_BLOCK + 1, SCORE_BLOCK):
+            box = (left, top, left + SCORE_BLOCK, top + SCORE_BLOCK)
+            total += 1
+            if ImageStat.Stat(gray.crop(box)).stddev[0] >= RIDGE_STDDEV_MIN:
+                ridge_blocks += 1
+                sharpness += ImageStat.Stat(edges.crop(box)).mean[0]
+    if not ridge_blocks:
+        return 0.0
+    coverage = ridge_blocks / total
+    clarity = min(sharpness / ridge_blocks / EDGE_MEAN_TARGET, 1.0)
+    return round(100 * coverage * clarity, 1)
+
+def template_quality(template: bytes) -> Optional[int]:
+    """
+    Chất lượng ghi trong template ISO/IEC 19794-2 (0-100), None nếu template định dạng khác.
+    """
+    if template.startswith(ISO_TEMPLATE_MAGIC) and len(template) > ISO_QUALITY_OFFSET:
+        return template[ISO_QUALITY_OFFSET]
+    return None
+
+async def score_capture(capture: Capture) -> Optional[float]:
+    """
+    Chấm chất lượng lần quét: từ ảnh nếu có, nếu không từ template chuẩn.
+
+    Raises:
+        HTTPException: 400 nếu ảnh không giải mã được
+    """
+    if capture.image is None:
+        return template_quality(capture.template)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_pool(), score_fingerprint_image, capture.image)
+    except OSError:
+        raise HTTPException(status_code=400, detail="Không đọc được ảnh vân tay")
+
+def _sniff(header: bytes) -> Optional[ImageType]:
+    if header.startswith(b"BM"):
+        return BMP
+    return sniff_image_type(header)
+
+async def _read_limited(chunks, limit: int, detail: str) -> bytes:
+    data = bytearray()
+    async for chunk in chunks:
+        data += chunk
+        if len(data) > limit:
+            raise HTTPException(status_code=413, detail=detail)
+    return bytes(data)
+
+async def _read_part(part, limit: int, detail: str) -> bytes:
+    async def chunks():
+        while chunk := await part.read(settings.UPLOAD_CHUNK_SIZE):
+            yield chunk
+    return await _read_limited(chunks(), limit, detail)
+
+async def read_capture(request: Request) -> Capture:
+    """
+    Đọc lần quét từ body application/octet-stream (template) hoặc multipart (template, image).
+
+    Raises:
+        HTTPException: 400 nếu thiếu template hoặc ảnh không hỗ trợ, 413 nếu quá lớn,
+        415 nếu Content-Type khác
+    """
+    template_detail = f"Template quá lớn (tối đa {settings.FINGERPRINT_TEMPLATE_MAX_BYTES} byte)"
+    content_type = request.headers.get("content-type", "")
+    image = image_type = None
+    if content_type.startswith("application/octet-stream"):
+        template = await _read_limited(request.stream(), settings.FINGERPRINT_TEMPLATE_MAX_BYTES, template_detail)
+    elif content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        template_part = form.get("template")
+        if template_part is None or isinstance(template_part, str):
+            raise HTTPException(status_code=400, detail="Thiếu file template")
+        template = await _read_part(template_part, settings.FINGERPRINT_TEMPLATE_MAX_BYTES, template_detail)
+        image_part = form.get("image")
+        if image_part is not None and not isinstance(image_part, str):
+            image = await _read_part(image_part, settings.UPLOAD_MAX_BYTES, too_large_detail())
+            image_type = _sniff(image[:SNIFF_BYTES])
+            if image_type is None:
+                raise HTTPException(status_code=400, detail="Ảnh vân tay chỉ nhận BMP, PNG, JPEG, GIF hoặc WebP")
+    else:
+        raise HTTPException(status_code=415, detail="Chỉ nhận application/octet-stream hoặc multipart/form-data")
+    if not template:
+        raise HTTPException(status_code=400, detail="Template rỗng")
+    return Capture(template, image, image_type)
+
+class StagedImage(NamedTuple):
+    """
+    Ảnh vân tay đã ghi ra file tạm, chờ transaction commit.
+    """
+    temp_path: str
+    image_type: ImageType
+
+def _stage(data: bytes, image_type: ImageType) -> StagedImage:
+    FINGERPRINT_IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=FINGERPRINT_IMAGES_DIR, prefix=".upload-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return StagedImage(temp_path, image_type)
+
+def _publish(finger_id: str, staged: StagedImage) -> Path:
+    target = FINGERPRINT_IMAGES_DIR / f"{finger_id}{staged.image_type.extension}"
+    os.replace(staged.temp_path, target)
+    # Ảnh của lần quét trước có thể mang đuôi khác
+    for previous in FINGERPRINT_IMAGES_DIR.glob(f"{finger_id}.*"):
+        if previous != target:
+            previous.unlink(missing_ok=True)
+    return target
+
+def _discard(staged: StagedImage) -> None:
+    try:
+        os.unlink(staged.temp_path)
+    except FileNotFoundError:
+        pass
+
+async def stage_fingerprint_image(capture: Capture) -> Optional[StagedImage]:
+    """
+    Ghi ảnh gốc của lần quét ra file tạm (chưa thay ảnh hiện có).
+    """
+    if capture.image is None:
+        return None
+    return await run_in_threadpool(_stage, capture.image, capture.image_type)
+
+async def publish_fingerprint_image(finger_id: str, staged: StagedImage) -> Path:
+    """
+    Đổi file tạm thành fingerprint_images/{finger_id}{đuôi} (gọi sau khi commit).
+    """
+    return await run_in_threadpool(_publish, finger_id, staged)
+
+async def discard_fingerprint_image(staged: StagedImage) -> None:
+    """
+    Bỏ file tạm khi lần đăng ký không được lưu.
+    """
+    await run_in_threadpool(_discard, staged)
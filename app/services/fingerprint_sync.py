@@ -0,0 +1,130 @@
+"""
+Đồng bộ template vân tay theo phiên bản cho máy chấm công.
+
+Mỗi bản ghi fingerprint mang phiên bản là ID transaction ghi cuối (trigger gán khi INSERT/
+UPDATE); bản ghi bị xóa để lại tombstone mang phiên bản của transaction xóa. Máy chấm công
+gửi phiên bản đã đồng bộ (since) và nhận các thay đổi có since <= phiên bản < xmin, với xmin
+là transaction nhỏ nhất còn đang chạy lúc đọc: mọi transaction dưới xmin đã kết thúc nên lần
+đồng bộ sau (since = xmin) không bỏ lỡ thay đổi nào commit muộn.
+
+Thay đổi được đóng gói nhị phân (big-endian), gzip khi máy chấm công chấp nhận:
+
+    header: magic "FPS1", since (u64), next (u64), số upsert (u32), số delete (u32)
+    upsert: finger_id (u8 độ dài + bytes), user_id (u8 + bytes), version (u64), template (u32 + bytes)
+    delete: finger_id (u8 + bytes), version (u64)
+"""
+
+import gzip
+import struct
+from typing import List, NamedTuple, Sequence
+from sqlalchemy import BigInteger, cast, func, select, String
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Fingerprint, FingerprintTombstone
+
+BUNDLE_MAGIC = b"FPS1"
+HEADER = struct.Struct(">4sQQII")
+VERSION = struct.Struct(">Q")
+TEMPLATE_LENGTH = struct.Struct(">I")
+
+# Mức nén gzip: template khó nén, mức cao hơn chỉ tốn CPU thêm
+GZIP_LEVEL = 6
+
+class TemplateChange(NamedTuple):
+    """
+    Template được thêm hoặc thay đổi.
+    """
+    finger_id: str
+    user_id: str
+    version: int
+    template: bytes
+
+class TemplateDeletion(NamedTuple):
+    """
+    Template bị xóa (tombstone).
+    """
+    finger_id: str
+    version: int
+
+class SyncChanges(NamedTuple):
+    """
+    Các thay đổi trong khoảng [since, next).
+    """
+    since: int
+    next: int
+    upserts: List[TemplateChange]
+    deletes: List[TemplateDeletion]
+
+def _short(value: str) -> bytes:
+    data = value.encode()
+    if len(data) > 255:
+        raise ValueError(f"Giá trị quá dài để đóng gói: {value!r}")
+    return bytes([len(data)]) + data
+
+def encode_upserts(upserts: Sequence[TemplateChange]) -> bytes:
+    """
+    Đóng gói danh sách template theo định dạng upsert của gói đồng bộ.
+    """
+    parts = []
+    for change in upserts:
+        parts += (
+            _short(change.finger_id),
+            _short(change.user_id),
+            VERSION.pack(change.version),
+            TEMPLATE_LENGTH.pack(len(change.template)),
+            change.template,
+        )
+    return b"".join(parts)
+
+def encode_deletes(deletes: Sequence[TemplateDeletion]) -> bytes:
+    """
+    Đóng gói danh sách tombstone theo định dạng delete của gói đồng bộ.
+    """
+    return b"".join(_short(deletion.finger_id) + VERSION.pack(deletion.version) for deletion in deletes)
+
+def encode_changes(changes: SyncChanges, compress: bool = False) -> bytes:
+    """
+    Đóng gói thay đổi thành gói nhị phân (chạy trong threadpool khi nén).
+
+    Args:
+        changes: Các thay đổi cần gửi
+        compress: Nén gzip cả gói
+    """
+    header = HEADER.pack(BUNDLE_MAGIC, changes.since, changes.next, len(changes.upserts), len(changes.deletes))
+    bundle = header + encode_upserts(changes.upserts) + encode_deletes(changes.deletes)
+    return gzip.compress(bundle, compresslevel=GZIP_LEVEL) if compress else bundle
+
+def _as_bigint(expression):
+    # xid8 không ép thẳng sang bigint được, phải qua text
+    return cast(cast(expression, String), BigInteger)
+
+async def load_changes(db: AsyncSession, since: int) -> SyncChanges:
+    """
+    Đọc các thay đổi template có phiên bản trong [since, xmin).
+
+    Args:
+        db: Database session (primary, để phiên bản không bị trễ so với replica)
+        since: Phiên bản máy chấm công đã đồng bộ, 0 để tải toàn bộ
+
+    Returns:
+        SyncChanges: Template thêm/sửa, tombstone và phiên bản cho lần đồng bộ sau
+    """
+    # xmin đọc trước trong cùng transaction: thay đổi dưới xmin đều đã commit và nhìn thấy được
+    upper = (await db.execute(select(_as_bigint(func.pg_snapshot_xmin(func.pg_current_snapshot()))))).scalar_one()
+
+    query = (
+        select(Fingerprint.finger_id, Fingerprint.user_id, Fingerprint.version, Fingerprint.finger_data)
+        .where(Fingerprint.version >= since, Fingerprint.version < upper)
+        .order_by(Fingerprint.version, Fingerprint.finger_id)
+    )
+    upserts = [TemplateChange(*row) for row in await db.execute(query)]
+
+    deletes: List[TemplateDeletion] = []
+    if since:
+        # Tải toàn bộ thì không cần báo xóa: máy chấm công thay cả bản sao cục bộ
+        query = (
+            select(FingerprintTombstone.finger_id, FingerprintTombstone.version)
+            .where(FingerprintTombstone.version >= since, FingerprintTombstone.version < upper)
+            .order_by(FingerprintTombstone.version, FingerprintTombstone.finger_id)
+        )
+        deletes = [TemplateDeletion(*row) for row in await db.execute(query)]
+    return SyncChanges(since, upper, upserts, deletes)
@@ -0,0 +1,166 @@
+"""
+Sinh ảnh phái sinh (thumbnail, WebP) cho ảnh upload.
+
+Việc giải mã/thu nhỏ/mã hóa ảnh tốn CPU nên chạy trong process pool, không chiếm event
+loop hay threadpool của worker. Ảnh phái sinh được lưu trong kho của ảnh gốc
+(derivatives/{size}/{khóa ảnh gốc với đuôi mới}), sinh ngay sau khi upload và sinh lười khi
+được yêu cầu mà chưa có (ảnh upload từ trước) hoặc ảnh gốc đã thay đổi; ảnh định địa chỉ
+theo nội dung không bao giờ thay đổi nên chỉ cần kiểm tra tồn tại. Nhiều request cùng yêu
+cầu một ảnh phái sinh chỉ sinh một lần.
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from app.core.config import settings
+from app.services.storage import DERIVATIVES_DIR, is_content_addressed
+
+logger = logging.getLogger(__name__)
+
+# Cạnh dài tối đa (px) của từng cỡ ảnh phái sinh
+DERIVATIVE_SIZES = {"thumb": 96, "small": 256, "medium": 512}
+
+# Định dạng phái sinh giữ theo ảnh gốc (GIF chỉ lấy khung đầu nên lưu PNG)
+KEEP_FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".gif": "PNG", ".webp": "WEBP"}
+
+FORMAT_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+
+FORMAT_MEDIA_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_inflight: Dict[Path, asyncio.Future] = {}
+
+def render_derivative(source: str, target: str, max_side: Optional[int], image_format: str, quality: int) -> None:
+    """
+    Thu nhỏ và mã hóa một ảnh (chạy trong process con).
+
+    Args:
+        source: Đường dẫn ảnh gốc
+        target: Đường dẫn ảnh phái sinh (ghi file tạm rồi đổi tên nguyên tử)
+        max_side: Cạnh dài tối đa, None để giữ kích thước gốc
+        image_format: JPEG, PNG hoặc WEBP
+        quality: Chất lượng nén JPEG/WebP
+    """
+    from PIL import Image, ImageOps
+
+    # Ảnh phái sinh mang mtime của ảnh gốc tại lúc đọc để phát hiện ảnh gốc bị thay sau đó
+    source_mtime = os.stat(source).st_mtime_ns
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if max_side is not None:
+            image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        options = {}
+        if image_format == "JPEG":
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            options = {"quality": quality, "optimize": True, "progressive": True}
+        elif image_format == "WEBP":
+            options = {"quality": quality, "method": 4}
+        elif image_format == "PNG":
+            options = {"optimize": True}
+        directory = os.path.dirname(target)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".derivative-", suffix=".part")
+        os.close(fd)
+        try:
+            image.save(temp_path, image_format, **options)
+            os.utime(temp_path, ns=(source_mtime, source_mtime))
+            os.replace(temp_path, target)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    Process pool xử lý ảnh (tạo khi dùng lần đầu).
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESS_WORKERS)
+    return _pool
+
+def shutdown_pool() -> None:
+    """
+    Dừng process pool (gọi khi tắt ứng dụng).
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def derivative_format(source: Path, webp: bool) -> str:
+    return "WEBP" if webp else KEEP_FORMATS.get(source.suffix.lower(), "PNG")
+
+def derivative_path(root: Path, key: str, size: Optional[str], image_format: str) -> Path:
+    """
+    Đường dẫn ảnh phái sinh của ảnh gốc root/key; size None là kích thước gốc.
+    """
+    return root / DERIVATIVES_DIR / (size or "full") / Path(key).with_suffix(FORMAT_EXTENSIONS[image_format])
+
+def _is_fresh(source: Path, target: Path, immutable: bool) -> bool:
+    try:
+        if immutable:
+            return target.exists()
+        return target.stat().st_mtime_ns == source.stat().st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+async def ensure_derivative(root: Path, key: str, size: Optional[str], webp: bool) -> Path:
+    """
+    Trả về ảnh phái sinh, sinh trong process pool nếu chưa có hoặc ảnh gốc đã thay đổi.
+
+    Args:
+        root: Thư mục gốc của kho ảnh
+        key: Khóa ảnh gốc trong kho
+        size: Tên cỡ trong DERIVATIVE_SIZES, None để giữ kích thước gốc
+        webp: True để mã hóa WebP, False để giữ định dạng gốc
+
+    Returns:
+        Path: Đường dẫn ảnh phái sinh
+    """
+    source = root / key
+    image_format = derivative_format(source, webp)
+    target = derivative_path(root, key, size, image_format)
+    loop = asyncio.get_running_loop()
+    if await loop.run_in_executor(None, _is_fresh, source, target, is_content_addressed(key)):
+        return target
+    future = _inflight.get(target)
+    if future is None:
+        max_side = DERIVATIVE_SIZES[size] if size else None
+        future = asyncio.ensure_future(loop.run_in_executor(
+            get_pool(), render_derivative, str(source), str(target), max_side, image_format, settings.IMAGE_QUALITY,
+        ))
+        _inflight[target] = future
+        future.add_done_callback(lambda _: _inflight.pop(target, None))
+    await asyncio.shield(future)
+    return target
+
+async def generate_derivatives(root: Path, key: str) -> None:
+    """
+    Sinh trước mọi cỡ (định dạng gốc và WebP) cho ảnh vừa upload; lỗi chỉ ghi log vì
+    ảnh phái sinh còn được sinh lười khi được yêu cầu.
+    """
+    tasks = [
+        ensure_derivative(root, key, size, webp)
+        for size in DERIVATIVE_SIZES for webp in (False, True)
+    ]
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(result, Exception):
+            logger.warning("Lỗi sinh ảnh phái sinh cho %s: %s", key, result)
+
+async def generate_derivatives_batch(root: Path, keys: Iterable[str]) -> None:
+    """
+    Sinh ảnh phái sinh cho nhiều ảnh (import hàng loạt), tối đa IMAGE_PROCESS_WORKERS ảnh
+    cùng lúc để không dồn hàng nghìn tác vụ vào process pool.
+    """
+    semaphore = asyncio.Semaphore(settings.IMAGE_PROCESS_WORKERS)
+
+    async def generate(key: str) -> None:
+        async with semaphore:
+            await generate_derivatives(root, key)
+
+    await asyncio.gather(*(generate(key) for key in keys))
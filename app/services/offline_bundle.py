@@ -0,0 +1,317 @@
+"""
+Gói dữ liệu ngoại tuyến theo phòng và ngày cho máy chấm công.
+
+Mỗi gói chứa lịch học trong ngày của phòng, danh sách sinh viên đăng ký (CourseRegistration
+khớp môn và lớp của buổi học) và template vân tay của sinh viên cùng giảng viên các buổi đó,
+để máy chấm công xác thực và ghi điểm danh khi mất mạng rồi đối soát sau. Tác vụ nền dựng
+sẵn gói cho hôm nay và OFFLINE_BUNDLE_DAYS_AHEAD ngày tới (ba truy vấn cho mỗi ngày, mọi
+phòng), ghi ra OFFLINE_BUNDLE_DIR/{ngày}/{room_id}.bin và chỉ ghi lại khi nội dung đổi để
+ETag giữ nguyên. Thư mục gói nằm ngoài UPLOAD_DIR vì chứa template sinh trắc.
+
+Định dạng (big-endian), ký HMAC-SHA256 bằng OFFLINE_BUNDLE_SIGNING_KEY (mặc định
+HARDWARE_API_KEY, khóa máy chấm công đã có):
+
+    header: magic "FPB1", độ dài manifest (u32), số template (u32)
+    manifest: JSON (room_id, date, schedules, roster: schedule_id -> [user_id])
+    templates: định dạng upsert của gói đồng bộ vân tay (xem fingerprint_sync)
+    chữ ký: 32 byte HMAC-SHA256 của mọi byte phía trước
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import re
+import shutil
+import struct
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import orjson
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Boolean, DateTime, Integer, String, and_, bindparam, select, text, union
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, engine
+from app.models import CourseRegistration, Fingerprint, Schedule
+from app.schemas import AttendanceCreate
+from app.services.fingerprint_sync import TemplateChange, encode_upserts
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_DIR = Path(settings.OFFLINE_BUNDLE_DIR)
+BUNDLE_MAGIC = b"FPB1"
+HEADER = struct.Struct(">4sII")
+
+# Khóa advisory lock: một worker dựng gói mỗi chu kỳ; đối soát khóa theo (namespace, schedule_id)
+BUILD_LOCK_KEY = 0x4F464231
+RECONCILE_LOCK_NAMESPACE = 0x4F46
+
+# room_id dùng làm tên file gói
+ROOM_ID = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.-]{0,19}$")
+
+# Cột lịch học đưa vào manifest
+SCHEDULE_COLUMNS = (
+    Schedule.schedule_id,
+    Schedule.room_id,
+    Schedule.subject_id,
+    Schedule.class_id,
+    Schedule.lecturer_id,
+    Schedule.start_period,
+    Schedule.end_period,
+    Schedule.is_open,
+)
+
+def signing_key() -> bytes:
+    """
+    Khóa ký gói ngoại tuyến.
+    """
+    return (settings.OFFLINE_BUNDLE_SIGNING_KEY or settings.HARDWARE_API_KEY).encode()
+
+def bundle_path(room_id: str, day: date) -> Path:
+    """
+    Đường dẫn gói của phòng trong ngày.
+
+    Raises:
+        ValueError: room_id không dùng làm tên file được
+    """
+    if not ROOM_ID.match(room_id):
+        raise ValueError(f"room_id không hợp lệ: {room_id!r}")
+    return BUNDLE_DIR / day.isoformat() / f"{room_id}.bin"
+
+def encode_bundle(manifest: dict, templates: List[TemplateChange]) -> bytes:
+    """
+    Đóng gói và ký manifest cùng template của một phòng.
+    """
+    body = orjson.dumps(manifest, option=orjson.OPT_SORT_KEYS)
+    payload = HEADER.pack(BUNDLE_MAGIC, len(body), len(templates)) + body + encode_upserts(templates)
+    return payload + hmac.new(signing_key(), payload, hashlib.sha256).digest()
+
+def _scope(query, day: date, room_id: Optional[str]):
+    query = query.where(Schedule.learn_date == day)
+    return query.where(Schedule.room_id == room_id) if room_id is not None else query
+
+async def load_bundles(db: AsyncSession, day: date, room_id: Optional[str] = None) -> Dict[str, bytes]:
+    """
+    Dựng gói cho các phòng có lịch trong ngày bằng ba truy vấn (lịch, danh sách, template).
+
+    Args:
+        db: Database session
+        day: Ngày học
+        room_id: Chỉ dựng cho một phòng (None để dựng cho mọi phòng)
+
+    Returns:
+        Dict[str, bytes]: room_id -> nội dung gói đã ký
+    """
+    schedules = (await db.execute(
+        _scope(select(*SCHEDULE_COLUMNS), day, room_id).order_by(Schedule.room_id, Schedule.start_period, Schedule.schedule_id)
+    )).all()
+    if not schedules:
+        return {}
+
+    registered = _scope(
+        select(Schedule.schedule_id, CourseRegistration.user_id).join(
+            CourseRegistration,
+            and_(
+                CourseRegistration.subject_id == Schedule.subject_id,
+                CourseRegistration.host_class_id == Schedule.class_id,
+            ),
+        ),
+        day, room_id,
+    ).distinct()
+    roster: Dict[int, List[str]] = {}
+    for schedule_id, user_id in await db.execute(registered.order_by(Schedule.schedule_id, CourseRegistration.user_id)):
+        roster.setdefault(schedule_id, []).append(user_id)
+
+    # Template của sinh viên đăng ký và giảng viên các buổi học
+    users = union(
+        _scope(select(CourseRegistration.user_id).join(
+            Schedule,
+            and_(
+                CourseRegistration.subject_id == Schedule.subject_id,
+                CourseRegistration.host_class_id == Schedule.class_id,
+            ),
+        ), day, room_id),
+        _scope(select(Schedule.lecturer_id), day, room_id),
+    )
+    query = (
+        select(Fingerprint.finger_id, Fingerprint.user_id, Fingerprint.version, Fingerprint.finger_data)
+        .where(Fingerprint.user_id.in_(users))
+        .order_by(Fingerprint.user_id, Fingerprint.finger_id)
+    )
+    templates: Dict[str, List[TemplateChange]] = {}
+    for row in await db.execute(query):
+        templates.setdefault(row.user_id, []).append(TemplateChange(*row))
+
+    rooms: Dict[str, List] = {}
+    for row in schedules:
+        rooms.setdefault(row.room_id, []).append(row)
+    bundles = {}
+    for room, rows in rooms.items():
+        manifest = {
+            "room_id": room,
+            "date": day.isoformat(),
+            "schedules": [
+                {key: value for key, value in row._mapping.items() if key != "room_id"}
+                for row in rows
+            ],
+            "roster": {str(row.schedule_id): roster.get(row.schedule_id, []) for row in rows},
+        }
+        members = dict.fromkeys(user_id for row in rows for user_id in (row.lecturer_id, *roster.get(row.schedule_id, [])))
+        bundles[room] = encode_bundle(manifest, [change for user_id in members for change in templates.get(user_id, [])])
+    return bundles
+
+def _write(path: Path, data: bytes) -> bool:
+    """
+    Ghi gói nguyên tử; bỏ qua khi nội dung không đổi (giữ ETag).
+    """
+    try:
+        if path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".bundle-", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return True
+
+def _write_day(day: date, bundles: Dict[str, bytes]) -> int:
+    written = 0
+    for room_id, data in bundles.items():
+        try:
+            path = bundle_path(room_id, day)
+        except ValueError as e:
+            logger.warning("Bỏ qua gói ngoại tuyến: %s", e)
+            continue
+        written += _write(path, data)
+    # Phòng không còn lịch trong ngày thì bỏ gói cũ
+    wanted = {f"{room_id}.bin" for room_id in bundles}
+    for stale in (BUNDLE_DIR / day.isoformat()).glob("*.bin"):
+        if stale.name not in wanted:
+            stale.unlink(missing_ok=True)
+    return written
+
+async def build_bundle(db: AsyncSession, room_id: str, day: date) -> Optional[Path]:
+    """
+    Dựng (hoặc làm mới) gói của một phòng trong ngày.
+
+    Returns:
+        Optional[Path]: Đường dẫn gói, None nếu phòng không có lịch trong ngày
+    """
+    path = bundle_path(room_id, day)
+    bundles = await load_bundles(db, day, room_id)
+    if room_id not in bundles:
+        return None
+    await run_in_threadpool(_write, path, bundles[room_id])
+    return path
+
+def _prune(today: date) -> None:
+    # Thư mục của các ngày đã qua
+    for directory in BUNDLE_DIR.glob("*"):
+        try:
+            day = date.fromisoformat(directory.name)
+        except ValueError:
+            continue
+        if day < today:
+            shutil.rmtree(directory, ignore_errors=True)
+
+async def build_bundles(db: AsyncSession, today: Optional[date] = None) -> dict:
+    """
+    Dựng gói cho mọi phòng có lịch từ hôm nay tới OFFLINE_BUNDLE_DAYS_AHEAD ngày tới và xóa
+    gói của các ngày đã qua.
+
+    Returns:
+        dict: ngày -> {rooms: số phòng, written: số gói ghi mới/thay đổi}
+    """
+    today = today or date.today()
+    report = {}
+    for offset in range(settings.OFFLINE_BUNDLE_DAYS_AHEAD + 1):
+        day = today + timedelta(days=offset)
+        bundles = await load_bundles(db, day)
+        # Kết thúc transaction đọc trước khi ghi đĩa
+        await db.commit()
+        written = await run_in_threadpool(_write_day, day, bundles)
+        report[day.isoformat()] = {"rooms": len(bundles), "written": written}
+    await run_in_threadpool(_prune, today)
+    return report
+
+async def reconcile_checkins(db: AsyncSession, checkins: Sequence[AttendanceCreate]) -> dict:
+    """
+    Ghi điểm danh máy chấm công đã lưu khi ngoại tuyến bằng một câu INSERT ... SELECT.
+
+    Lượt trùng (người dùng đã có điểm danh cho buổi học, hoặc gửi lại nhiều lần) và lượt
+    tham chiếu lịch/người dùng không tồn tại bị bỏ qua; mỗi cặp buổi học/người dùng giữ
+    lượt sớm nhất. Gửi lại cả lô sau khi mất kết nối giữa chừng là an toàn.
+
+    attendance phân vùng theo attend_time nên không có ràng buộc duy nhất trên
+    (schedule_id, user_id); NOT EXISTS được giữ đúng khi nhiều máy đối soát cùng lúc bằng
+    advisory lock theo buổi học (khóa theo thứ tự tăng dần để không deadlock, nhả khi commit).
+
+    Returns:
+        dict: received, inserted và skipped
+    """
+    if not checkins:
+        return {"received": 0, "inserted": 0, "skipped": 0}
+    await db.execute(
+        text(
+            "SELECT pg_advisory_xact_lock(:namespace, schedule_id) "
+            "FROM unnest(CAST(:schedule_ids AS integer[])) AS schedule_id"
+        ).bindparams(
+            bindparam("namespace", RECONCILE_LOCK_NAMESPACE),
+            bindparam("schedule_ids", sorted({checkin.schedule_id for checkin in checkins}), type_=ARRAY(Integer)),
+        )
+    )
+    statement = text(
+        "INSERT INTO attendance (schedule_id, user_id, attend_time, status) "
+        "SELECT DISTINCT ON (v.schedule_id, v.user_id) v.schedule_id, v.user_id, v.attend_time, v.status "
+        "FROM unnest(CAST(:schedule_ids AS integer[]), CAST(:user_ids AS varchar[]), "
+        "CAST(:times AS timestamptz[]), CAST(:statuses AS boolean[])) AS v(schedule_id, user_id, attend_time, status) "
+        "JOIN schedule s ON s.schedule_id = v.schedule_id "
+        "JOIN users u ON u.user_id = v.user_id "
+        "WHERE NOT EXISTS (SELECT 1 FROM attendance a WHERE a.schedule_id = v.schedule_id AND a.user_id = v.user_id) "
+        "ORDER BY v.schedule_id, v.user_id, v.attend_time"
+    ).bindparams(
+        bindparam("schedule_ids", [checkin.schedule_id for checkin in checkins], type_=ARRAY(Integer)),
+        bindparam("user_ids", [checkin.user_id for checkin in checkins], type_=ARRAY(String)),
+        bindparam("times", [checkin.time for checkin in checkins], type_=ARRAY(DateTime(timezone=True))),
+        bindparam("statuses", [checkin.status for checkin in checkins], type_=ARRAY(Boolean)),
+    )
+    inserted = (await db.execute(statement)).rowcount
+    await db.commit()
+    return {"received": len(checkins), "inserted": inserted, "skipped": len(checkins) - inserted}
+
+async def build_bundles_periodically() -> None:
+    """
+    Tác vụ nền dựng gói ngoại tuyến ngay khi khởi động và sau mỗi OFFLINE_BUNDLE_INTERVAL giây.
+
+    Chạy trong mọi worker nhưng mỗi chu kỳ chỉ worker giữ được advisory lock (trên một kết
+    nối riêng, nhả khi xong hoặc khi worker chết) dựng gói; worker khác bỏ qua chu kỳ đó.
+    """
+    while True:
+        try:
+            async with engine.connect() as conn:
+                locked = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": BUILD_LOCK_KEY})).scalar()
+                await conn.commit()
+                if locked:
+                    try:
+                        async with AsyncSessionLocal() as db:
+                            report = await build_bundles(db)
+                    finally:
+                        await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": BUILD_LOCK_KEY})
+                        await conn.commit()
+                    written = sum(day["written"] for day in report.values())
+                    if written:
+                        logger.info("Đã dựng %d gói dữ liệu ngoại tuyến", written)
+        except Exception as e:
+            logger.error("Lỗi dựng gói dữ liệu ngoại tuyến: %s", e)
+        await asyncio.sleep(settings.OFFLINE_BUNDLE_INTERVAL)
@@ -0,0 +1,200 @@
+"""
+Import ảnh đại diện hàng loạt từ file ZIP.
+
+Tên mỗi file trong ZIP (bỏ thư mục và đuôi) là user_id. ZIP được đọc qua central directory
+và giải nén lần lượt từng entry khi cần, không bung cả file vào bộ nhớ hay ra đĩa. Các
+user_id được khớp với hồ sơ sinh viên/giảng viên bằng một truy vấn; ảnh được kiểm tra
+(magic bytes, dung lượng), băm và lưu vào kho theo nội dung bởi nhiều worker song song
+(hàng đợi có giới hạn giữ bộ nhớ ổn định). profile_image_url được cập nhật bằng một câu
+UPDATE ... FROM unnest cho mỗi bảng hồ sơ, trong một transaction.
+"""
+
+import asyncio
+import zipfile
+from pathlib import PurePosixPath
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import String, Text, any_, bindparam, literal, select, text, union_all
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.student_profile import StudentProfile
+from app.models.lecturer_profile import LecturerProfile
+from app.services.storage import profile_images
+from app.services.uploads import SNIFF_BYTES, sniff_image_type, too_large_detail
+
+# Các bảng hồ sơ có ảnh đại diện
+PROFILE_MODELS = (StudentProfile, LecturerProfile)
+
+class EntryError(Exception):
+    """
+    Lỗi của một file trong ZIP (ghi vào báo cáo, không dừng cả lần import).
+    """
+
+def _report(entry: str, user_id: Optional[str], status: str, detail: Optional[str] = None) -> dict:
+    return {"file": entry, "user_id": user_id, "status": status, "detail": detail}
+
+def _read_entry(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> bytes:
+    # Giới hạn theo số byte thực sự giải nén, không tin file_size khai báo trong ZIP
+    with archive.open(info) as f:
+        data = f.read(settings.UPLOAD_MAX_BYTES + 1)
+    if len(data) > settings.UPLOAD_MAX_BYTES:
+        raise EntryError(too_large_detail())
+    return data
+
+async def _match_profiles(db: AsyncSession, user_ids: List[str]) -> Dict[str, List[Tuple[str, Optional[str]]]]:
+    """
+    Tìm hồ sơ của các user_id bằng một truy vấn.
+
+    Returns:
+        Dict[str, List[Tuple[str, Optional[str]]]]: user_id -> [(bảng hồ sơ, profile_image_url hiện tại)]
+    """
+    candidates = literal(user_ids, ARRAY(String))
+    query = union_all(*(
+        select(model.user_id, literal(model.__tablename__), model.profile_image_url)
+        .where(model.user_id == any_(candidates))
+        for model in PROFILE_MODELS
+    ))
+    matched: Dict[str, List[Tuple[str, Optional[str]]]] = {}
+    for user_id, table, current in await db.execute(query):
+        matched.setdefault(user_id, []).append((table, current))
+    return matched
+
+async def _store_entries(
+    archive: zipfile.ZipFile,
+    entries: List[Tuple[str, zipfile.ZipInfo]],
+    report: List[dict],
+) -> Dict[str, Tuple[str, bool]]:
+    """
+    Giải nén tuần tự (ZipFile không an toàn khi đọc song song) và lưu song song các ảnh.
+
+    Returns:
+        Dict[str, Tuple[str, bool]]: user_id -> (khóa ảnh, cờ file mới được ghi)
+    """
+    workers = settings.PROFILE_IMAGE_IMPORT_WORKERS
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    stored: Dict[str, Tuple[str, bool]] = {}
+
+    async def produce() -> None:
+        try:
+            for user_id, info in entries:
+                try:
+                    data = await run_in_threadpool(_read_entry, archive, info)
+                except EntryError as e:
+                    report.append(_report(info.filename, user_id, "rejected", str(e)))
+                    continue
+                except (zipfile.BadZipFile, OSError, RuntimeError, NotImplementedError) as e:
+                    report.append(_report(info.filename, user_id, "rejected", f"Không giải nén được: {e}"))
+                    continue
+                await queue.put((user_id, info.filename, data))
+        finally:
+            for _ in range(workers):
+                await queue.put(None)
+
+    async def consume() -> None:
+        while (item := await queue.get()) is not None:
+            user_id, entry, data = item
+            image_type = sniff_image_type(data[:SNIFF_BYTES])
+            if image_type is None:
+                report.append(_report(entry, user_id, "rejected", "Chỉ chấp nhận file ảnh JPEG, PNG, GIF hoặc WebP"))
+                continue
+            try:
+                stored[user_id] = await run_in_threadpool(profile_images.store_bytes, data, image_type.extension)
+            except OSError as e:
+                report.append(_report(entry, user_id, "rejected", f"Lỗi lưu file: {e}"))
+
+    await asyncio.gather(produce(), *(consume() for _ in range(workers)))
+    return stored
+
+async def _bulk_update(db: AsyncSession, table: str, assignments: List[Tuple[str, str]]) -> int:
+    """
+    Gán profile_image_url cho nhiều hồ sơ của một bảng bằng một câu UPDATE.
+    """
+    statement = text(
+        f"UPDATE {table} p SET profile_image_url = v.key "
+        "FROM unnest(CAST(:user_ids AS varchar[]), CAST(:keys AS text[])) AS v(user_id, key) "
+        "WHERE p.user_id = v.user_id"
+    ).bindparams(
+        bindparam("user_ids", [user_id for user_id, _ in assignments], type_=ARRAY(String)),
+        bindparam("keys", [key for _, key in assignments], type_=ARRAY(Text)),
+    )
+    return (await db.execute(statement)).rowcount
+
+async def import_profile_images(db: AsyncSession, upload: UploadFile) -> Tuple[dict, List[str]]:
+    """
+    Import ảnh đại diện từ file ZIP trong một transaction.
+
+    Args:
+        db: Database session (primary)
+        upload: File ZIP upload, mỗi file đặt tên theo user_id
+
+    Returns:
+        Tuple[dict, List[str]]: Kết quả (total, updated, unchanged, rejected, files) và các
+        khóa ảnh mới ghi cần sinh ảnh phái sinh
+
+    Raises:
+        HTTPException: 400 nếu không phải file ZIP hợp lệ hoặc có quá nhiều mục
+    """
+    try:
+        archive = await run_in_threadpool(zipfile.ZipFile, upload.file)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="File ZIP không hợp lệ")
+    if len(archive.infolist()) > settings.IMPORT_MAX_ZIP_ENTRIES:
+        archive.close()
+        raise HTTPException(status_code=400, detail=f"File ZIP có quá nhiều mục (tối đa {settings.IMPORT_MAX_ZIP_ENTRIES})")
+
+    report: List[dict] = []
+    with archive:
+        candidates: Dict[str, zipfile.ZipInfo] = {}
+        for info in archive.infolist():
+            path = PurePosixPath(info.filename)
+            # Bỏ thư mục và file hệ thống (__MACOSX, .DS_Store, ...)
+            if info.is_dir() or path.name.startswith(".") or "__MACOSX" in path.parts:
+                continue
+            user_id = path.stem
+            if user_id in candidates:
+                report.append(_report(info.filename, user_id, "rejected", f"Trùng user_id với {candidates[user_id].filename}"))
+            elif info.file_size > settings.UPLOAD_MAX_BYTES:
+                report.append(_report(info.filename, user_id, "rejected", too_large_detail()))
+            else:
+                candidates[user_id] = info
+
+        profiles = await _match_profiles(db, list(candidates)) if candidates else {}
+        entries = []
+        for user_id, info in candidates.items():
+            if user_id in profiles:
+                entries.append((user_id, info))
+            else:
+                report.append(_report(info.filename, user_id, "rejected", "Không tìm thấy hồ sơ sinh viên/giảng viên"))
+
+        stored = await _store_entries(archive, entries, report)
+
+    assignments: Dict[str, List[Tuple[str, str]]] = {}
+    previous = []
+    for user_id, info in entries:
+        if user_id not in stored:
+            continue
+        key, _ = stored[user_id]
+        changed = False
+        for table, current in profiles[user_id]:
+            if current != key:
+                assignments.setdefault(table, []).append((user_id, key))
+                changed = True
+                if current:
+                    previous.append(current)
+        report.append(_report(info.filename, user_id, "updated" if changed else "unchanged", key))
+
+    for table, pairs in assignments.items():
+        await _bulk_update(db, table, pairs)
+    await db.commit()
+
+    # Ảnh cũ không còn hồ sơ nào dùng
+    await profile_images.release_many(db, previous)
+
+    created = list(dict.fromkeys(key for key, is_new in stored.values() if is_new))
+    counts = {status: 0 for status in ("updated", "unchanged", "rejected")}
+    for row in report:
+        counts[row["status"]] += 1
+    summary = {"total": len(report), **counts, "files": report}
+    return summary, created
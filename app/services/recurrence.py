@@ -0,0 +1,31 @@
+"""
+Sinh chuỗi lịch lặp hằng tuần.
+
+Chuỗi được mở rộng thành danh sách ngày học trong bộ nhớ; xung đột phòng/giảng viên/lớp
+của mọi buổi được kiểm tra trong một lượt bằng app.services.schedule_conflicts.
+"""
+
+from datetime import date, timedelta
+from typing import Iterable, List
+
+def expand_weekly(weekday: int, start_date: date, end_date: date, excluded_dates: Iterable[date] = ()) -> List[date]:
+    """
+    Các ngày có thứ weekday trong [start_date, end_date], bỏ các ngày bị loại trừ.
+
+    Args:
+        weekday: 0 = Thứ Hai ... 6 = Chủ Nhật
+        start_date: Ngày bắt đầu (bao gồm)
+        end_date: Ngày kết thúc (bao gồm)
+        excluded_dates: Ngày nghỉ/lễ
+
+    Returns:
+        List[date]: Ngày học theo thứ tự tăng dần
+    """
+    excluded = set(excluded_dates)
+    day = start_date + timedelta(days=(weekday - start_date.weekday()) % 7)
+    dates = []
+    while day <= end_date:
+        if day not in excluded:
+            dates.append(day)
+        day += timedelta(weeks=1)
+    return dates
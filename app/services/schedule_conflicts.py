@@ -0,0 +1,208 @@
+"""
+Phát hiện trùng lịch phòng, giảng viên và lớp.
+
+IntervalIndex giữ các khoảng tiết [start_period, end_period] đã sắp xếp theo từng
+(ngày, phòng), (ngày, giảng viên) và (ngày, lớp). Kiểm tra một lịch mới là một lần tìm
+nhị phân trên mỗi nhóm (O(log n)); kiểm tra cả một đợt (chuỗi lịch, file import cả học
+kỳ) là một lượt duy nhất qua đợt đó: lịch không trùng được thêm vào chỉ mục để các lịch
+sau trong đợt được kiểm tra cả với nó.
+"""
+
+from bisect import bisect_right
+from datetime import date
+from typing import Any, Collection, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Schedule
+
+# Các tài nguyên không được dùng chồng giờ
+KINDS = ("room_id", "lecturer_id", "class_id")
+
+KIND_LABELS = {"room_id": "phòng", "lecturer_id": "giảng viên", "class_id": "lớp"}
+
+# Số khóa tối đa lọc bằng IN khi nạp lịch đã có
+MAX_KEY_FILTER = 1000
+
+class Slot(NamedTuple):
+    """
+    Một buổi học cần xếp.
+
+    Attributes:
+        ref: Định danh của buổi (schedule_id với lịch đã có, chỉ số/số dòng với lịch mới)
+    """
+    ref: Any
+    room_id: str
+    lecturer_id: str
+    class_id: str
+    learn_date: date
+    start_period: int
+    end_period: int
+
+class Conflict(NamedTuple):
+    """
+    Một cặp buổi học dùng chung tài nguyên trong các tiết chồng nhau.
+    """
+    slot: Slot
+    other: Slot
+    kind: str
+
+    @property
+    def message(self) -> str:
+        return (
+            f"Trùng {KIND_LABELS[self.kind]} {getattr(self.slot, self.kind)} ngày {self.slot.learn_date} "
+            f"tiết {self.other.start_period}-{self.other.end_period}"
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "ref": self.slot.ref,
+            "kind": self.kind,
+            "key": getattr(self.slot, self.kind),
+            "learn_date": self.slot.learn_date.isoformat(),
+            "start_period": self.slot.start_period,
+            "end_period": self.slot.end_period,
+            "conflicts_with": self.other.ref,
+            "other_start_period": self.other.start_period,
+            "other_end_period": self.other.end_period,
+            "message": self.message,
+        }
+
+class _Bucket:
+    """
+    Các khoảng tiết của một (loại, ngày, khóa), sắp theo tiết bắt đầu, kèm max tiết kết
+    thúc cộng dồn để dừng quét sớm.
+    """
+
+    __slots__ = ("starts", "slots", "max_ends")
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.slots: List[Slot] = []
+        self.max_ends: List[int] = []
+
+    def add(self, slot: Slot) -> None:
+        position = bisect_right(self.starts, slot.start_period)
+        self.starts.insert(position, slot.start_period)
+        self.slots.insert(position, slot)
+        self.max_ends.insert(position, 0)
+        running = self.max_ends[position - 1] if position else 0
+        for index in range(position, len(self.slots)):
+            running = max(running, self.slots[index].end_period)
+            self.max_ends[index] = running
+
+    def overlapping(self, start: int, end: int) -> Iterable[Slot]:
+        # Chỉ các khoảng có tiết bắt đầu <= end mới có thể chồng; quét ngược đến khi
+        # không khoảng nào phía trước kết thúc từ tiết start trở đi
+        index = bisect_right(self.starts, end) - 1
+        while index >= 0 and self.max_ends[index] >= start:
+            if self.slots[index].end_period >= start:
+                yield self.slots[index]
+            index -= 1
+
+class IntervalIndex:
+    """
+    Chỉ mục khoảng tiết theo (loại tài nguyên, ngày, khóa).
+    """
+
+    def __init__(self, slots: Iterable[Slot] = ()):
+        self._buckets: Dict[Tuple[str, date, str], _Bucket] = {}
+        for slot in slots:
+            self.add(slot)
+
+    def add(self, slot: Slot) -> None:
+        """
+        Thêm một buổi vào chỉ mục.
+        """
+        for kind in KINDS:
+            key = (kind, slot.learn_date, getattr(slot, kind))
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket()
+            bucket.add(slot)
+
+    def conflicts(self, slot: Slot) -> List[Conflict]:
+        """
+        Các buổi trong chỉ mục trùng tài nguyên với slot.
+        """
+        found = []
+        for kind in KINDS:
+            bucket = self._buckets.get((kind, slot.learn_date, getattr(slot, kind)))
+            if bucket is None:
+                continue
+            for other in bucket.overlapping(slot.start_period, slot.end_period):
+                if other is not slot:
+                    found.append(Conflict(slot, other, kind))
+        return found
+
+    def check_batch(self, slots: Iterable[Slot]) -> List[Conflict]:
+        """
+        Kiểm tra cả đợt theo thứ tự trong một lượt: buổi không trùng được thêm vào chỉ
+        mục, buổi trùng (với dữ liệu đã có hoặc buổi trước trong đợt) được báo lỗi.
+
+        Returns:
+            List[Conflict]: Xung đột của các buổi bị loại
+        """
+        rejected = []
+        for slot in slots:
+            found = self.conflicts(slot)
+            if found:
+                rejected.extend(found)
+            else:
+                self.add(slot)
+        return rejected
+
+async def load_index(
+    db: AsyncSession,
+    slots: List[Slot],
+    exclude_schedule_ids: Collection[int] = (),
+    exclude_series_id: Optional[int] = None,
+) -> IntervalIndex:
+    """
+    Nạp các lịch đã có có thể trùng với slots vào chỉ mục bằng một truy vấn.
+
+    Args:
+        db: Database session
+        slots: Các buổi sắp kiểm tra
+        exclude_schedule_ids: Bỏ qua các lịch này (khi cập nhật chính chúng)
+        exclude_series_id: Bỏ qua các buổi của chuỗi này (khi cập nhật chuỗi)
+
+    Returns:
+        IntervalIndex: Chỉ mục các lịch đã có
+    """
+    if not slots:
+        return IntervalIndex()
+    dates = {slot.learn_date for slot in slots}
+    keys = [{getattr(slot, kind) for slot in slots} for kind in KINDS]
+    query = select(
+        Schedule.schedule_id,
+        Schedule.room_id,
+        Schedule.lecturer_id,
+        Schedule.class_id,
+        Schedule.learn_date,
+        Schedule.start_period,
+        Schedule.end_period,
+    ).where(Schedule.learn_date.between(min(dates), max(dates)))
+    # Đợt lớn (import cả học kỳ) chạm gần như mọi phòng/lớp: nạp cả khoảng ngày
+    # thay vì gửi hàng nghìn tham số IN
+    if sum(len(values) for values in keys) <= MAX_KEY_FILTER:
+        query = query.where(or_(*(
+            getattr(Schedule, kind).in_(values) for kind, values in zip(KINDS, keys)
+        )))
+    if exclude_schedule_ids:
+        query = query.where(Schedule.schedule_id.notin_(exclude_schedule_ids))
+    if exclude_series_id is not None:
+        query = query.where(or_(Schedule.series_id.is_(None), Schedule.series_id != exclude_series_id))
+    result = await db.execute(query)
+    return IntervalIndex(Slot(*row) for row in result.all() if row.learn_date in dates)
+
+async def find_conflicts(
+    db: AsyncSession,
+    slots: List[Slot],
+    exclude_schedule_ids: Collection[int] = (),
+    exclude_series_id: Optional[int] = None,
+) -> List[Conflict]:
+    """
+    Kiểm tra một hoặc nhiều buổi mới với dữ liệu đã có và với nhau.
+    """
+    index = await load_index(db, slots, exclude_schedule_ids, exclude_series_id)
+    return index.check_batch(slots)
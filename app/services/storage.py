@@ -0,0 +1,219 @@
+"""
+Kho file định địa chỉ theo nội dung.
+
+Mỗi file được đặt tên theo SHA-256 của nội dung và chia vào thư mục con theo tiền tố
+hash (ab/cd/abcd...{đuôi}), nên không thư mục nào phình to và một khóa luôn trỏ tới đúng
+một nội dung: URL bất biến, cache được mãi mãi. File trùng nội dung chỉ lưu một lần.
+
+Số tham chiếu của một khóa là số dòng có cột tham chiếu (profile_image_url) bằng khóa đó,
+đếm trực tiếp từ database thay vì lưu bộ đếm riêng nên không thể lệch. File chỉ bị xóa
+khi không còn tham chiếu và đã qua UPLOAD_RELEASE_GRACE kể từ lần ghi cuối: upload trùng
+nội dung đang chờ commit chạm lại mtime của file nên không bị xóa mất.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Text, any_, literal, select, union
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.student_profile import StudentProfile
+from app.models.lecturer_profile import LecturerProfile
+
+logger = logging.getLogger(__name__)
+
+# Số cấp thư mục con và số ký tự hash mỗi cấp
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+
+# Khóa định địa chỉ theo nội dung: ab/cd/{sha256}.{đuôi}
+CONTENT_KEY = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+$")
+
+# Thư mục con chứa file tạm đang upload (cùng filesystem để os.replace nguyên tử)
+INCOMING_DIR = ".incoming"
+
+# Thư mục con chứa ảnh phái sinh
+DERIVATIVES_DIR = "derivatives"
+
+def is_content_addressed(key: str) -> bool:
+    """
+    Khóa có phải dạng định địa chỉ theo nội dung (bất biến) hay không.
+    """
+    return CONTENT_KEY.match(key) is not None
+
+class ContentStore:
+    """
+    Kho file định địa chỉ theo nội dung dưới một thư mục gốc.
+
+    Attributes:
+        root: Thư mục gốc
+        references: Các cột lưu khóa file, dùng để đếm tham chiếu
+    """
+
+    def __init__(self, root: Path, references: Sequence):
+        self.root = root
+        self.references = tuple(references)
+
+    @property
+    def incoming(self) -> Path:
+        return self.root / INCOMING_DIR
+
+    def key_for(self, digest: str, extension: str) -> str:
+        """
+        Khóa của nội dung có hash digest: ab/cd/{digest}{extension}.
+        """
+        shards = [digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_LEVELS)]
+        return "/".join(shards + [f"{digest}{extension}"])
+
+    def path(self, key: str) -> Path:
+        """
+        Đường dẫn file của khóa.
+
+        Raises:
+            ValueError: Khóa trỏ ra ngoài thư mục gốc hoặc vào thư mục nội bộ
+        """
+        root = self.root.resolve()
+        path = (root / key).resolve()
+        if path == root or root not in path.parents:
+            raise ValueError(f"Khóa không hợp lệ: {key}")
+        if path.relative_to(root).parts[0] in (INCOMING_DIR, DERIVATIVES_DIR):
+            raise ValueError(f"Khóa không hợp lệ: {key}")
+        return path
+
+    def immutable_tag(self, path: Path) -> Optional[str]:
+        """
+        Định danh bất biến của file trong kho: {sha256}{đuôi} với ảnh gốc, {cỡ}/{sha256}{đuôi}
+        với ảnh phái sinh; None nếu file không định địa chỉ theo nội dung (có thể thay đổi).
+        """
+        try:
+            parts = path.resolve().relative_to(self.root.resolve()).parts
+        except ValueError:
+            return None
+        prefix = ()
+        if parts and parts[0] == DERIVATIVES_DIR:
+            prefix, parts = parts[1:2], parts[2:]
+        if not is_content_addressed("/".join(parts)):
+            return None
+        return "/".join(prefix + parts[-1:])
+
+    def _place(self, temp_path: str, key: str) -> bool:
+        target = self.root / key
+        if target.exists():
+            # Trùng nội dung: giữ file cũ, chạm mtime để không bị giải phóng trong lúc chờ commit
+            os.utime(target)
+            os.unlink(temp_path)
+            return False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, target)
+        return True
+
+    def store_bytes(self, data: bytes, extension: str) -> Tuple[str, bool]:
+        """
+        Lưu nội dung đã có trong bộ nhớ (đồng bộ, gọi trong threadpool).
+
+        Returns:
+            Tuple[str, bool]: Khóa và cờ file mới được ghi
+        """
+        key = self.key_for(hashlib.sha256(data).hexdigest(), extension)
+        target = self.root / key
+        if target.exists():
+            os.utime(target)
+            return key, False
+        self.incoming.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.incoming, prefix=".store-", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            return key, self._place(temp_path, key)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    async def place(self, temp_path: str, key: str) -> bool:
+        """
+        Đưa file tạm (đã ghi đầy đủ) vào vị trí của khóa.
+
+        Returns:
+            bool: True nếu file mới được ghi, False nếu nội dung đã có sẵn
+        """
+        return await run_in_threadpool(self._place, temp_path, key)
+
+    async def referenced(self, db: AsyncSession, keys: Sequence[str]) -> Set[str]:
+        """
+        Tập các khóa trong keys còn được ít nhất một dòng tham chiếu (một truy vấn).
+        """
+        candidates = literal(list(keys), ARRAY(Text))
+        query = union(*(select(column).where(column == any_(candidates)) for column in self.references))
+        return set((await db.execute(query)).scalars())
+
+    def _remove(self, key: str) -> bool:
+        path = self.path(key)
+        try:
+            if time.time() - path.stat().st_mtime < settings.UPLOAD_RELEASE_GRACE:
+                return False
+            path.unlink()
+        except FileNotFoundError:
+            return False
+        # Ảnh phái sinh nằm dưới derivatives/{cỡ}/ với cùng đường dẫn con và tên gốc
+        relative = Path(key)
+        derivatives = self.root / DERIVATIVES_DIR
+        if derivatives.is_dir():
+            for size_dir in derivatives.iterdir():
+                for derivative in (size_dir / relative.parent).glob(f"{relative.stem}.*"):
+                    derivative.unlink(missing_ok=True)
+        return True
+
+    def _remove_all(self, keys: Iterable[str]) -> List[str]:
+        removed = []
+        for key in keys:
+            try:
+                if self._remove(key):
+                    removed.append(key)
+            except (OSError, ValueError) as e:
+                logger.warning("Lỗi giải phóng file %s: %s", key, e)
+        return removed
+
+    async def release_many(self, db: AsyncSession, keys: Iterable[str]) -> List[str]:
+        """
+        Giải phóng file của các khóa không còn dòng nào tham chiếu; gọi sau khi commit
+        thay đổi bỏ tham chiếu. Lỗi chỉ ghi log vì file thừa không ảnh hưởng dữ liệu.
+
+        Returns:
+            List[str]: Các khóa đã bị xóa file
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return []
+        try:
+            referenced = await self.referenced(db, keys)
+            unreferenced = [key for key in keys if key not in referenced]
+            removed = await run_in_threadpool(self._remove_all, unreferenced)
+        except Exception as e:
+            logger.warning("Lỗi giải phóng %d file: %s", len(keys), e)
+            return []
+        for key in removed:
+            logger.info("Đã xóa file không còn tham chiếu %s", key)
+        return removed
+
+    async def release(self, db: AsyncSession, key: str) -> bool:
+        """
+        Giải phóng file của một khóa nếu không còn dòng nào tham chiếu (xem release_many).
+
+        Returns:
+            bool: True nếu file đã bị xóa
+        """
+        return bool(await self.release_many(db, [key]))
+
+# Kho ảnh đại diện sinh viên và giảng viên
+profile_images = ContentStore(
+    Path(settings.UPLOAD_DIR) / "profile_images",
+    references=(StudentProfile.profile_image_url, LecturerProfile.profile_image_url),
+)
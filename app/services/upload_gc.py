@@ -0,0 +1,195 @@
+"""
+Dọn file upload không còn được tham chiếu.
+
+Tập khóa đang được tham chiếu (profile_image_url) được nạp bằng một truy vấn vào một tập
+gọn: khóa định địa chỉ theo nội dung lưu dưới dạng 32 byte SHA-256 thay vì chuỗi đường
+dẫn. Cây thư mục của kho được duyệt bằng os.scandir theo luồng (không liệt kê cả thư mục
+vào bộ nhớ); file không được tham chiếu và không đổi trong UPLOAD_GC_GRACE giây được xóa
+theo lô UPLOAD_GC_BATCH_SIZE file, nghỉ UPLOAD_GC_BATCH_DELAY giây giữa các lô để không
+dồn I/O. Trước khi xóa mỗi lô, tham chiếu được kiểm tra lại trong database để không xóa
+ảnh vừa được gán sau lúc nạp tập khóa.
+
+Ngoài ảnh gốc, job còn dọn ảnh phái sinh của ảnh không còn tham chiếu và file tạm upload
+bị bỏ dở.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Union
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, union
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.services.storage import DERIVATIVES_DIR, INCOMING_DIR, ContentStore, is_content_addressed, profile_images
+
+logger = logging.getLogger(__name__)
+
+# Số đường dẫn tối đa trả về trong báo cáo
+REPORT_SAMPLE_SIZE = 100
+
+# Định danh gọn của ảnh: digest SHA-256 (bytes) hoặc khóa cũ (str)
+Identity = Union[bytes, str]
+
+class Orphan(NamedTuple):
+    """
+    File ứng viên bị xóa.
+    """
+    path: Path
+    size: int
+    key: Optional[str]  # Khóa ảnh gốc cần kiểm tra lại tham chiếu, None với file phái sinh/tạm
+
+def identity(key: str, strip_suffix: bool = False) -> Identity:
+    """
+    Định danh gọn của ảnh theo khóa.
+
+    Args:
+        key: Khóa ảnh trong kho
+        strip_suffix: Bỏ đuôi của khóa cũ (so khớp ảnh phái sinh, có đuôi khác ảnh gốc)
+    """
+    if is_content_addressed(key):
+        return bytes.fromhex(Path(key).stem)
+    path = Path(key)
+    return (path.with_suffix("") if strip_suffix else path).as_posix()
+
+async def load_referenced(db: AsyncSession, store: ContentStore) -> Set[Identity]:
+    """
+    Nạp định danh các ảnh đang được tham chiếu bằng một truy vấn.
+
+    Khóa cũ (không định địa chỉ theo nội dung) có thêm dạng bỏ đuôi để giữ ảnh phái sinh.
+    """
+    query = union(*(select(column).where(column.isnot(None)) for column in store.references))
+    referenced: Set[Identity] = set()
+    for key in (await db.execute(query)).scalars():
+        referenced.add(identity(key))
+        if not is_content_addressed(key):
+            referenced.add(identity(key, strip_suffix=True))
+    return referenced
+
+def _walk(directory: Path, relative: str = "") -> Iterator[tuple]:
+    """
+    Duyệt file dưới directory bằng os.scandir, trả về (khóa tương đối, DirEntry).
+    """
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            key = f"{relative}{entry.name}"
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk(Path(entry.path), f"{key}/")
+            elif entry.is_file(follow_symlinks=False):
+                yield key, entry
+
+def _iter_orphans(store: ContentStore, referenced: Set[Identity], cutoff: float, counter: Dict[str, int]) -> Iterator[Orphan]:
+    """
+    Các file của kho không còn được tham chiếu và không đổi từ trước cutoff.
+    """
+    for key, entry in _walk(store.root):
+        counter["scanned"] += 1
+        stat = entry.stat(follow_symlinks=False)
+        if stat.st_mtime >= cutoff:
+            continue
+        top = key.split("/", 1)[0]
+        if top == INCOMING_DIR:
+            # File tạm của upload bị gián đoạn
+            yield Orphan(Path(entry.path), stat.st_size, None)
+        elif top == DERIVATIVES_DIR:
+            # derivatives/{cỡ}/{khóa ảnh gốc với đuôi của ảnh phái sinh}
+            parts = key.split("/", 2)
+            if len(parts) == 3 and identity(parts[2], strip_suffix=True) not in referenced:
+                yield Orphan(Path(entry.path), stat.st_size, None)
+        elif identity(key) not in referenced:
+            yield Orphan(Path(entry.path), stat.st_size, key)
+
+def _next_batch(orphans: Iterator[Orphan], size: int) -> List[Orphan]:
+    batch = []
+    for orphan in orphans:
+        batch.append(orphan)
+        if len(batch) >= size:
+            break
+    return batch
+
+def _delete(batch: List[Orphan], cutoff: float) -> List[Orphan]:
+    deleted = []
+    for orphan in batch:
+        try:
+            # File có thể vừa được chạm lại bởi upload trùng nội dung
+            if orphan.path.stat().st_mtime >= cutoff:
+                continue
+            orphan.path.unlink()
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning("Không xóa được %s: %s", orphan.path, e)
+            continue
+        deleted.append(orphan)
+    return deleted
+
+async def collect_garbage(db: AsyncSession, store: ContentStore = profile_images, dry_run: bool = False) -> dict:
+    """
+    Xóa (hoặc liệt kê khi dry_run) các file không còn được tham chiếu của kho.
+
+    Args:
+        db: Database session
+        store: Kho cần dọn
+        dry_run: Chỉ báo cáo, không xóa
+
+    Returns:
+        dict: scanned, orphaned, deleted, bytes (dung lượng file mồ côi), dry_run và sample
+        (tối đa REPORT_SAMPLE_SIZE đường dẫn)
+    """
+    cutoff = time.time() - settings.UPLOAD_GC_GRACE
+    referenced = await load_referenced(db, store)
+    # Kết thúc transaction đọc để không giữ snapshot suốt lúc duyệt đĩa
+    await db.commit()
+
+    counter = {"scanned": 0}
+    orphans = _iter_orphans(store, referenced, cutoff, counter)
+    orphaned = deleted = total_bytes = 0
+    sample: List[str] = []
+    while True:
+        batch = await run_in_threadpool(_next_batch, orphans, settings.UPLOAD_GC_BATCH_SIZE)
+        if not batch:
+            break
+        keys = [orphan.key for orphan in batch if orphan.key is not None]
+        if keys:
+            still_referenced = await store.referenced(db, keys)
+            await db.commit()
+            batch = [orphan for orphan in batch if orphan.key not in still_referenced]
+        orphaned += len(batch)
+        total_bytes += sum(orphan.size for orphan in batch)
+        if dry_run:
+            sample.extend(str(orphan.path) for orphan in batch[:REPORT_SAMPLE_SIZE - len(sample)])
+            continue
+        removed = await run_in_threadpool(_delete, batch, cutoff)
+        deleted += len(removed)
+        sample.extend(str(orphan.path) for orphan in removed[:REPORT_SAMPLE_SIZE - len(sample)])
+        await asyncio.sleep(settings.UPLOAD_GC_BATCH_DELAY)
+
+    return {
+        "scanned": counter["scanned"],
+        "orphaned": orphaned,
+        "deleted": deleted,
+        "bytes": total_bytes,
+        "dry_run": dry_run,
+        "sample": sample,
+    }
+
+async def collect_garbage_periodically() -> None:
+    """
+    Tác vụ nền dọn file không còn tham chiếu theo chu kỳ UPLOAD_GC_INTERVAL.
+    """
+    while True:
+        await asyncio.sleep(settings.UPLOAD_GC_INTERVAL)
+        try:
+            async with AsyncSessionLocal() as db:
+                report = await collect_garbage(db)
+            if report["deleted"]:
+                logger.info("Đã dọn %d file upload không còn tham chiếu (%d byte)", report["deleted"], report["bytes"])
+        except Exception as e:
+            logger.error("Lỗi dọn file upload: %s", e)
@@ -0,0 +1,174 @@
+"""
+Pipeline upload file ảnh.
+
+File được đọc từng chunk và ghi vào file tạm trong kho đích (ghi đĩa và tính SHA-256
+chạy trong threadpool, không chặn event loop), dừng ngay khi vượt giới hạn dung lượng.
+Loại ảnh được nhận diện từ magic bytes của nội dung thay vì content_type/đuôi file do
+client gửi. File hoàn chỉnh được đưa vào vị trí theo hash nội dung bằng os.replace
+(nguyên tử); nội dung đã có trong kho thì bỏ file tạm.
+"""
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import NamedTuple, Optional
+import orjson
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from app.services.storage import ContentStore
+
+# Số byte đầu file cần để nhận diện loại ảnh
+SNIFF_BYTES = 12
+
+# Phần dư cho boundary và header của multipart khi kiểm tra Content-Length
+MULTIPART_OVERHEAD = 16 * 1024
+
+class ImageType(NamedTuple):
+    """
+    Loại ảnh được chấp nhận.
+    """
+    extension: str
+    media_type: str
+
+JPEG = ImageType(".jpg", "image/jpeg")
+PNG = ImageType(".png", "image/png")
+GIF = ImageType(".gif", "image/gif")
+WEBP = ImageType(".webp", "image/webp")
+
+def sniff_image_type(header: bytes) -> Optional[ImageType]:
+    """
+    Nhận diện loại ảnh từ magic bytes.
+
+    Args:
+        header: Ít nhất SNIFF_BYTES byte đầu file
+
+    Returns:
+        Optional[ImageType]: Loại ảnh, None nếu không phải ảnh được hỗ trợ
+    """
+    if header.startswith(b"\xff\xd8\xff"):
+        return JPEG
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return PNG
+    if header.startswith((b"GIF87a", b"GIF89a")):
+        return GIF
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return WEBP
+    return None
+
+class StoredUpload(NamedTuple):
+    """
+    Kết quả lưu một file upload.
+    """
+    key: str
+    path: Path
+    size: int
+    image_type: ImageType
+    created: bool
+
+def too_large_detail(max_bytes: Optional[int] = None) -> str:
+    limit = settings.UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    return f"File quá lớn (tối đa {limit // (1024 * 1024)}MB)"
+
+def _discard(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+def _write(buffer, hasher, chunk: bytes) -> None:
+    buffer.write(chunk)
+    hasher.update(chunk)
+
+async def save_image(upload: UploadFile, store: ContentStore) -> StoredUpload:
+    """
+    Lưu ảnh upload vào kho theo hash nội dung.
+
+    Args:
+        upload: File upload
+        store: Kho đích
+
+    Returns:
+        StoredUpload: Khóa, đường dẫn, dung lượng, loại ảnh và cờ file mới được ghi
+
+    Raises:
+        HTTPException: 400 nếu không phải ảnh hỗ trợ, 413 nếu vượt UPLOAD_MAX_BYTES
+    """
+    await run_in_threadpool(store.incoming.mkdir, parents=True, exist_ok=True)
+    fd, temp_path = await run_in_threadpool(tempfile.mkstemp, dir=store.incoming, prefix=".upload-", suffix=".part")
+    buffer = os.fdopen(fd, "wb")
+    hasher = hashlib.sha256()
+    size = 0
+    header = b""
+    image_type = None
+    try:
+        while True:
+            chunk = await upload.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > settings.UPLOAD_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=too_large_detail())
+            if image_type is None:
+                header = (header + chunk)[:SNIFF_BYTES]
+                if len(header) >= SNIFF_BYTES:
+                    image_type = sniff_image_type(header)
+                    if image_type is None:
+                        raise HTTPException(status_code=400, detail="Chỉ chấp nhận file ảnh JPEG, PNG, GIF hoặc WebP")
+            await run_in_threadpool(_write, buffer, hasher, chunk)
+        if image_type is None:
+            raise HTTPException(status_code=400, detail="Chỉ chấp nhận file ảnh JPEG, PNG, GIF hoặc WebP")
+        await run_in_threadpool(buffer.close)
+        key = store.key_for(hasher.hexdigest(), image_type.extension)
+        created = await store.place(temp_path, key)
+    except BaseException:
+        buffer.close()
+        await run_in_threadpool(_discard, temp_path)
+        raise
+    return StoredUpload(key, store.root / key, size, image_type, created)
+
+class UploadSizeLimitMiddleware:
+    """
+    Giới hạn dung lượng body của request upload (413).
+
+    Request có Content-Length vượt giới hạn bị từ chối trước khi đọc body. Request không
+    có Content-Length (chunked) được đếm byte ngay khi nhận và dừng lúc vượt giới hạn,
+    trước khi Starlette kịp đọc hết multipart vào file tạm.
+    """
+
+    def __init__(self, app: ASGIApp, path_prefix: str, max_bytes: int):
+        self.app = app
+        self.path_prefix = path_prefix
+        self.detail = too_large_detail(max_bytes)
+        self.max_bytes = max_bytes + MULTIPART_OVERHEAD
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT") or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_bytes:
+                body = orjson.dumps({"detail": self.detail})
+                await send({
+                    "type": "http.response.start",
+                    "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+                })
+                await send({"type": "http.response.body", "body": body})
+                return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # FastAPI giữ nguyên HTTPException khi đọc body, ExceptionMiddleware trả 413
+                    raise HTTPException(status_code=413, detail=self.detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
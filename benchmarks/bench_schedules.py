@@ -0,0 +1,89 @@
+"""
+Benchmark serialize phản hồi GET /schedules/ với 100k dòng, trước và sau đường JSON nhanh.
+
+- before: trả ORM objects qua response_model (validate Pydantic + jsonable + json stdlib)
+- after: select theo cột, serialize thẳng row tuple bằng orjson (rows_response)
+
+Dữ liệu được dựng sẵn trong bộ nhớ để chỉ đo phần serialize, không đo database.
+
+Chạy:
+    DATABASE_URL=postgresql+asyncpg://x/y SECRET_KEY=x HARDWARE_API_KEY=x python -m benchmarks.bench_schedules
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date, timedelta
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from app.api.responses import FastJSONResponse, dump_rows
+from app.api.endpoints.schedule import SCHEDULE_COLUMNS
+from app.models import Schedule
+from app.schemas import ScheduleBase
+
+def build_rows(count: int) -> list[tuple]:
+    """
+    Sinh dữ liệu lịch trình giả theo thứ tự cột của bảng schedule.
+    """
+    start = date(2024, 1, 1)
+    return [
+        (
+            i,
+            f"SUB{i % 300:04d}",
+            f"R{i % 120:03d}",
+            f"GV{i % 400:05d}",
+            f"CL{i % 250:04d}",
+            start + timedelta(days=i % 150),
+            1 + i % 10,
+            3 + i % 10,
+            bool(i % 2),
+        )
+        for i in range(count)
+    ]
+
+def build_app(rows: list[tuple]) -> FastAPI:
+    """
+    Dựng ứng dụng với hai route mô phỏng endpoint trước và sau thay đổi.
+    """
+    keys = [column.name for column in SCHEDULE_COLUMNS]
+    objects = [Schedule(**dict(zip(keys, row))) for row in rows]
+    app = FastAPI()
+
+    @app.get("/before", response_model=list[ScheduleBase], response_class=JSONResponse)
+    async def before():
+        return objects
+
+    @app.get("/after", response_model=list[ScheduleBase])
+    async def after():
+        return FastJSONResponse(dump_rows(keys, rows))
+
+    return app
+
+async def measure(client: httpx.AsyncClient, path: str, repeat: int) -> list[float]:
+    """
+    Gọi route nhiều lần và trả về thời gian mỗi lần (giây).
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = await client.get(path)
+        response.raise_for_status()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+async def main(count: int, repeat: int) -> None:
+    app = build_app(build_rows(count))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in ("/before", "/after"):
+            timings = await measure(client, path, repeat)
+            print(f"{path:8s} rows={count} median={statistics.median(timings) * 1000:.1f}ms min={min(timings) * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
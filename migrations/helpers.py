@@ -0,0 +1,26 @@
+"""
+Hàm dùng chung cho các migration.
+
+Chỉ phụ thuộc Alembic/SQLAlchemy, không import mã ứng dụng: migration phải chạy giống
+nhau dù mã trong app/ thay đổi về sau.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+def drop_if_invalid(name: str) -> None:
+    """
+    Xóa chỉ mục INVALID do CREATE INDEX CONCURRENTLY thất bại trước đó.
+
+    Gọi trong autocommit_block(): DROP INDEX CONCURRENTLY không chạy được trong transaction.
+    """
+    bind = op.get_bind()
+    invalid = bind.execute(
+        sa.text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {"name": name},
+    ).scalar()
+    if invalid:
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
@@ -0,0 +1,143 @@
+"""Lược đồ gốc: các bảng hiện có của hệ thống điểm danh.
+
+Database đã tồn tại trước khi có migration thì đánh dấu bằng `alembic stamp 0001`
+thay vì chạy upgrade.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "faculty",
+        sa.Column("faculty_id", sa.String(20), primary_key=True),
+        sa.Column("faculty_name", sa.Text(), nullable=False),
+    )
+    op.create_table(
+        "education_level",
+        sa.Column("edu_level_id", sa.String(20), primary_key=True),
+        sa.Column("edu_level_name", sa.Text(), nullable=False),
+    )
+    op.create_table(
+        "room",
+        sa.Column("room_id", sa.String(20), primary_key=True),
+        sa.Column("room_name", sa.Text(), nullable=False),
+    )
+    op.create_table(
+        "subject",
+        sa.Column("subject_id", sa.String(20), primary_key=True),
+        sa.Column("subject_name", sa.Text(), nullable=False),
+        sa.Column("credits", sa.SmallInteger(), nullable=False),
+        sa.Column("theory", sa.SmallInteger(), nullable=False),
+        sa.Column("practice", sa.SmallInteger(), nullable=False),
+        sa.Column("semester", sa.SmallInteger(), nullable=False),
+    )
+    op.create_table(
+        "major",
+        sa.Column("major_id", sa.String(20), primary_key=True),
+        sa.Column("faculty_id", sa.String(20), sa.ForeignKey("faculty.faculty_id"), nullable=False),
+        sa.Column("major_name", sa.Text(), nullable=False),
+    )
+    op.create_table(
+        "class",
+        sa.Column("class_id", sa.String(20), primary_key=True),
+        sa.Column("major_id", sa.String(20), sa.ForeignKey("major.major_id"), nullable=False),
+        sa.Column("edu_level_id", sa.String(20), sa.ForeignKey("education_level.edu_level_id"), nullable=False),
+        sa.Column("class_name", sa.Text(), nullable=False),
+        sa.Column("course", sa.String(10), nullable=False),
+        sa.Column("enroll_year", sa.SmallInteger(), nullable=False),
+    )
+    op.create_table(
+        "users",
+        sa.Column("user_id", sa.String(32), primary_key=True),
+        sa.Column("class_id", sa.String(20), sa.ForeignKey("class.class_id"), nullable=True),
+        sa.Column("full_name", sa.Text(), nullable=False),
+    )
+    op.create_index("ix_users_user_id", "users", ["user_id"])
+    op.create_table(
+        "account",
+        sa.Column("user_id", sa.String(32), sa.ForeignKey("users.user_id"), primary_key=True),
+        sa.Column("password_hash", sa.String(255), nullable=False),
+        sa.Column("role", sa.String(1), nullable=False),
+    )
+    op.create_table(
+        "student_profile",
+        sa.Column("user_id", sa.String(32), sa.ForeignKey("users.user_id"), primary_key=True),
+        sa.Column("birth_date", sa.Date(), nullable=False),
+        sa.Column("is_female", sa.Boolean(), nullable=False),
+        sa.Column("phone", sa.String(15), nullable=False),
+        sa.Column("address", sa.Text(), nullable=False),
+        sa.Column("profile_image_url", sa.Text(), nullable=True),
+    )
+    op.create_table(
+        "lecturer_profile",
+        sa.Column("user_id", sa.String(32), sa.ForeignKey("users.user_id"), primary_key=True),
+        sa.Column("faculty_id", sa.String(20), sa.ForeignKey("faculty.faculty_id"), nullable=False),
+        sa.Column("degree", sa.Text(), nullable=False),
+        sa.Column("research_area", sa.Text(), nullable=True),
+        sa.Column("profile_image_url", sa.Text(), nullable=True),
+    )
+    op.create_table(
+        "fingerprint",
+        sa.Column("finger_id", sa.String(32), primary_key=True),
+        sa.Column("user_id", sa.String(32), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column("finger_data", sa.LargeBinary(), nullable=False),
+    )
+    op.create_table(
+        "schedule",
+        sa.Column("schedule_id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("subject_id", sa.String(20), sa.ForeignKey("subject.subject_id"), nullable=False),
+        sa.Column("room_id", sa.String(20), sa.ForeignKey("room.room_id"), nullable=False),
+        sa.Column("lecturer_id", sa.String(32), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column("class_id", sa.String(20), sa.ForeignKey("class.class_id"), nullable=False),
+        sa.Column("learn_date", sa.Date(), nullable=False),
+        sa.Column("start_period", sa.SmallInteger(), nullable=False),
+        sa.Column("end_period", sa.SmallInteger(), nullable=False),
+        sa.Column("is_open", sa.Boolean(), nullable=True),
+    )
+    op.create_table(
+        "course_registration",
+        sa.Column("reg_id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.String(32), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column("subject_id", sa.String(20), sa.ForeignKey("subject.subject_id"), nullable=False),
+        sa.Column("host_class_id", sa.String(20), sa.ForeignKey("class.class_id"), nullable=False),
+        sa.Column("semester", sa.SmallInteger(), nullable=False),
+        sa.Column("year", sa.SmallInteger(), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(), nullable=False),
+    )
+    op.create_table(
+        "attendance",
+        sa.Column("attend_id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("schedule_id", sa.Integer(), sa.ForeignKey("schedule.schedule_id"), nullable=False),
+        sa.Column("user_id", sa.String(32), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column("attend_time", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("status", sa.Boolean(), nullable=False),
+    )
+
+def downgrade() -> None:
+    for table in (
+        "attendance",
+        "course_registration",
+        "schedule",
+        "fingerprint",
+        "lecturer_profile",
+        "student_profile",
+        "account",
+        "users",
+        "class",
+        "major",
+        "subject",
+        "room",
+        "education_level",
+        "faculty",
+    ):
+        op.drop_table(table)
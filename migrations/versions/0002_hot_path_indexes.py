@@ -0,0 +1,48 @@
+"""Chỉ mục cho các khóa ngoại và truy vấn nóng.
+
+Tạo bằng CREATE INDEX CONCURRENTLY để không khóa ghi trên bảng đang chạy. Mỗi chỉ mục
+chạy ngoài transaction (autocommit_block); chỉ mục INVALID còn sót lại từ lần chạy
+thất bại trước được xóa rồi tạo lại.
+
+Kiểm tra planner dùng đúng chỉ mục bằng scripts/verify_indexes.py.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+from migrations.helpers import drop_if_invalid
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (tên chỉ mục, bảng, cột) - khớp với khai báo trong app/models
+INDEXES = [
+    ("ix_attendance_schedule_id_user_id", "attendance", ["schedule_id", "user_id"]),
+    ("ix_attendance_user_id_attend_time", "attendance", ["user_id", "attend_time"]),
+    ("ix_attendance_attend_time", "attendance", ["attend_time"]),
+    ("ix_course_registration_user_id", "course_registration", ["user_id"]),
+    ("ix_course_registration_subject_id", "course_registration", ["subject_id"]),
+    ("ix_course_registration_host_class_id_subject_id", "course_registration", ["host_class_id", "subject_id"]),
+    ("ix_schedule_learn_date_start_period", "schedule", ["learn_date", "start_period"]),
+    ("ix_schedule_room_id_learn_date", "schedule", ["room_id", "learn_date"]),
+    ("ix_schedule_lecturer_id_learn_date", "schedule", ["lecturer_id", "learn_date"]),
+    ("ix_schedule_class_id_learn_date", "schedule", ["class_id", "learn_date"]),
+    ("ix_fingerprint_user_id", "fingerprint", ["user_id"]),
+    ("ix_major_faculty_id", "major", ["faculty_id"]),
+    ("ix_account_role", "account", ["role"]),
+]
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            drop_if_invalid(name)
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
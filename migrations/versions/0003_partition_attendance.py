@@ -0,0 +1,118 @@
+"""Phân vùng bảng attendance theo tháng trên attend_time.
+
+Bảng cũ được đổi tên, bảng phân vùng mới tạo với khóa chính (attend_id, attend_time),
+partition cho mọi tháng đã có dữ liệu cộng PARTITIONS_AHEAD tháng tới và
+một partition mặc định, rồi chép dữ liệu sang. Chạy trong một transaction: bảng
+attendance bị khóa trong lúc chép, nên thực hiện trong khung giờ bảo trì.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_attendance_schedule_id_user_id", ["schedule_id", "user_id"]),
+    ("ix_attendance_user_id_attend_time", ["user_id", "attend_time"]),
+    ("ix_attendance_attend_time", ["attend_time"]),
+]
+
+SEQUENCE = "attendance_attend_id_seq"
+
+# Đóng băng tại thời điểm viết migration (không đọc từ app.db.partitions/settings): tác vụ
+# nền maintain_attendance_partitions tạo tiếp các tháng sau theo cấu hình hiện hành
+PARTITIONS_AHEAD = 3
+DEFAULT_PARTITION = "attendance_default"
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def _create_partition_sql(month: date) -> str:
+    end = _add_months(month, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS attendance_y{month.year:04d}m{month.month:02d} PARTITION OF attendance "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+def _drop_indexes(table: str) -> None:
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name=table, if_exists=True)
+
+def _create_indexes(table: str) -> None:
+    for name, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # Tách bảng cũ: giữ sequence của attend_id để id mới tiếp nối id cũ
+    op.execute(f"ALTER SEQUENCE {SEQUENCE} OWNED BY NONE")
+    op.rename_table("attendance", "attendance_legacy")
+    op.execute("ALTER TABLE attendance_legacy RENAME CONSTRAINT attendance_pkey TO attendance_legacy_pkey")
+    _drop_indexes("attendance_legacy")
+
+    op.execute(f"""
+        CREATE TABLE attendance (
+            attend_id INTEGER NOT NULL DEFAULT nextval('{SEQUENCE}'),
+            schedule_id INTEGER NOT NULL REFERENCES schedule (schedule_id),
+            user_id VARCHAR(32) NOT NULL REFERENCES users (user_id),
+            attend_time TIMESTAMP WITH TIME ZONE NOT NULL,
+            status BOOLEAN NOT NULL,
+            CONSTRAINT attendance_pkey PRIMARY KEY (attend_id, attend_time)
+        ) PARTITION BY RANGE (attend_time)
+    """)
+
+    bounds = bind.execute(sa.text(
+        "SELECT min(attend_time)::date, max(attend_time)::date FROM attendance_legacy"
+    )).one()
+    first = (bounds[0] or date.today()).replace(day=1)
+    last = _add_months(max(bounds[1] or date.today(), date.today()).replace(day=1), PARTITIONS_AHEAD)
+    month = first
+    while month <= last:
+        op.execute(_create_partition_sql(month))
+        month = _add_months(month, 1)
+    op.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF attendance DEFAULT")
+
+    # Chỉ mục trên bảng cha được tạo tự động cho mọi partition
+    _create_indexes("attendance")
+
+    op.execute("""
+        INSERT INTO attendance (attend_id, schedule_id, user_id, attend_time, status)
+        SELECT attend_id, schedule_id, user_id, attend_time, status FROM attendance_legacy
+    """)
+    op.drop_table("attendance_legacy")
+    op.execute(f"ALTER SEQUENCE {SEQUENCE} OWNED BY attendance.attend_id")
+
+def downgrade() -> None:
+    op.execute(f"ALTER SEQUENCE {SEQUENCE} OWNED BY NONE")
+    op.rename_table("attendance", "attendance_partitioned")
+    op.execute("ALTER TABLE attendance_partitioned RENAME CONSTRAINT attendance_pkey TO attendance_partitioned_pkey")
+    _drop_indexes("attendance_partitioned")
+
+    op.execute(f"""
+        CREATE TABLE attendance (
+            attend_id INTEGER NOT NULL DEFAULT nextval('{SEQUENCE}'),
+            schedule_id INTEGER NOT NULL REFERENCES schedule (schedule_id),
+            user_id VARCHAR(32) NOT NULL REFERENCES users (user_id),
+            attend_time TIMESTAMP WITH TIME ZONE NOT NULL,
+            status BOOLEAN NOT NULL,
+            CONSTRAINT attendance_pkey PRIMARY KEY (attend_id)
+        )
+    """)
+    _create_indexes("attendance")
+    op.execute("""
+        INSERT INTO attendance (attend_id, schedule_id, user_id, attend_time, status)
+        SELECT attend_id, schedule_id, user_id, attend_time, status FROM attendance_partitioned
+    """)
+    # Xóa bảng cha kéo theo toàn bộ partition còn gắn
+    op.drop_table("attendance_partitioned")
+    op.execute(f"ALTER SEQUENCE {SEQUENCE} OWNED BY attendance.attend_id")
@@ -0,0 +1,40 @@
+"""Chuỗi lịch lặp hằng tuần: bảng schedule_series và cột schedule.series_id.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "schedule_series",
+        sa.Column("series_id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("subject_id", sa.String(20), sa.ForeignKey("subject.subject_id"), nullable=False),
+        sa.Column("room_id", sa.String(20), sa.ForeignKey("room.room_id"), nullable=False),
+        sa.Column("lecturer_id", sa.String(32), sa.ForeignKey("users.user_id"), nullable=False),
+        sa.Column("class_id", sa.String(20), sa.ForeignKey("class.class_id"), nullable=False),
+        sa.Column("weekday", sa.SmallInteger(), nullable=False),
+        sa.Column("start_period", sa.SmallInteger(), nullable=False),
+        sa.Column("end_period", sa.SmallInteger(), nullable=False),
+        sa.Column("start_date", sa.Date(), nullable=False),
+        sa.Column("end_date", sa.Date(), nullable=False),
+        sa.Column("excluded_dates", postgresql.ARRAY(sa.Date()), nullable=False, server_default="{}"),
+        sa.Column("is_open", sa.Boolean(), nullable=True),
+    )
+    # Cột nullable không default: thêm tức thời, không viết lại bảng
+    op.add_column("schedule", sa.Column("series_id", sa.Integer(), sa.ForeignKey("schedule_series.series_id"), nullable=True))
+    op.create_index("ix_schedule_series_id_learn_date", "schedule", ["series_id", "learn_date"])
+
+def downgrade() -> None:
+    op.drop_index("ix_schedule_series_id_learn_date", table_name="schedule")
+    op.drop_column("schedule", "series_id")
+    op.drop_table("schedule_series")
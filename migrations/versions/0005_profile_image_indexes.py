@@ -0,0 +1,33 @@
+"""Chỉ mục profile_image_url để đếm tham chiếu ảnh trong kho định địa chỉ theo nội dung.
+
+Tạo bằng CREATE INDEX CONCURRENTLY như 0002 để không khóa ghi bảng hồ sơ.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+from migrations.helpers import drop_if_invalid
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# (tên chỉ mục, bảng, cột) - khớp với khai báo trong app/models
+INDEXES = [
+    ("ix_student_profile_profile_image_url", "student_profile", ["profile_image_url"]),
+    ("ix_lecturer_profile_profile_image_url", "lecturer_profile", ["profile_image_url"]),
+]
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            drop_if_invalid(name)
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
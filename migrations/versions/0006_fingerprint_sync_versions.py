@@ -0,0 +1,98 @@
+"""Phiên bản thay đổi cho đồng bộ template vân tay: cột fingerprint.version và bảng
+fingerprint_tombstone.
+
+Phiên bản là ID transaction (xid8, tăng đơn điệu) của lần ghi cuối, gán bằng trigger cho
+mọi INSERT/UPDATE; DELETE ghi tombstone mang phiên bản của transaction xóa. Dùng ID
+transaction thay vì sequence vì giá trị sequence có thể commit không theo thứ tự: máy chấm
+công đọc tới phiên bản N có thể bỏ lỡ vĩnh viễn một transaction cầm N-1 commit sau đó.
+Endpoint đồng bộ chỉ trả thay đổi có phiên bản dưới xmin của snapshot hiện tại (mọi
+transaction nhỏ hơn đã kết thúc) nên không thay đổi nào bị bỏ lỡ. Yêu cầu PostgreSQL 13+.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "fingerprint_tombstone",
+        sa.Column("finger_id", sa.String(32), primary_key=True),
+        sa.Column("user_id", sa.String(32), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.Column("deleted_at", sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text("now()")),
+    )
+    op.create_index("ix_fingerprint_tombstone_version", "fingerprint_tombstone", ["version"])
+
+    # Bản ghi có sẵn nhận phiên bản của transaction migration
+    op.add_column("fingerprint", sa.Column("version", sa.BigInteger(), nullable=True))
+    op.execute("UPDATE fingerprint SET version = pg_current_xact_id()::text::bigint")
+    op.alter_column("fingerprint", "version", nullable=False)
+    op.create_index("ix_fingerprint_version", "fingerprint", ["version"])
+
+    op.execute("""
+        CREATE FUNCTION fingerprint_set_version() RETURNS trigger AS $$
+        BEGIN
+            NEW.version := pg_current_xact_id()::text::bigint;
+            IF TG_OP = 'INSERT' OR NEW.finger_id <> OLD.finger_id THEN
+                DELETE FROM fingerprint_tombstone WHERE finger_id = NEW.finger_id;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE FUNCTION fingerprint_write_tombstone() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO fingerprint_tombstone (finger_id, user_id, version)
+            VALUES (OLD.finger_id, OLD.user_id, pg_current_xact_id()::text::bigint)
+            ON CONFLICT (finger_id) DO UPDATE
+                SET user_id = EXCLUDED.user_id, version = EXCLUDED.version, deleted_at = now();
+            RETURN OLD;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER fingerprint_version BEFORE INSERT OR UPDATE ON fingerprint
+        FOR EACH ROW EXECUTE FUNCTION fingerprint_set_version()
+    """)
+    op.execute("""
+        CREATE TRIGGER fingerprint_tombstone AFTER DELETE ON fingerprint
+        FOR EACH ROW EXECUTE FUNCTION fingerprint_write_tombstone()
+    """)
+    # Đổi finger_id cũng là xóa khóa cũ với máy chấm công
+    op.execute("""
+        CREATE FUNCTION fingerprint_rename_tombstone() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO fingerprint_tombstone (finger_id, user_id, version)
+            VALUES (OLD.finger_id, OLD.user_id, NEW.version)
+            ON CONFLICT (finger_id) DO UPDATE
+                SET user_id = EXCLUDED.user_id, version = EXCLUDED.version, deleted_at = now();
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER fingerprint_rename AFTER UPDATE OF finger_id ON fingerprint
+        FOR EACH ROW WHEN (OLD.finger_id IS DISTINCT FROM NEW.finger_id)
+        EXECUTE FUNCTION fingerprint_rename_tombstone()
+    """)
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS fingerprint_rename ON fingerprint")
+    op.execute("DROP TRIGGER IF EXISTS fingerprint_tombstone ON fingerprint")
+    op.execute("DROP TRIGGER IF EXISTS fingerprint_version ON fingerprint")
+    op.execute("DROP FUNCTION IF EXISTS fingerprint_rename_tombstone()")
+    op.execute("DROP FUNCTION IF EXISTS fingerprint_write_tombstone()")
+    op.execute("DROP FUNCTION IF EXISTS fingerprint_set_version()")
+    op.drop_index("ix_fingerprint_version", table_name="fingerprint")
+    op.drop_column("fingerprint", "version")
+    op.drop_index("ix_fingerprint_tombstone_version", table_name="fingerprint_tombstone")
+    op.drop_table("fingerprint_tombstone")
@@ -0,0 +1,24 @@
+"""
+Lưu trữ điểm danh của các học kỳ đã kết thúc ra Parquet và xóa khỏi bảng attendance.
+
+Sử dụng:
+    python -m scripts.archive_attendance --before 2026-02-01
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import date
+from app.db.session import engine
+from app.db.archive import archive_attendance
+
+async def main(args: argparse.Namespace) -> None:
+    archived = await archive_attendance(engine, date.fromisoformat(args.before))
+    await engine.dispose()
+    print(f"Đã lưu trữ {len(archived)} tháng: {', '.join(archived) or '-'}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Lưu trữ điểm danh cũ ra Parquet")
+    parser.add_argument("--before", required=True, help="Ngày ISO kết thúc học kỳ; các tháng trước tháng này được lưu trữ")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,40 @@
+"""
+Quản lý thủ công partition của bảng attendance.
+
+Sử dụng:
+    python -m scripts.attendance_partitions list
+    python -m scripts.attendance_partitions ensure --months-ahead 6
+    python -m scripts.attendance_partitions detach --before 2025-09-01
+"""
+
+import argparse
+import asyncio
+from datetime import date
+from app.db.session import engine
+from app.db.partitions import (
+    detach_attendance_partitions,
+    ensure_attendance_partitions,
+    list_attendance_partitions,
+)
+
+async def main(args: argparse.Namespace) -> None:
+    async with engine.begin() as conn:
+        if args.command == "list":
+            names = await list_attendance_partitions(conn)
+        elif args.command == "ensure":
+            names = await ensure_attendance_partitions(conn, args.months_ahead)
+        else:
+            names = await detach_attendance_partitions(conn, date.fromisoformat(args.before))
+    await engine.dispose()
+    for name in names:
+        print(name)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quản lý partition bảng attendance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Liệt kê partition tháng")
+    ensure = sub.add_parser("ensure", help="Tạo partition cho tháng hiện tại và các tháng tới")
+    ensure.add_argument("--months-ahead", type=int, default=None)
+    detach = sub.add_parser("detach", help="Tách các partition trước tháng chỉ định")
+    detach.add_argument("--before", required=True, help="Ngày ISO, giữ tháng chứa ngày này trở đi")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,25 @@
+"""
+Dựng thủ công gói dữ liệu ngoại tuyến cho máy chấm công (ví dụ chạy bằng cron trước giờ học).
+
+Sử dụng:
+    python -m scripts.build_offline_bundles
+    python -m scripts.build_offline_bundles --date 2026-10-20
+"""
+
+import argparse
+import asyncio
+from datetime import date
+from app.db.session import AsyncSessionLocal, engine
+from app.services.offline_bundle import build_bundles
+
+async def main(args: argparse.Namespace) -> None:
+    async with AsyncSessionLocal() as db:
+        report = await build_bundles(db, args.date)
+    await engine.dispose()
+    for day, counts in report.items():
+        print(f"{day}: {counts['rooms']} phòng, ghi mới {counts['written']} gói")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dựng gói dữ liệu ngoại tuyến theo phòng và ngày")
+    parser.add_argument("--date", type=date.fromisoformat, default=None, help="Ngày bắt đầu (mặc định hôm nay)")
+    asyncio.run(main(parser.parse_args()))
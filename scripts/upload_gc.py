@@ -0,0 +1,27 @@
+"""
+Dọn thủ công ảnh đại diện không còn được tham chiếu.
+
+Sử dụng:
+    python -m scripts.upload_gc --dry-run
+    python -m scripts.upload_gc
+"""
+
+import argparse
+import asyncio
+from app.db.session import AsyncSessionLocal, engine
+from app.services.upload_gc import collect_garbage
+
+async def main(args: argparse.Namespace) -> None:
+    async with AsyncSessionLocal() as db:
+        report = await collect_garbage(db, dry_run=args.dry_run)
+    await engine.dispose()
+    for path in report["sample"]:
+        print(path)
+    action = "Sẽ xóa" if report["dry_run"] else "Đã xóa"
+    count = report["orphaned"] if report["dry_run"] else report["deleted"]
+    print(f"Đã quét {report['scanned']} file. {action} {count} file ({report['bytes']} byte).")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dọn ảnh đại diện không còn được tham chiếu")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ liệt kê, không xóa")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,140 @@
+"""
+Kiểm tra planner dùng đúng chỉ mục cho các truy vấn nóng.
+
+Chạy EXPLAIN (FORMAT JSON) cho các truy vấn giống endpoint, tắt seq scan để bảng nhỏ
+(môi trường dev) vẫn phản ánh chỉ mục có thể dùng được. Thoát với mã khác 0 nếu có
+truy vấn không dùng chỉ mục mong đợi. Bảng phân vùng (attendance) được quét qua chỉ mục của
+từng partition, nên tên chỉ mục con được quy về chỉ mục cha qua pg_inherits trước khi so.
+
+Sử dụng:
+    python -m scripts.verify_indexes
+"""
+
+import asyncio
+import json
+import sys
+from datetime import date, timedelta
+from typing import Iterator, List, Set, Tuple
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+from app.db.session import engine
+from app.models import Account, Attendance, CourseRegistration, Fingerprint, Major, Schedule
+
+TODAY = date.today()
+
+# (mô tả, truy vấn, chỉ mục mong đợi)
+CHECKS: List[Tuple[str, object, str]] = [
+    (
+        "attendance theo schedule và user",
+        select(Attendance).where(Attendance.schedule_id == 1, Attendance.user_id == "U001"),
+        "ix_attendance_schedule_id_user_id",
+    ),
+    (
+        "lịch sử điểm danh của user theo khoảng ngày",
+        select(Attendance).where(
+            Attendance.user_id == "U001",
+            Attendance.attend_time >= TODAY - timedelta(days=30),
+            Attendance.attend_time < TODAY,
+        ).order_by(Attendance.attend_time.desc()),
+        "ix_attendance_user_id_attend_time",
+    ),
+    (
+        "đăng ký theo user",
+        select(CourseRegistration).where(CourseRegistration.user_id == "U001"),
+        "ix_course_registration_user_id",
+    ),
+    (
+        "đăng ký theo môn",
+        select(CourseRegistration).where(CourseRegistration.subject_id == "SUB001"),
+        "ix_course_registration_subject_id",
+    ),
+    (
+        "đăng ký theo lớp và môn",
+        select(CourseRegistration).where(
+            CourseRegistration.host_class_id == "C001",
+            CourseRegistration.subject_id == "SUB001",
+        ),
+        "ix_course_registration_host_class_id_subject_id",
+    ),
+    (
+        "lịch theo ngày",
+        select(Schedule).where(Schedule.learn_date == TODAY).order_by(Schedule.start_period),
+        "ix_schedule_learn_date_start_period",
+    ),
+    (
+        "lịch theo phòng trong ngày",
+        select(Schedule).where(Schedule.room_id == "R001", Schedule.learn_date == TODAY),
+        "ix_schedule_room_id_learn_date",
+    ),
+    (
+        "lịch theo giảng viên",
+        select(Schedule).where(Schedule.lecturer_id == "L001").order_by(Schedule.learn_date),
+        "ix_schedule_lecturer_id_learn_date",
+    ),
+    (
+        "lịch theo lớp",
+        select(Schedule).where(Schedule.class_id == "C001").order_by(Schedule.learn_date),
+        "ix_schedule_class_id_learn_date",
+    ),
+    (
+        "vân tay theo user",
+        select(Fingerprint.finger_id).where(Fingerprint.user_id == "U001"),
+        "ix_fingerprint_user_id",
+    ),
+    (
+        "chuyên ngành theo khoa",
+        select(Major).where(Major.faculty_id == "F001"),
+        "ix_major_faculty_id",
+    ),
+    (
+        "tài khoản theo vai trò",
+        select(Account.user_id).where(Account.role == "1"),
+        "ix_account_role",
+    ),
+]
+
+def _index_names(plan: dict) -> Iterator[str]:
+    """
+    Duyệt cây plan và trả về tên các chỉ mục được dùng.
+    """
+    if "Index Name" in plan:
+        yield plan["Index Name"]
+    for child in plan.get("Plans", []):
+        yield from _index_names(child)
+
+async def _parent_indexes(conn, names: Set[str]) -> Set[str]:
+    """
+    Quy chỉ mục của partition về chỉ mục cha trên bảng phân vùng (giữ nguyên tên khác).
+    """
+    result = await conn.execute(
+        text(
+            """
+            SELECT child.relname, parent.relname
+            FROM pg_class child
+            JOIN pg_inherits i ON i.inhrelid = child.oid
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            WHERE child.relkind = 'i' AND child.relname = ANY(:names)
+            """
+        ),
+        {"names": list(names)},
+    )
+    parents = dict(result.all())
+    return {parents.get(name, name) for name in names}
+
+async def main() -> int:
+    failures = 0
+    async with engine.connect() as conn:
+        await conn.execute(text("SET enable_seqscan = off"))
+        for label, query, expected in CHECKS:
+            sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+            raw = (await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))).scalar()
+            plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+            used = await _parent_indexes(conn, set(_index_names(plan)))
+            ok = expected in used
+            failures += not ok
+            print(f"[{'OK' if ok else 'FAIL'}] {label}: mong đợi {expected}, dùng {sorted(used) or 'seq scan'}")
+    await engine.dispose()
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))